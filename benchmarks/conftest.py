@@ -0,0 +1,209 @@
+import os
+import sys
+import time
+import shutil
+import socket
+import threading
+
+import pytest
+
+# benchmarks run from meshtastic2duckdb/app, as the server does, so dbs/, static/ and templates/ resolve.
+#
+#   make bench                                   # 10k rows per table
+#   MESH_BENCH_SIZES=10000,1000000,10000000 make bench
+#
+# seeded databases are kept as dbs/bench_<size>.duckdb and reused by later runs.
+# MESH_BENCH_RESEED=1 rebuilds them.
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "meshtastic2duckdb", "app")
+
+os.chdir(APP_DIR)
+os.makedirs("dbs", exist_ok=True)
+sys.path.insert(0, os.path.join(APP_DIR, ".."))
+
+from app              import db
+from app              import models
+from app.models._bulk import group_by_table, insert_columnar
+from logger.replay    import synthetic_packets
+
+SIZES         = [int(size) for size in os.environ.get("MESH_BENCH_SIZES", "10000").split(",")]
+MEMORY_MB     = int(os.environ.get("MESH_BENCH_MEMORY_MB", "512"))
+RESEED        = os.environ.get("MESH_BENCH_RESEED", "false").lower() in "1,t,y,true,yes".split(",")
+
+SEED_BATCH    = 10_000
+SEED_SPAN     = 7 * 86400 # seeded rows cover the last week, the default time_from
+
+SEED_TABLES   = {
+	models.TelemetryClass  : "TELEMETRY_APP",
+	models.PositionClass   : "POSITION_APP",
+	models.NodeInfoClass   : "NODEINFO_APP",
+	models.TextMessageClass: "TEXT_MESSAGE_APP",
+}
+
+SEED_NODES    = 200
+
+
+def pytest_generate_tests(metafunc):
+	if "size" in metafunc.fixturenames:
+		metafunc.parametrize("size", SIZES, ids=[f"{size:_d}" for size in SIZES], scope="session")
+
+
+def synthetic_node(packet: dict) -> dict:
+	# a nodesByNum entry, as the logger reads it from the radio
+	return {
+		"num"          : packet["from"],
+		"user"         : packet["decoded"]["user"],
+		"lastHeard"    : packet["rxTime"],
+		"snr"          : packet["rxSnr"],
+		"hopsAway"     : 3 - packet["hopLimit"],
+		"deviceMetrics": { "batteryLevel": 50, "voltage": 3.9, "channelUtilization": 5.0, "airUtilTx": 1.0, "uptimeSeconds": 3600 },
+		"position"     : { "latitude": 52.0, "longitude": 4.0, "latitudeI": 520000000, "longitudeI": 40000000, "altitude": 10, "time": packet["rxTime"] },
+	}
+
+
+def seed_instances(cls, size: int) -> list:
+	batch = min(size, SEED_BATCH)
+
+	if cls is models.NodesClass:
+		packets = synthetic_packets(batch, SEED_NODES, seed=batch, mix={"NODEINFO_APP": 1})
+		return [models.decode_node(synthetic_node(packet)) for packet in packets]
+
+	packets = synthetic_packets(batch, SEED_NODES, seed=batch, mix={SEED_TABLES[cls]: 1})
+	return [models.decode_packet(packet, trusted=True) for packet in packets]
+
+
+def seed_table(session, cls, size: int, now: int):
+	# one batch is inserted as is. the rest are copies of it made by duckdb,
+	# each shifted back in time, so a million rows per table take seconds instead of hours.
+	# neither goes through bulk_insert's rollup and node state hooks
+	instances = seed_instances(cls, size)
+	for pos, instance in enumerate(instances):
+		instance.gateway_receive_time = now - pos * SEED_SPAN // size
+
+	for orm_class, rows in group_by_table(instances).items():
+		insert_columnar(session, orm_class, rows)
+
+	copies    = size // len(instances)
+	if copies < 2:
+		return
+
+	table     = cls.__ormclass__().__table__
+	columns   = [column.name for column in table.columns if column.name != "id"]
+	shift     = len(instances) * SEED_SPAN // size
+	exprs     = {
+		"gateway_receive_time": f'"gateway_receive_time" - copies.range * {shift}',
+		"message_id"          : f'"message_id" + copies.range * {len(instances)}',
+	}
+	names     = ", ".join(f'"{column}"' for column in columns)
+	values    = ", ".join(exprs.get(column, f'"{column}"') for column in columns)
+
+	con       = session.connection().connection.driver_connection
+	con.execute(f'INSERT INTO "{table.name}" ({names}) SELECT {values} FROM "{table.name}" CROSS JOIN range(1, {copies}) copies')
+
+
+def is_seeded(db_engine: db.DbEngineLocal, size: int) -> bool:
+	with db_engine.get_session_manager() as session:
+		con = session.connection().connection.driver_connection
+		return all(
+			con.execute(f'SELECT count(*) FROM "{cls.__tablename__}"').fetchone()[0] >= size
+			for cls in list(SEED_TABLES.keys()) + [models.NodesClass]
+		)
+
+
+def open_engine(db_filename: str) -> db.DbEngineLocal:
+	return db.DbEngineLocal(db_filename, memory_limit_mb=MEMORY_MB, fast_insert=True)
+
+
+@pytest.fixture(scope="session")
+def seeded_engine(size: int) -> db.DbEngineLocal:
+	db_filename = f"bench_{size}.duckdb"
+
+	if RESEED:
+		for suffix in ("", ".wal"):
+			if os.path.exists(f"dbs/{db_filename}{suffix}"):
+				os.remove(f"dbs/{db_filename}{suffix}")
+
+	db_engine = open_engine(db_filename)
+
+	if not is_seeded(db_engine, size):
+		now   = int(time.time())
+		start = time.perf_counter()
+
+		# one transaction per table keeps seeding within the memory limit
+		for cls in list(SEED_TABLES.keys()) + [models.NodesClass]:
+			with db_engine.get_session_manager() as session:
+				seed_table(session, cls, size, now)
+				session.commit()
+				session.connection().connection.driver_connection.execute("CHECKPOINT")
+
+		# the tables derived from the seeded ones are rebuilt from them
+		with db_engine.get_session_manager() as session:
+			models.rebuild_rollups(session)
+			models.node_state_rebuild(session)
+			session.commit()
+
+		print(f"\nseeded {db_filename} in {time.perf_counter() - start:.1f}s")
+
+	models.count_cache_clear()
+
+	return db_engine
+
+
+@pytest.fixture(scope="session")
+def scratch_engine(seeded_engine: db.DbEngineLocal, size: int) -> db.DbEngineLocal:
+	# inserts go to a copy, so they do not change what the query benchmarks read
+	db_filename = f"bench_{size}_scratch.duckdb"
+
+	with seeded_engine.get_session_manager() as session:
+		session.connection().connection.driver_connection.execute("CHECKPOINT")
+
+	shutil.copyfile(f"dbs/{seeded_engine.db_filename}", f"dbs/{db_filename}")
+
+	yield open_engine(db_filename)
+
+	os.remove(f"dbs/{db_filename}")
+
+
+@pytest.fixture(scope="session")
+def http_engine() -> db.DbEngineHTTP:
+	# the real server app, on a free local port, writing to its own scratch database
+	import uvicorn
+
+	os.environ["MESH_LOGGER_DB_FILENAME"] = "bench_http.duckdb"
+	os.environ["MESH_LOGGER_DEDUP_SIZE" ] = "0"
+
+	from app import main
+
+	with socket.socket() as sock:
+		sock.bind(("127.0.0.1", 0))
+		port = sock.getsockname()[1]
+
+	server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+	thread = threading.Thread(target=server.run, daemon=True)
+	thread.start()
+
+	while not server.started:
+		time.sleep(0.05)
+
+	yield db.DbEngineHTTP(host="127.0.0.1", port=port, retries=0)
+
+	server.should_exit = True
+	thread.join()
+
+	for suffix in ("", ".wal"):
+		if os.path.exists(f"dbs/bench_http.duckdb{suffix}"):
+			os.remove(f"dbs/bench_http.duckdb{suffix}")
+
+
+@pytest.fixture(scope="session")
+def sample_packets() -> dict[str, dict]:
+	# one packet per portnum, plus one without a model of its own
+	packets = {
+		portnum: next(synthetic_packets(1, SEED_NODES, mix={portnum: 1}))
+		for portnum in SEED_TABLES.values()
+	}
+	packets["ROUTING_APP"] = {
+		**packets["TEXT_MESSAGE_APP"],
+		"decoded": { "portnum": "ROUTING_APP", "bitfield": 0, "payload": b"\x18\x00", "requestId": 95, "routing": { "errorReason": "NONE" } },
+	}
+	return packets
@@ -0,0 +1,16 @@
+import pytest
+
+from app import models
+
+
+@pytest.mark.benchmark(group="decode")
+@pytest.mark.parametrize("trusted", [True, False], ids=["trusted", "validated"])
+@pytest.mark.parametrize("portnum", ["TELEMETRY_APP", "POSITION_APP", "NODEINFO_APP", "TEXT_MESSAGE_APP", "ROUTING_APP"])
+def test_decode_packet(benchmark, sample_packets, portnum, trusted):
+	message = benchmark(models.decode_packet, sample_packets[portnum], trusted=trusted)
+	assert message.portnum == portnum
+
+
+@pytest.mark.benchmark(group="decode")
+def test_archive_packet(benchmark, sample_packets):
+	benchmark(models.archive_packet, sample_packets["TELEMETRY_APP"])
@@ -0,0 +1,25 @@
+import pytest
+
+from app           import models
+from logger.replay import synthetic_packets
+
+BATCH_ROWS = 1_000
+
+
+@pytest.fixture(scope="module")
+def batch() -> list:
+	# one flush of the logger: decoded messages and their archive rows
+	packets = list(synthetic_packets(BATCH_ROWS // 2, 200, seed=1))
+	return [models.decode_packet(packet, trusted=True) for packet in packets] + [models.archive_packet(packet) for packet in packets]
+
+
+@pytest.mark.benchmark(group="insert-local")
+def test_add_instances_local(benchmark, scratch_engine, batch, size):
+	stats = benchmark.pedantic(scratch_engine.add_instances, args=(batch,), rounds=20, warmup_rounds=1)
+	assert sum(stats.values()) == len(batch)
+
+
+@pytest.mark.benchmark(group="insert-http")
+def test_add_instances_http(benchmark, http_engine, batch):
+	stats = benchmark.pedantic(http_engine.add_instances, args=(batch,), rounds=20, warmup_rounds=1)
+	assert sum(stats.values()) == len(batch)
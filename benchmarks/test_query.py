@@ -0,0 +1,58 @@
+import typing
+
+import pytest
+
+from app import models
+
+# a filter per *FilterQueryParams class, with and without its own options
+QUERY_CASES = {
+	"telemetry"            : (models.Telemetry  , {}                                  ),
+	"telemetry-min-batt"   : (models.Telemetry  , {"minBatteryLevel": 50}             ),
+	"telemetryrollup"      : (models.TelemetryRollup, {}                              ),
+	"telemetryrollup-year" : (models.TelemetryRollup, {"time_from": "1Y"}             ),
+	"position"             : (models.Position   , {}                                  ),
+	"position-has-location": (models.Position   , {"hasLocation": True}               ),
+	"nodeinfo"             : (models.NodeInfo   , {}                                  ),
+	"nodeinfo-role"        : (models.NodeInfo   , {"roles": "CLIENT"}                 ),
+	"textmessage"          : (models.TextMessage, {}                                  ),
+	"textmessage-channel"  : (models.TextMessage, {"channels": "1"}                   ),
+	"nodes"                : (models.Nodes      , {}                                  ),
+	"nodes-has-location"   : (models.Nodes      , {"hasLocation": True}               ),
+	"nodestate"            : (models.NodeState  , {}                                  ),
+	"message-from-nodes"   : (models.Position   , {"from_nodes": "268435456,268435457"}),
+}
+
+
+def make_filter(model, options: dict[str, typing.Any], **kwargs):
+	filter_class = typing.get_args(model.__filter__())[0]
+	return filter_class(**{**options, **kwargs})
+
+
+@pytest.mark.benchmark(group="query")
+@pytest.mark.parametrize("cached", [False, True], ids=["uncached", "cached"])
+@pytest.mark.parametrize("case", QUERY_CASES.keys())
+def test_query(benchmark, seeded_engine, size, case, cached):
+	model, options = QUERY_CASES[case]
+
+	def query():
+		if not cached:
+			models.query_cache.bump()
+		return model.Query(session_manager=seeded_engine.get_session_manager(read_only=True), query_filter=make_filter(model, options, limit=100))
+
+	benchmark(query)
+
+
+@pytest.mark.benchmark(group="count")
+@pytest.mark.parametrize("cached", [False, True], ids=["uncached", "cached"])
+@pytest.mark.parametrize("exact", [False, True], ids=["estimated", "exact"])
+@pytest.mark.parametrize("case", QUERY_CASES.keys())
+def test_count(benchmark, seeded_engine, size, case, exact, cached):
+	model, options = QUERY_CASES[case]
+
+	def count():
+		if not cached:
+			models.query_cache.bump()
+		return model.Count(session_manager=seeded_engine.get_session_manager(read_only=True), query_filter=make_filter(model, options, exact=exact))
+
+	count_all, count_filter = benchmark(count)
+	assert count_filter <= count_all
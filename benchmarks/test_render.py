@@ -0,0 +1,51 @@
+import typing
+
+import pytest
+
+from app.htmx._messages          import gen_image, gen_image_data, POINTS_PER_PIXEL
+from app.htmx._messages_position import lat_lon_stats
+from app                         import models
+
+RENDER_ROWS  = 100_000
+IMAGE_WIDTH  = 500
+
+
+def fetch(engine, model, size: int) -> list:
+	# the rows a page would have fetched. limit is set past the 100 rows the api allows
+	query_filter       = typing.get_args(model.__filter__())[0]()
+	query_filter.limit = min(size, RENDER_ROWS)
+	return model.Query(session_manager=engine.get_session_manager(read_only=True), query_filter=query_filter)
+
+
+@pytest.fixture(scope="session")
+def nodeinfo_rows(seeded_engine, size) -> list:
+	return fetch(seeded_engine, models.NodeInfo, size)
+
+
+@pytest.fixture(scope="session")
+def position_rows(seeded_engine, size) -> list:
+	return fetch(seeded_engine, models.Position, size)
+
+
+@pytest.mark.benchmark(group="render")
+@pytest.mark.parametrize("max_points", [IMAGE_WIDTH * POINTS_PER_PIXEL, None], ids=["downsampled", "full"])
+def test_gen_image(benchmark, nodeinfo_rows, size, max_points):
+	def render():
+		return gen_image(
+			**gen_image_data(nodeinfo_rows, "rxTime", ["rxRssi"], max_points=max_points),
+			image_height = 250,
+			image_width  = IMAGE_WIDTH,
+			title        = "Rx Rssi through time",
+			x_label      = "Time",
+			y_label      = "Rx Rssi",
+			graph_type   = "multiline"
+		)
+
+	image = benchmark(render)
+	assert image["div"]
+
+
+@pytest.mark.benchmark(group="render")
+def test_lat_lon_stats(benchmark, position_rows, size):
+	stats = benchmark(lat_lon_stats, position_rows)
+	assert stats["tracks"]
@@ -7,7 +7,18 @@ import dataclasses
 class Config:
 	db_filename      : str
 	mode             : str
+	devices          : list[str]
 	print_stats_every: int
+	flush_rows       : int
+	flush_ms         : int
+	buffer_max       : int
+	queue_size       : int
+	num_workers      : int
+	trusted          : bool
+	archive          : bool
+	dedup_size       : int
+	dedup_ttl        : int
+	node_refresh     : int
 	debug            : bool
 	trace            : bool
 
@@ -15,16 +26,45 @@ class Config:
 	def load_env(cls, overrides: dict[str, typing.Any] = None, verbose: bool = False):
 		db_filename       = os.environ.get("MESH_LOGGER_DB_FILENAME"          , "meshtastic_logger.duckdb")
 		mode              = os.environ.get("MESH_LOGGER_MODE"                 , "http")
+		devices           = os.environ.get("MESH_LOGGER_DEVICES"              , "")
 		print_stats_every = os.environ.get("MESH_LOGGER_PRINT_STATS_EVERY"    , "60")
+		flush_rows        = os.environ.get("MESH_LOGGER_FLUSH_ROWS"           , "100")
+		flush_ms          = os.environ.get("MESH_LOGGER_FLUSH_MS"             , "1000")
+		buffer_max        = os.environ.get("MESH_LOGGER_BUFFER_MAX"           , "100000") # rows kept while the database is unreachable. 0 unbounded
+		queue_size        = os.environ.get("MESH_LOGGER_QUEUE_SIZE"           , "10000")
+		num_workers       = os.environ.get("MESH_LOGGER_WORKERS"              , "1")
+		trusted           = os.environ.get("MESH_LOGGER_TRUSTED_DECODE"       , "false") # skip validating decoded packets
+		archive           = os.environ.get("MESH_LOGGER_ARCHIVE"              , "true")
+		dedup_size        = os.environ.get("MESH_LOGGER_DEDUP_SIZE"           , "10000")
+		dedup_ttl         = os.environ.get("MESH_LOGGER_DEDUP_TTL"            , "600")
+		node_refresh      = os.environ.get("MESH_LOGGER_NODE_REFRESH"         , "3600")
 		debug             = os.environ.get("MESH_LOGGER_DEBUG"                , "false")
 		trace             = os.environ.get("MESH_LOGGER_TRACE"                , "false")
 
+		devices           = [device.strip() for device in devices.split(",") if device.strip()]
 		print_stats_every = int(print_stats_every)
+		flush_rows        = int(flush_rows)
+		flush_ms          = int(flush_ms)
+		buffer_max        = int(buffer_max)
+		queue_size        = int(queue_size)
+		num_workers       = int(num_workers)
+		dedup_size        = int(dedup_size)
+		dedup_ttl         = int(dedup_ttl)
+		node_refresh      = int(node_refresh)
+		trusted           = trusted.lower()   in "1,t,y,true,yes".split(",")
+		archive           = archive.lower()   in "1,t,y,true,yes".split(",")
 		debug             = debug.lower()     in "1,t,y,true,yes".split(",")
 		trace             = trace.lower()     in "1,t,y,true,yes".split(",")
 
 		assert db_filename
 		assert mode.lower() in "local,http".split(",")
+		assert flush_rows > 0
+		assert flush_ms  >= 0
+		assert buffer_max >= 0
+		assert queue_size >= 0
+		assert num_workers >= 0
+		assert dedup_ttl > 0
+		assert node_refresh >= 0
 
 		for k,v in (overrides if overrides else {}).items():
 			if k in locals():
@@ -33,7 +73,18 @@ class Config:
 		inst              = cls(
 			db_filename       = db_filename,
 			mode              = mode,
+			devices           = devices,
 			print_stats_every = print_stats_every,
+			flush_rows        = flush_rows,
+			flush_ms          = flush_ms,
+			buffer_max        = buffer_max,
+			queue_size        = queue_size,
+			num_workers       = num_workers,
+			trusted           = trusted,
+			archive           = archive,
+			dedup_size        = dedup_size,
+			dedup_ttl         = dedup_ttl,
+			node_refresh      = node_refresh,
 			debug             = debug,
 			trace             = trace
 		)
@@ -41,7 +92,18 @@ class Config:
 		if verbose:
 			print(f"db_filename      : {inst.db_filename}")
 			print(f"mode             : {inst.mode}")
+			print(f"devices          : {inst.devices}")
 			print(f"print_stats_every: {inst.print_stats_every}")
+			print(f"flush_rows       : {inst.flush_rows}")
+			print(f"flush_ms         : {inst.flush_ms}")
+			print(f"buffer_max       : {inst.buffer_max}")
+			print(f"queue_size       : {inst.queue_size}")
+			print(f"num_workers      : {inst.num_workers}")
+			print(f"trusted          : {inst.trusted}")
+			print(f"archive          : {inst.archive}")
+			print(f"dedup_size       : {inst.dedup_size}")
+			print(f"dedup_ttl        : {inst.dedup_ttl}")
+			print(f"node_refresh     : {inst.node_refresh}")
 			print(f"debug            : {inst.debug}")
 			print(f"trace            : {inst.trace}")
 
@@ -51,20 +113,63 @@ class Config:
 class ConfigLocal:
 	memory_limit_mb  : int
 	read_only        : bool
-	pooled           : bool
+	readers          : int
 	echo             : bool
+	fast_insert      : bool
+	tier_dir         : str
+	tier_after_days  : int
+	tier_partition   : str
+	tier_every       : int
+	retention        : dict[str, int]
+	retention_every  : int
+	retention_batch  : int
+	query_timeout    : float
+	cache_size       : int
+	cache_bucket     : int
 
 	@classmethod
 	def load_env(cls, overrides: dict[str, typing.Any] = None, verbose: bool = False):
 		memory_limit_mb   = os.environ.get("MESH_LOGGER_LOCAL_MEMORY_LIMIT_MB", "64")
 		read_only         = os.environ.get("MESH_LOGGER_LOCAL_READ_ONLY"      , "false")
-		pooled            = os.environ.get("MESH_LOGGER_LOCAL_POOLED"         , "true")
+		readers           = os.environ.get("MESH_LOGGER_LOCAL_READERS"        , "8")
 		echo              = os.environ.get("MESH_LOGGER_LOCAL_SQL_ECHO"       , "false")
+		fast_insert       = os.environ.get("MESH_LOGGER_LOCAL_FAST_INSERT"    , "true")
+		tier_dir          = os.environ.get("MESH_LOGGER_LOCAL_TIER_DIR"       , "dbs/cold")
+		tier_after_days   = os.environ.get("MESH_LOGGER_LOCAL_TIER_AFTER_DAYS", "0")
+		tier_partition    = os.environ.get("MESH_LOGGER_LOCAL_TIER_PARTITION" , "month")
+		tier_every        = os.environ.get("MESH_LOGGER_LOCAL_TIER_EVERY"     , "3600")
+		retention         = os.environ.get("MESH_LOGGER_LOCAL_RETENTION"      , "") # days per table. nodes=30,telemetry=90
+		retention_every   = os.environ.get("MESH_LOGGER_LOCAL_RETENTION_EVERY", "3600")
+		retention_batch   = os.environ.get("MESH_LOGGER_LOCAL_RETENTION_BATCH", "10000")
+		query_timeout     = os.environ.get("MESH_LOGGER_LOCAL_QUERY_TIMEOUT"  , "30") # seconds. 0 to wait forever
+		cache_size        = os.environ.get("MESH_LOGGER_LOCAL_QUERY_CACHE_SIZE"  , "256") # results. 0 to disable
+		cache_bucket      = os.environ.get("MESH_LOGGER_LOCAL_QUERY_CACHE_BUCKET", "5") # seconds a relative time window is served from the cache
 
 		memory_limit_mb   = int(memory_limit_mb)
 		read_only         = read_only.lower() in "1,t,y,true,yes".split(",")
-		pooled            = pooled.lower()    in "1,t,y,true,yes".split(",")
+		readers           = int(readers)
 		echo              = echo.lower()      in "1,t,y,true,yes".split(",")
+		fast_insert       = fast_insert.lower() in "1,t,y,true,yes".split(",")
+		tier_after_days   = int(tier_after_days)
+		tier_every        = int(tier_every)
+		retention         = {table.strip(): int(days) for table, days in (item.split("=") for item in retention.split(",") if item.strip())}
+		retention_every   = int(retention_every)
+		retention_batch   = int(retention_batch)
+		query_timeout     = float(query_timeout)
+		cache_size        = int(cache_size)
+		cache_bucket      = int(cache_bucket)
+
+		assert readers > 0
+		assert tier_dir
+		assert tier_after_days >= 0
+		assert tier_partition in "day,month".split(",")
+		assert tier_every > 0
+		assert all(days > 0 for days in retention.values())
+		assert retention_every > 0
+		assert retention_batch > 0
+		assert query_timeout >= 0
+		assert cache_size >= 0
+		assert cache_bucket >= 0
 
 		for k,v in (overrides if overrides else {}).items():
 			if k in locals():
@@ -73,31 +178,67 @@ class ConfigLocal:
 		inst              = cls(
 			memory_limit_mb = memory_limit_mb,
 			read_only       = read_only,
-			pooled          = pooled,
-			echo            = echo
+			readers         = readers,
+			echo            = echo,
+			fast_insert     = fast_insert,
+			tier_dir        = tier_dir,
+			tier_after_days = tier_after_days,
+			tier_partition  = tier_partition,
+			tier_every      = tier_every,
+			retention       = retention,
+			retention_every = retention_every,
+			retention_batch = retention_batch,
+			query_timeout   = query_timeout,
+			cache_size      = cache_size,
+			cache_bucket    = cache_bucket
 		)
 
 		if verbose:
 			print(f"memory_limit_mb  : {inst.memory_limit_mb}")
 			print(f"read_only        : {inst.read_only}")
-			print(f"pooled           : {inst.pooled}")
+			print(f"readers          : {inst.readers}")
 			print(f"echo             : {inst.echo}")
+			print(f"fast_insert      : {inst.fast_insert}")
+			print(f"tier_dir         : {inst.tier_dir}")
+			print(f"tier_after_days  : {inst.tier_after_days}")
+			print(f"tier_partition   : {inst.tier_partition}")
+			print(f"tier_every       : {inst.tier_every}")
+			print(f"retention        : {inst.retention}")
+			print(f"retention_every  : {inst.retention_every}")
+			print(f"retention_batch  : {inst.retention_batch}")
+			print(f"query_timeout    : {inst.query_timeout}")
+			print(f"cache_size       : {inst.cache_size}")
+			print(f"cache_bucket     : {inst.cache_bucket}")
 
 		return inst
 
 @dataclasses.dataclass
 class ConfigRemoteHttp:
-	proto   : str
-	host    : str
-	port    : int
+	proto     : str
+	host      : str
+	port      : int
+	timeout   : float
+	retries   : int
+	backoff   : float
+	pool_size : int
+	spool_dir : str
 
 	@classmethod
 	def load_env(cls, overrides: dict[str, typing.Any] = None, verbose: bool = False):
 		proto             = os.environ.get("MESH_LOGGER_REMOTE_HTTP_PROTO"    , "http")
 		host              = os.environ.get("MESH_LOGGER_REMOTE_HTTP_HOST"     , "127.0.0.1")
 		port              = os.environ.get("MESH_LOGGER_REMOTE_HTTP_PORT"     , "8000")
+		timeout           = os.environ.get("MESH_LOGGER_REMOTE_HTTP_TIMEOUT"  , "5")
+		retries           = os.environ.get("MESH_LOGGER_REMOTE_HTTP_RETRIES"  , "3")
+		backoff           = os.environ.get("MESH_LOGGER_REMOTE_HTTP_BACKOFF"  , "0.5")
+		pool_size         = os.environ.get("MESH_LOGGER_REMOTE_HTTP_POOL_SIZE", "4")
+		spool_dir         = os.environ.get("MESH_LOGGER_REMOTE_HTTP_SPOOL_DIR", "spool")
 
 		port              = int(port)
+		timeout           = float(timeout)
+		retries           = int(retries)
+		backoff           = float(backoff)
+		pool_size         = int(pool_size)
 
 		assert proto.lower() in "http,https".split(",")
 
@@ -109,12 +250,17 @@ class ConfigRemoteHttp:
 			if k in locals():
 				locals()[k] = v
 
-		inst = cls(proto=proto, host=host, port=port)
+		inst = cls(proto=proto, host=host, port=port, timeout=timeout, retries=retries, backoff=backoff, pool_size=pool_size, spool_dir=spool_dir)
 
 		if verbose:
 			print(f"proto            : {inst.proto}")
 			print(f"host             : {inst.host}")
 			print(f"port             : {inst.port}")
+			print(f"timeout          : {inst.timeout}")
+			print(f"retries          : {inst.retries}")
+			print(f"backoff          : {inst.backoff}")
+			print(f"pool_size        : {inst.pool_size}")
+			print(f"spool_dir        : {inst.spool_dir}")
 
 		return inst
 
@@ -1,26 +1,70 @@
+import os
 import sys
+import json
+import hashlib
+import time
+import queue
 import typing
+import threading
 import requests
 from functools import lru_cache
 
 from typing import Annotated, Generator
 
-from sqlalchemy.pool import NullPool
+from requests.adapters import HTTPAdapter
+from urllib3.util      import Retry
+
+import duckdb
+
+from duckdb_engine   import ConnectionWrapper
+from sqlalchemy.pool import QueuePool, StaticPool
 
 from fastapi import Depends
 
 from sqlmodel import SQLModel, create_engine, Session
 
 from .config     import Config, ConfigLocal, ConfigRemoteHttp
-from .dbgenerics import GenericSession, GenericSessionManager, DbEngine
-from .           import models
+from .dbgenerics import GenericSession, GenericSessionManager, DbEngine, DeliveryError
+from .spool      import Spool
+from .dbexec     import run_db
+from .dedup      import DedupCache, NodeFingerprints, fold_duplicates, message_keys
+from .           import models, dbexec
 
 class DbEngineHTTP(DbEngine):
-	def __init__(self, host: str, port: int, proto: str = "http", debug=False):
-		self.host        = host
-		self.port        = port
-		self.proto       = proto
-		self.debug       = debug
+	def __init__(self, host: str, port: int, proto: str = "http", timeout: float = 5.0, retries: int = 3, backoff: float = 0.5, pool_size: int = 4, spool_dir: str | None = None, debug=False):
+		self.host         = host
+		self.port         = port
+		self.proto        = proto
+		self.timeout      = timeout
+		self.debug        = debug
+		self.spool        = Spool(spool_dir) if spool_dir else None
+		self.num_posts    = 0
+		self.num_spooled  = 0
+		self.num_replayed = 0
+
+		# keep-alive connections, retrying with backoff only when the request never reached the server.
+		# a POST which timed out or failed with a 5xx may still have been stored. it is spooled (or
+		# buffered again) and sent later with the same Idempotency-Key, which the server skips if stored
+		# https://urllib3.readthedocs.io/en/stable/reference/urllib3.util.html#urllib3.util.Retry
+		# only connect errors are retried: read, status and other are 0. allowed_methods is left at its
+		# default, it only gates read and status retries, which are off anyway
+		retry             = Retry(
+			total             = retries,
+			connect           = retries,
+			read              = 0,
+			status            = 0,
+			other             = 0,
+			backoff_factor    = backoff,
+			raise_on_status   = False
+		)
+		adapter           = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+		self.session      = requests.Session()
+		self.session.mount("http://" , adapter)
+		self.session.mount("https://", adapter)
+
+	def __del__(self):
+		self.session.close()
 
 	@property
 	def url(self) -> str:
@@ -33,35 +77,101 @@ class DbEngineHTTP(DbEngine):
 	def get_add_url(self, model_name: str) -> str:
 		return f"{self.url_add}/{model_name.lower()}"
 
-	def get_session_manager(self):
+	def get_add_batch_url(self, model_name: str) -> str:
+		return f"{self.get_add_url(model_name)}/batch"
+
+	def get_session_manager(self, read_only: bool = False):
 		return DbEngineHTTP.SessionManager(self)
 
-	def post(self, instance) -> dict[str, int]:
-		if self.debug: print("POSTING", instance)
+	@property
+	def stats(self) -> dict[str, int]:
+		return {
+			"num_posts"   : self.num_posts,
+			"num_spooled" : self.num_spooled,
+			"num_replayed": self.num_replayed,
+			"spooled"     : len(self.spool) if self.spool else 0
+		}
 
-		table_name = instance.__class__.__tablename__
-		data       = instance.toDICT()
-		url        = self.get_add_url(table_name)
+	def send(self, table_name: str, data: list[dict[str, typing.Any]]) -> bool:
+		# returns False when the server could not be reached and the batch should be kept
+		url = self.get_add_batch_url(table_name)
 
 		if self.debug:
+			print("POSTING BATCH")
 			print("  TABLE", table_name)
-			print("  DATA ", data)
+			print("  SIZE ", len(data))
 			print("  URL  ", url)
 
+		# the same rows always carry the same key, e.g. when replayed from the spool
+		body    = json.dumps(data, sort_keys=True, default=str)
+		headers = {
+			"Content-Type"   : "application/json",
+			"Idempotency-Key": hashlib.sha1(body.encode()).hexdigest()
+		}
+
 		try:
-			res        = requests.post(url, json = data)
-		except requests.exceptions.ConnectionError as e:
+			res = self.session.post(url, data = body, headers = headers, timeout = self.timeout)
+		except requests.exceptions.RequestException as e:
 			print(e, file=sys.stderr)
-			print()
-			return
+			return False
 
 		if self.debug:
 			print("  RES  ", res)
 			print("  RES  ", res.text)
-			#print("  RES  ", res.request.body)
 			print()
 
-		return { table_name.upper(): 1 }
+		self.num_posts += 1
+
+		if res.status_code >= 500:
+			print(f"server error {res.status_code} posting {table_name}: {res.text}", file=sys.stderr)
+			return False
+
+		if res.status_code >= 400:
+			# the server will never accept this batch. do not spool it
+			print(f"rejected {table_name} batch {res.status_code}: {res.text}", file=sys.stderr)
+
+		return True
+
+	def post(self, instance) -> dict[str, int]:
+		if self.debug: print("POSTING", instance)
+
+		return self.post_batch(instance.__class__.__tablename__, [instance])
+
+	def post_batch(self, table_name: str, instances) -> dict[str, int]:
+		data = [instance.toJSONDICT() for instance in instances]
+
+		if not self.send(table_name, data):
+			if self.spool is None:
+				raise DeliveryError(f"could not deliver {len(data)} {table_name} rows", instances)
+
+			self.spool.append(table_name, data)
+			self.num_spooled += len(data)
+			return {}
+
+		if self.spool is not None and len(self.spool) > 0:
+			self.num_replayed += self.spool.replay(self.send)
+
+		return { table_name.upper(): len(data) }
+
+	def add_instances(self, instances) -> dict[str, int]:
+		# one request per table instead of one request per instance
+		tables = {}
+		for instance in instances:
+			tables.setdefault(instance.__class__.__tablename__, []).append(instance)
+
+		stats       = {}
+		undelivered = []
+		for table_name, table_instances in tables.items():
+			try:
+				stats.update(self.post_batch(table_name, table_instances))
+			except DeliveryError as e:
+				undelivered.extend(e.instances)
+
+		# the tables which did go through are not sent again
+		if undelivered:
+			raise DeliveryError(f"could not deliver {len(undelivered)} rows", undelivered, stats)
+
+		return stats
 
 	class Session(GenericSession):
 		def __init__(self, db_engine):
@@ -88,30 +198,71 @@ class DbEngineHTTP(DbEngine):
 			pass
 
 class DbEngineLocal(DbEngine):
-	def __init__(self, db_filename: str, memory_limit_mb: int = 64, threads: int = 1, read_only: bool = False, pooled: bool = False, echo: bool = False, debug: bool = False):
+	def __init__(self, db_filename: str, memory_limit_mb: int = 64, threads: int = 1, read_only: bool = False, readers: int = 8, echo: bool = False, fast_insert: bool = True, tier_dir: str = "dbs/cold", tier_after_days: int = 0, tier_partition: str = "month", tier_every: int = 3600, retention: dict[str, int] | None = None, retention_every: int = 3600, retention_batch: int = 10_000, debug: bool = False):
 		self.db_filename     = db_filename
 		self.memory_limit_mb = memory_limit_mb
 		self.read_only       = read_only
+		self.readers         = readers
 		self.echo            = echo
+		self.fast_insert     = fast_insert
+		self.tier_dir        = tier_dir
+		self.tier_after_days = tier_after_days
+		self.tier_partition  = tier_partition
+		self.tier_every      = tier_every
+		self.retention       = retention or {}
+		self.retention_every = retention_every
+		self.retention_batch = retention_batch
 		self.debug           = debug
+		self.num_moved       = 0
+		self.num_deleted     = 0
+		self.num_checkpoints = 0
+
+		for table_name in self.retention:
+			assert table_name in [cls.__tablename__ for cls in models.RETAINED], f"no retention allowed on {table_name}. valid: {', '.join(cls.__tablename__ for cls in models.RETAINED)}"
+
+		self.database        = None
 		self.engine          = None
+		self.reader          = None
 		self.Base            = None
 
+		# one duckdb database per process. every connection below is a cursor off it, which
+		# shares its buffer pool and sees its commits, without opening the file again.
+		#   engine: the single writer connection. one write session at a time, the others wait on write_lock
+		#   reader: a pool of long lived reader connections, so dashboard reads never wait on ingestion
+		# https://duckdb.org/docs/api/python/dbapi#connection
 		print(f"creating SQLMODEL database")
-		print(f"  creating engine")
+		print(f"  opening database")
+		self.database        = duckdb.connect(
+			f"dbs/{self.db_filename}",
+			read_only = self.read_only,
+			config    = {
+				'memory_limit': f'{memory_limit_mb}mb',
+				'max_memory': f'{memory_limit_mb}mb',
+				'threads'     : threads
+			}
+		)
+		self.write_lock      = threading.Lock()
+
+		print(f"  creating engines")
 		self.engine          = create_engine(
-			f"duckdb:///dbs/{self.db_filename}",
-			connect_args = {
-				'read_only': self.read_only,
-				'config': {
-					'memory_limit': f'{memory_limit_mb}mb',
-					'max_memory': f'{memory_limit_mb}mb',
-					'threads'     : threads
-				}
-			},
-			echo = echo,
-			**({} if pooled else {"poolclass": NullPool})
+			"duckdb://",
+			creator   = self.cursor,
+			poolclass = StaticPool,
+			echo      = echo
 		)
+		self.reader          = create_engine(
+			"duckdb://",
+			creator      = self.cursor,
+			poolclass    = QueuePool,
+			pool_size    = readers,
+			max_overflow = 0,
+			echo         = echo
+		)
+
+		# so the calls run by dbexec can interrupt the queries of these engines.
+		# the executor itself is process wide, configured once at startup (dbExecFromConfig)
+		dbexec.track(self.engine)
+		dbexec.track(self.reader)
 
 		print(f"  creating sequences")
 		#self.Base.metadata.create_all(self.engine)
@@ -125,30 +276,140 @@ class DbEngineLocal(DbEngine):
 		print(f"  creating tables")
 		SQLModel.metadata.create_all(self.engine)
 
+		if not self.read_only:
+			print(f"  migrating tables")
+			self.migrate()
+
+		print(f"  loading cold tier")
+		with Session(bind=self.engine) as session:
+			models.tier_load(session, self.tier_dir, read_only=self.read_only)
+			session.commit()
+
 		print(f"  created")
 
 	def __del__(self):
+		if self.reader:
+			self.reader.dispose()
 		if self.engine:
 			self.engine.dispose()
+		if self.database:
+			self.database.close()
+
+	def cursor(self) -> ConnectionWrapper:
+		return ConnectionWrapper(self.database.cursor())
+
+	def migrate(self):
+		# create_all only creates missing tables. columns added to a model
+		# after its table was created are appended here, as nullable.
+		# not sqlalchemy's inspector, which reads pg_catalog tables duckdb does not have
+		with self.engine.begin() as con:
+			existing = set(con.exec_driver_sql("SELECT table_name, column_name FROM information_schema.columns WHERE table_schema = current_schema()").fetchall())
+
+			for table in SQLModel.metadata.sorted_tables:
+				for column in table.columns:
+					if (table.name, column.name) in existing:
+						continue
+
+					column_type = column.type.compile(dialect=self.engine.dialect)
+					print(f"    adding column {table.name}.{column.name} {column_type}")
+					con.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+
+		with Session(bind=self.engine) as session:
+			if models.backfill_rollups(session):
+				print(f"    rebuilt telemetry rollups")
+				session.commit()
+
+			if models.backfill_node_state(session):
+				print(f"    rebuilt node state")
+				session.commit()
+
+	def get_session_manager(self, read_only: bool = False) -> GenericSessionManager:
+		return DbEngineLocal.SessionManager(self, read_only=read_only)
+
+	def tier(self) -> dict[str, int]:
+		# moves whole days or months older than tier_after_days to the parquet cold tier
+		before = models.tier_partition_start(int(time.time()) - self.tier_after_days * 86400, self.tier_partition)
+
+		stats  = models.tier_run(self.get_session_manager(), before=before, partition=self.tier_partition, tier_dir=self.tier_dir)
+
+		self.num_moved += sum(stats.values())
+
+		if stats:
+			print( f"moved to the cold tier before {before}: " + "".join(f"{k}: {v:12,d} | " for k, v in sorted(stats.items())) )
+
+		return stats
+
+	def retain(self) -> dict[str, int]:
+		# deletes the rows past each table's retention, then checkpoints so the freed blocks are reused
+		stats = models.retention_run(self.get_session_manager(), self.retention, now=int(time.time()), batch_size=self.retention_batch, tier_dir=self.tier_dir)
+
+		self.checkpoint()
+		self.num_deleted += sum(v for k, v in stats.items() if not k.endswith("_FILES"))
+
+		print( "retention: " + "".join(f"{k}: {v:12,d} | " for k, v in sorted({**stats, **self.stats}.items())) )
 
-	def get_session_manager(self) -> GenericSessionManager:
-		return DbEngineLocal.SessionManager(self)
+		return stats
+
+	def checkpoint(self):
+		# fails while another connection has a transaction open. the next run tries again
+		try:
+			with self.write_lock, self.engine.connect() as con:
+				con.exec_driver_sql("CHECKPOINT")
+			self.num_checkpoints += 1
+		except Exception as e:
+			print(f"checkpoint skipped: {e}", file=sys.stderr)
+
+	@property
+	def stats(self) -> dict[str, int]:
+		db_path = f"dbs/{self.db_filename}"
+		return {
+			"db_bytes"       : os.path.getsize(db_path) if os.path.exists(db_path) else 0,
+			"wal_bytes"      : os.path.getsize(f"{db_path}.wal") if os.path.exists(f"{db_path}.wal") else 0,
+			"cold_bytes"     : models.tier_bytes(self.tier_dir),
+			"num_moved"      : self.num_moved,
+			"num_deleted"    : self.num_deleted,
+			"num_checkpoints": self.num_checkpoints,
+			**models.query_cache.stats,
+		}
+
+	def add_instances(self, instances) -> dict[str, int]:
+		# columnar insert, one statement per table, unless fast_insert is off
+		with self.get_session_manager() as session:
+			stats = models.bulk_insert(session, instances)
+			session.commit()
+
+		return stats
 
 	class SessionManager(GenericSessionManager):
-		def __init__(self, db_engine: "DbEngine"):
+		def __init__(self, db_engine: "DbEngine", read_only: bool = False):
 			self.db_engine = db_engine
+			self.read_only = read_only
 
 		def __enter__(self) -> GenericSession:
 			#print(f"  creating session")
 
-			self.session = Session(bind=self.db_engine.engine)
+			if self.read_only:
+				self.session = Session(bind=self.db_engine.reader)
+				return self.session
+
+			# released in __exit__, which fastapi may run on another thread. hence a Lock, not an RLock
+			self.db_engine.write_lock.acquire()
+			self.session = Session(bind=self.db_engine.engine, info={"fast_insert": self.db_engine.fast_insert})
 			return self.session
 
 		def __exit__(self, type, value, traceback):
 			#print(f"  closing session")
-			self.session.commit()
-			self.session.close()
-			del self.session
+			# an interrupted (timed out) query leaves an aborted transaction behind. rolled back, not committed
+			try:
+				if type is None:
+					self.session.commit()
+				else:
+					self.session.rollback()
+			finally:
+				self.session.close()
+				del self.session
+				if not self.read_only:
+					self.db_engine.write_lock.release()
 
 
 
@@ -159,18 +420,37 @@ def dbEngineLocalFromConfig(*, config: Config, config_local: ConfigLocal) -> DbE
 		db_filename     = config.db_filename,
 		memory_limit_mb = config_local.memory_limit_mb,
 		read_only       = config_local.read_only,
-		pooled          = config_local.pooled,
+		readers         = config_local.readers,
 		echo            = config_local.echo,
+		fast_insert     = config_local.fast_insert,
+		tier_dir        = config_local.tier_dir,
+		tier_after_days = config_local.tier_after_days,
+		tier_partition  = config_local.tier_partition,
+		tier_every      = config_local.tier_every,
+		retention       = config_local.retention,
+		retention_every = config_local.retention_every,
+		retention_batch = config_local.retention_batch,
 		debug           = config.debug
 	)
 
 	return db_engine
 
+def dbExecFromConfig(*, config_local: ConfigLocal):
+	# the executor and the query cache are process wide, shared by every engine.
+	# the blocking calls of the endpoints run on a pool as large as the connections they can use
+	dbexec.configure(workers=config_local.readers + 1, timeout=config_local.query_timeout or None)
+	models.query_cache.configure(size=config_local.cache_size, bucket=config_local.cache_bucket)
+
 def dbEngineRemoteHttpFromConfig(*, config: Config, config_remote_http: ConfigRemoteHttp) -> DbEngine:
 	db_engine   = DbEngineHTTP(
 		proto           = config_remote_http.proto,
 		host            = config_remote_http.host,
 		port            = config_remote_http.port,
+		timeout         = config_remote_http.timeout,
+		retries         = config_remote_http.retries,
+		backoff         = config_remote_http.backoff,
+		pool_size       = config_remote_http.pool_size,
+		spool_dir       = config_remote_http.spool_dir,
 		debug           = config.debug
 	)
 
@@ -186,6 +466,10 @@ def dbEngineLocalFromEnv(*, overrides: dict[str, typing.Any] = None, verbose: bo
 	db_engine           = dbEngineLocalFromConfig(config=config, config_local=config_local)
 	return db_engine
 
+def dbExecFromEnv(*, overrides: dict[str, typing.Any] = None, verbose: bool = False):
+	config_local        = ConfigLocal.load_env(overrides=overrides, verbose=verbose)
+	dbExecFromConfig(config_local=config_local)
+
 def dbEngineRemoteHttpFromEnv(*, overrides: dict[str, typing.Any] = None, verbose : bool = False) -> DbEngine:
 	config              = Config          .load_env(overrides=overrides, verbose=verbose)
 	config_remote_http  = ConfigRemoteHttp.load_env(overrides=overrides, verbose=verbose)
@@ -197,12 +481,53 @@ def dbEngineRemoteHttpFromEnv(*, overrides: dict[str, typing.Any] = None, verbos
 
 
 class DbManager:
-	def __init__(self, db_engine: DbEngine):
+	def __init__(self, db_engine: DbEngine, flush_rows: int = 1, flush_ms: int = 0, buffer_max: int = 0, queue_size: int = 0, num_workers: int = 0, trusted: bool = False, archive: bool = False, dedup: DedupCache | None = None, node_fingerprints: NodeFingerprints | None = None, debug: bool = False):
 		self.num_messages = 0
 		self.num_nodes    = 0
 		self.num_adds     = 0
+		self.num_flushes  = 0
+		self.num_dropped  = 0
+		self.num_errors   = 0
+		self.num_duplicates = 0
 		self.class_stats  = {}
+		self.stats_lock   = threading.Lock() # counted from the radio callback, the workers and the flusher at once
 		self.db_engine    = db_engine
+		self.trusted      = trusted
+		self.archive      = archive
+		self.dedup        = dedup
+		self.node_fingerprints = node_fingerprints
+		self.debug        = debug
+
+		# buffered ingestion. flushes when flush_rows are buffered or
+		# when the oldest buffered row is flush_ms old, whichever comes first.
+		# rows of a failed flush are buffered again, up to buffer_max (0 unbounded), oldest dropped first,
+		# and not flushed again before retry_at. flush_ms later, and at least a second
+		self.flush_rows   = flush_rows
+		self.flush_ms     = flush_ms
+		self.buffer_max   = buffer_max
+		self.buffer       = []
+		self.buffer_since = None
+		self.retry_s      = max(flush_ms, 1000) / 1000.0
+		self.retry_at     = 0.0
+		self.buffer_lock  = threading.Lock()
+		self.flush_lock   = threading.Lock()
+		self.flush_wakeup = threading.Event()
+		self.flush_stop   = threading.Event()
+		self.flusher      = None
+
+		if self.flush_ms > 0:
+			self.flusher  = threading.Thread(target=self._flush_loop, name="DbManagerFlusher", daemon=True)
+			self.flusher.start()
+
+		# decoding pipeline. the radio callback only enqueues the raw packet,
+		# workers decode it and hand it to the buffer
+		self.packets      = queue.Queue(maxsize=queue_size)
+		self.workers      = [
+			threading.Thread(target=self._decode_loop, name=f"DbManagerWorker{w}", daemon=True)
+			for w in range(num_workers)
+		]
+		for worker in self.workers:
+			worker.start()
 
 		# https://github.com/Mause/duckdb_engine
 		# https://docs.sqlalchemy.org/en/20/orm/mapping_api.html
@@ -216,29 +541,242 @@ class DbManager:
 	def __del__(self):
 		del self.db_engine
 
-	def decode_packet(self, packet):
-		self.num_messages += 1
-		return models.decode_packet(packet)
+	def decode_packet(self, packet, gateway_receive_time: int | None = None, gateway_id: str | None = None):
+		with self.stats_lock:
+			self.num_messages += 1
+		return models.decode_packet(packet, trusted=self.trusted, gateway_receive_time=gateway_receive_time, gateway_id=gateway_id)
+
+	def submit_packet(self, packet, gateway_id: str | None = None, block: bool = False):
+		# the radio callback never blocks. a full queue drops the packet instead
+		if len(self.workers) == 0:
+			self._process_packet(packet, gateway_id=gateway_id)
+			return
+
+		try:
+			self.packets.put((packet, gateway_id), block=block)
+		except queue.Full:
+			with self.stats_lock:
+				self.num_dropped += 1
+
+	def _process_packet(self, packet, gateway_id: str | None = None):
+		# runs on the radio callback when there are no workers. never let it raise there
+		gateway_receive_time = int(time.time())
+		instances            = []
+
+		try:
+			if self.archive:
+				# archived before decoding, so packets that fail to decode can be reprocessed later
+				instances.append(models.archive_packet(packet, gateway_receive_time=gateway_receive_time, gateway_id=gateway_id))
+
+			message = self.decode_packet(packet, gateway_receive_time=gateway_receive_time, gateway_id=gateway_id)
+
+			if message:
+				if self.debug:
+					print(message)
+
+				# a message heard again through another relay only adds a reception.
+				# claimed while buffered, and forgotten again if the buffer drops it
+				folded = fold_duplicates(self.dedup, [message], models.ReceptionClass.from_message, mark=True)[0][0]
+				if folded is not message:
+					with self.stats_lock:
+						self.num_duplicates += 1
+
+				instances.append(folded)
+
+		except Exception as e:
+			with self.stats_lock:
+				self.num_errors += 1
+			print(f"error processing packet: {e}", file=sys.stderr)
+
+		try:
+			if instances:
+				self.buffer_instances(instances)
+		except Exception as e:
+			with self.stats_lock:
+				self.num_errors += 1
+			print(f"error buffering packet: {e}", file=sys.stderr)
+
+	def _decode_loop(self):
+		while True:
+			item = self.packets.get()
+
+			if item is None:
+				self.packets.task_done()
+				break
+
+			try:
+				packet, gateway_id = item
+				self._process_packet(packet, gateway_id=gateway_id)
+			finally:
+				self.packets.task_done()
+
+	def decode_nodes(self, nodes, gateway_id: str | None = None) -> list[models.Nodes]:
+		instances       = models.decode_nodes(nodes, trusted=self.trusted, gateway_id=gateway_id)
+		with self.stats_lock:
+			self.num_nodes += len(instances)
+
+		# nodes the radio reports unchanged since they were last sent are not sent again
+		if self.node_fingerprints is not None:
+			instances   = self.node_fingerprints.changed(instances)
 
-	def decode_nodes(self, nodes) -> list[models.Nodes]:
-		instances       = models.decode_nodes(nodes)
-		self.num_nodes += len(instances)
 		return instances
 
 	def add_instances(self, instances):
-		res              = self.db_engine.add_instances(instances)
-		self.num_adds   += len(instances)
-		for k,v in res.items(): self.class_stats[k] = self.class_stats.get(k,0) + v
+		with self.flush_lock:
+			try:
+				res              = self.db_engine.add_instances(instances)
+			except DeliveryError as e:
+				# part of the batch may have gone through
+				with self.stats_lock:
+					for k,v in e.stats.items(): self.class_stats[k] = self.class_stats.get(k,0) + v
+				raise
+
+			with self.stats_lock:
+				self.num_adds   += len(instances)
+				for k,v in res.items(): self.class_stats[k] = self.class_stats.get(k,0) + v
+
+	def buffer_instances(self, instances):
+		if len(instances) == 0:
+			return
+
+		with self.buffer_lock:
+			if len(self.buffer) == 0:
+				self.buffer_since = time.monotonic()
+				self.flush_wakeup.set()
+
+			self.buffer.extend(instances)
+			self._trim_buffer()
+
+			# after a failed flush the buffer stays full. the flusher retries it, not every new packet
+			is_due  = time.monotonic() >= self.retry_at
+			is_full = len(self.buffer) >= self.flush_rows
+
+		if is_due and (is_full or self.flusher is None):
+			self.flush()
+
+	def _trim_buffer(self):
+		# called with buffer_lock held
+		num_over = len(self.buffer) - self.buffer_max
+		if self.buffer_max <= 0 or num_over <= 0:
+			return
+
+		dropped           = self.buffer[:num_over]
+		self.buffer       = self.buffer[num_over:]
+		with self.stats_lock:
+			self.num_dropped += num_over
+		self.forget(dropped)
+		print(f"buffer full, dropped the {num_over} oldest rows", file=sys.stderr)
+
+	def forget(self, instances):
+		# never stored. a copy heard later is stored whole instead of as a reception
+		if self.dedup is not None:
+			self.dedup.forget(message_keys(instances))
+
+	def record_nodes(self, instances):
+		# delivered nodes are not sent again until they change
+		if self.node_fingerprints is not None:
+			self.node_fingerprints.record([instance for instance in instances if isinstance(instance, models.NodesClass)])
+
+	def requeue(self, instances):
+		# back in front of the rows buffered since, retried flush_ms (or retry_s) from now
+		with self.buffer_lock:
+			self.buffer       = instances + self.buffer
+			self.buffer_since = time.monotonic()
+			self.retry_at     = self.buffer_since + self.retry_s
+			self._trim_buffer()
+
+		self.flush_wakeup.set()
+
+	def flush(self):
+		with self.buffer_lock:
+			instances         = self.buffer
+			self.buffer       = []
+			self.buffer_since = None
+
+		if len(instances) == 0:
+			return
+
+		try:
+			self.add_instances(instances)
+		except DeliveryError as e:
+			undelivered = set(map(id, e.instances))
+			self.record_nodes([instance for instance in instances if id(instance) not in undelivered])
+			self.requeue(e.instances)
+			raise
+		except Exception:
+			self.requeue(instances)
+			raise
+
+		self.record_nodes(instances)
+
+		with self.stats_lock:
+			self.num_flushes += 1
+
+	def _flush_loop(self):
+		flush_s = self.flush_ms / 1000.0
+
+		while not self.flush_stop.is_set():
+			with self.buffer_lock:
+				since    = self.buffer_since
+				retry_at = self.retry_at
+
+			if since is None:
+				self.flush_wakeup.wait()
+				self.flush_wakeup.clear()
+				continue
+
+			remaining = max(since + flush_s, retry_at) - time.monotonic()
+			if remaining > 0:
+				self.flush_stop.wait(remaining)
+				continue
+
+			try:
+				self.flush()
+			except Exception as e:
+				print(f"error flushing buffer: {e}", file=sys.stderr)
+
+	def close(self):
+		for worker in self.workers:
+			self.packets.put(None)
+
+		for worker in self.workers:
+			worker.join()
+
+		self.workers = []
+
+		if self.flusher is not None:
+			self.flush_stop.set()
+			self.flush_wakeup.set()
+			self.flusher.join()
+			self.flusher = None
+
+		try:
+			self.flush()
+		except Exception as e:
+			print(f"error flushing buffer on close, {len(self.buffer)} rows not stored: {e}", file=sys.stderr)
+			self.forget(self.buffer)
 
 	@property
 	def stats(self):
+		with self.stats_lock:
+			class_stats = dict(self.class_stats)
+
 		return {
 			**{
 				(1, "num_messages"): self.num_messages,
 				(1, "num_nodes"   ): self.num_nodes   ,
-				(1, "num_adds"    ): self.num_adds
+				(1, "num_adds"    ): self.num_adds,
+				(1, "num_flushes" ): self.num_flushes,
+				(1, "buffered"    ): len(self.buffer),
+				(1, "queued"      ): self.packets.qsize(),
+				(1, "num_dropped" ): self.num_dropped,
+				(1, "num_errors"  ): self.num_errors,
+				(1, "num_duplicates"): self.num_duplicates
 			},
-			**{ (2, k): v for k,v in self.class_stats.items() }
+			**{ (2, k): v for k,v in class_stats.items() },
+			**{ (3, k): v for k,v in self.db_engine.stats.items() },
+			**{ (3, k): v for k,v in (self.dedup.stats.items() if self.dedup else []) },
+			**{ (3, k): v for k,v in (self.node_fingerprints.stats.items() if self.node_fingerprints else []) }
 		}
 
 
@@ -263,7 +801,7 @@ def get_engine():
 # https://fastapi.tiangolo.com/tutorial/sql-databases/#create-a-session-dependency
 def get_session_manager(read_only:bool) -> Generator[GenericSessionManager, None, None]:
 	engine = get_engine()
-	with engine.get_session_manager() as session_manager:
+	with engine.get_session_manager(read_only=read_only) as session_manager:
 		yield session_manager
 
 def get_session_manager_readonly() -> Generator[GenericSessionManager, None, None]:
@@ -271,8 +809,9 @@ def get_session_manager_readonly() -> Generator[GenericSessionManager, None, Non
 		yield session_manager
 
 def get_session_manager_readwrite() -> Generator[GenericSessionManager, None, None]:
-	for session_manager in get_session_manager(read_only=False):
-		yield session_manager
+	# not entered here. fastapi runs this on its threadpool, which every other dependency needs too.
+	# the write session, and its lock, are taken by the run_db call which writes
+	yield get_engine().get_session_manager(read_only=False)
 
 SessionManagerDepRO = Annotated[GenericSessionManager, Depends(get_session_manager_readonly )]
 SessionManagerDepRW = Annotated[GenericSessionManager, Depends(get_session_manager_readwrite)]
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+import functools
+import concurrent.futures
+
+from fastapi    import HTTPException
+from sqlalchemy import event
+
+# the endpoints are async, the database calls are not. run on the event loop, one slow
+# query would stall every other request, /livez included. they run on this bounded pool instead.
+# past their timeout, or when the request is cancelled, their queries are interrupted.
+# https://duckdb.org/docs/api/python/reference/#duckdb.DuckDBPyConnection.interrupt
+
+executor      = None
+query_timeout = None
+
+calls_local   = threading.local()
+calls         = {} # id(dbapi connection) -> the DbCall which checked it out
+calls_lock    = threading.Lock()
+
+
+class DbCall:
+	# the connections one call has checked out, so they can be interrupted
+	def __init__(self):
+		self.connections = set()
+
+	def interrupt(self):
+		with calls_lock:
+			for connection in self.connections:
+				connection.interrupt()
+
+
+def on_checkout(dbapi_connection, connection_record, connection_proxy):
+	call = getattr(calls_local, "call", None)
+	if call is None:
+		return
+
+	with calls_lock:
+		call.connections.add(dbapi_connection)
+		calls[id(dbapi_connection)] = call
+
+
+def on_checkin(dbapi_connection, connection_record):
+	# back in the pool, possibly used by another request next. never interrupted on this call's behalf
+	with calls_lock:
+		call = calls.pop(id(dbapi_connection), None)
+		if call is not None:
+			call.connections.discard(dbapi_connection)
+
+
+def configure(workers: int, timeout: float | None):
+	global executor, query_timeout
+
+	if executor is not None:
+		executor.shutdown(wait=False)
+
+	executor      = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="DbExec")
+	query_timeout = timeout
+
+
+def track(engine):
+	event.listen(engine, "checkout", on_checkout)
+	event.listen(engine, "checkin" , on_checkin )
+
+
+def run_call(call: DbCall, func, *args, **kwargs):
+	calls_local.call = call
+	try:
+		return func(*args, **kwargs)
+	finally:
+		calls_local.call = None
+
+
+async def run_db(func, *args, timeout: float | None = None, **kwargs):
+	if executor is None:
+		configure(workers=4, timeout=None)
+
+	timeout = query_timeout if timeout is None else timeout
+	call    = DbCall()
+	future  = asyncio.get_running_loop().run_in_executor(executor, functools.partial(run_call, call, func, *args, **kwargs))
+
+	try:
+		return await asyncio.wait_for(future, timeout=timeout)
+
+	except asyncio.TimeoutError:
+		call.interrupt()
+		raise HTTPException(status_code=504, detail=f"QUERY TIMEOUT AFTER {timeout}s")
+
+	except asyncio.CancelledError:
+		call.interrupt()
+		raise
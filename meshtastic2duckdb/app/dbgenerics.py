@@ -1,4 +1,12 @@
 
+class DeliveryError(Exception):
+	# the instances which were neither stored nor kept to be sent again, e.g. the server
+	# could not be reached and there is no spool. the caller is expected to retry them
+	def __init__(self, message: str, instances: list, stats: dict[str, int] | None = None):
+		super().__init__(message)
+		self.instances = instances
+		self.stats     = stats or {}
+
 class GenericSession:
 	def add(self, instance):
 		raise NotImplementedError
@@ -20,9 +28,13 @@ class DbEngine:
 	def __int__():
 		raise NotImplementedError
 
-	def get_session_manager(self):
+	def get_session_manager(self, read_only: bool = False):
 		raise NotImplementedError
 
+	@property
+	def stats(self) -> dict[str, int]:
+		return {}
+
 	def add_instances(self, instances) -> dict[str, int]:
 		stats = {}
 		with self.get_session_manager() as session:
@@ -0,0 +1,208 @@
+import time
+import typing
+import threading
+import collections
+
+from .config import Config
+
+# the same packet reaches a gateway several times through different relays, and
+# reaches the server once per gateway. only the first copy is stored as a full row.
+# later copies of the same (from_node, message_id) become reception rows.
+
+# Idempotency-Key of the batches already stored. a batch sent again, because its response was
+# lost or it was replayed from the logger's spool, is skipped. kept long enough for a spool to drain
+BATCH_KEYS_SIZE = 10_000
+BATCH_KEYS_TTL  = 24 * 3600
+
+
+class DedupCache:
+	# bounded set of recently stored keys. a key is forgotten ttl seconds after it
+	# was marked, or earlier when the cache is full, oldest first.
+	# seen() only looks. a key is marked once its message is stored (or claimed by a buffer
+	# which keeps it until stored), so a failed store does not turn its retry into a reception
+	def __init__(self, size: int, ttl: float):
+		self.size       = size
+		self.ttl        = ttl
+		self.keys       = collections.OrderedDict()
+		self.lock       = threading.Lock()
+		self.num_hits   = 0
+		self.num_misses = 0
+
+	def __len__(self) -> int:
+		return len(self.keys)
+
+	def _expire(self):
+		# called with lock held
+		now = time.monotonic()
+
+		while self.keys:
+			oldest_key, oldest_time = next(iter(self.keys.items()))
+			if now - oldest_time <= self.ttl:
+				break
+			self.keys.popitem(last=False)
+
+	def seen(self, key: typing.Hashable) -> bool:
+		with self.lock:
+			self._expire()
+			return key in self.keys
+
+	def mark(self, keys: typing.Iterable[typing.Hashable]):
+		with self.lock:
+			self._mark(keys)
+
+	def _mark(self, keys: typing.Iterable[typing.Hashable]):
+		# called with lock held
+		now = time.monotonic()
+
+		for key in keys:
+			self.keys[key] = now
+			self.keys.move_to_end(key)
+
+		while len(self.keys) > self.size:
+			self.keys.popitem(last=False)
+
+	def forget(self, keys: typing.Iterable[typing.Hashable]):
+		with self.lock:
+			for key in keys:
+				self.keys.pop(key, None)
+
+	@property
+	def stats(self) -> dict[str, int]:
+		return {
+			"dedup_size"  : len(self.keys),
+			"dedup_hits"  : self.num_hits,
+			"dedup_misses": self.num_misses,
+		}
+
+
+def message_key(instance) -> typing.Hashable | None:
+	# anything without a message_id (nodes, archived packets) is never folded, nor are receptions
+	message_id = getattr(instance, "message_id", None)
+	if not message_id or getattr(instance, "__tablename__", None) == "reception":
+		return None
+	return (instance.from_node, message_id)
+
+
+def message_keys(instances: list) -> list:
+	return [key for key in map(message_key, instances) if key is not None]
+
+
+def fold_duplicates(cache: DedupCache | None, instances: list, to_reception: typing.Callable, mark: bool = False) -> tuple[list, list]:
+	# messages already seen, or seen earlier in the same batch, are replaced by their reception.
+	# returns the instances and the keys of the messages kept whole. the caller marks those once
+	# they are stored, or right away with mark, e.g. to claim them while they wait in a buffer
+	if cache is None:
+		return instances, []
+
+	res  = []
+	keys = {}
+
+	with cache.lock:
+		cache._expire()
+
+		for instance in instances:
+			key = message_key(instance)
+
+			if key is None:
+				res.append(instance)
+
+			elif key in cache.keys or key in keys:
+				cache.num_hits += 1
+				res.append(to_reception(instance))
+
+			else:
+				cache.num_misses += 1
+				keys[key] = True
+				res.append(instance)
+
+		if mark:
+			cache._mark(keys)
+
+	return res, list(keys)
+
+
+class NodeFingerprints:
+	# the radio reports every node it knows on each stats cycle, heard since the last one or not.
+	# a node is only sent on when its fields changed, or when its lastHeard moved
+	# refresh seconds past the last one sent, so the server still sees it alive.
+	# changed() only compares. record() is called once the nodes were delivered, so a node
+	# lost with a failed flush is sent again on the next cycle
+
+	def __init__(self, refresh: int):
+		self.refresh       = refresh
+		self.nodes         = {}
+		self.lock          = threading.Lock()
+		self.num_changed   = 0
+		self.num_unchanged = 0
+
+	def __len__(self) -> int:
+		return len(self.nodes)
+
+	def fingerprint(self, node) -> int:
+		# the fields decoded from the radio (NodesClass._fields), less lastHeard
+		return hash(tuple(getattr(node, name) for name, _ in node._fields if name != "lastHeard"))
+
+	def changed(self, nodes: list) -> list:
+		res = []
+
+		with self.lock:
+			for node in nodes:
+				# every radio has its own view of a node
+				last = self.nodes.get((node.gateway_id, node.num))
+
+				if last is not None:
+					last_fingerprint, last_heard = last
+					is_stale = node.lastHeard is None or last_heard is None or node.lastHeard < last_heard + self.refresh
+					if self.fingerprint(node) == last_fingerprint and is_stale:
+						self.num_unchanged += 1
+						continue
+
+				self.num_changed += 1
+				res.append(node)
+
+		return res
+
+	def record(self, nodes: list):
+		with self.lock:
+			for node in nodes:
+				self.nodes[(node.gateway_id, node.num)] = (self.fingerprint(node), node.lastHeard)
+
+	@property
+	def stats(self) -> dict[str, int]:
+		return {
+			"nodes_known"    : len(self.nodes),
+			"nodes_changed"  : self.num_changed,
+			"nodes_unchanged": self.num_unchanged,
+		}
+
+
+def nodeFingerprintsFromConfig(*, config: Config) -> NodeFingerprints | None:
+	if config.node_refresh <= 0:
+		return None
+	return NodeFingerprints(refresh=config.node_refresh)
+
+
+def dedupCacheFromConfig(*, config: Config) -> DedupCache | None:
+	if config.dedup_size <= 0:
+		return None
+	return DedupCache(size=config.dedup_size, ttl=config.dedup_ttl)
+
+
+dedup_cache = None
+dedup_init  = False
+
+def get_dedup_cache() -> DedupCache | None:
+	global dedup_cache, dedup_init
+	if not dedup_init:
+		dedup_cache = dedupCacheFromConfig(config=Config.load_env())
+		dedup_init  = True
+	return dedup_cache
+
+
+batch_keys = None
+
+def get_batch_keys() -> DedupCache:
+	global batch_keys
+	if batch_keys is None:
+		batch_keys = DedupCache(size=BATCH_KEYS_SIZE, ttl=BATCH_KEYS_TTL)
+	return batch_keys
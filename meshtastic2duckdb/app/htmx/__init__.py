@@ -1,4 +1,5 @@
-from ._router            import *
-from ._base              import *
-from ._messages_nodeinfo import *
-from ._messages_position import *
+from ._router             import *
+from ._base               import *
+from ._messages_nodeinfo  import *
+from ._messages_position  import *
+from ._messages_telemetry import *
@@ -1,8 +1,13 @@
 import math
 
+import numpy
+
+from sqlmodel import select
 
 from .. import db
 from .. import models
+from ..models._cache import query_cache
+from ..models._tier  import tier_source
 
 from ._base import *
 
@@ -15,6 +20,13 @@ from bokeh.embed    import components
 QueryImageDimension  = Annotated[int   | None, Query(ge=100, le=10_000)]
 QueryBarWidth        = Annotated[float | None, Query(ge=0.1, le=1.0   )]
 
+# series are downsampled to at most this many points per pixel of image width
+POINTS_PER_PIXEL     = 2
+
+# the charts read every row in the filter's time window, not just the page shown in the table.
+# a window too wide to chart is cut at this many rows
+SERIES_MAX_ROWS      = 1_000_000
+
 
 def gen_image(labels: list[str], values: list[int | float] | list[list[int|float]], title: str, x_label: str, y_label: str, image_height: int=500, image_width: int=500, bar_width: float=0.8, graph_type: str="vbar") -> tuple[str,str]:
 	# https://docs.bokeh.org/en/2.4.1/docs/reference/colors.html#bokeh-colors-named
@@ -153,26 +165,101 @@ def gen_image(labels: list[str], values: list[int | float] | list[list[int|float
 
 
 
-def gen_image_data(resp, x_name, y_names ):
+def lttb(xs: numpy.ndarray, ys: numpy.ndarray, threshold: int) -> numpy.ndarray:
+	# largest triangle three buckets. returns the indices of the points to keep
+	# https://skemman.is/bitstream/1946/15343/3/SS_MSthesis.pdf
+	num_points = len(xs)
+
+	if threshold >= num_points or threshold < 3:
+		return numpy.arange(num_points)
+
+	# first and last points are always kept. the rest is split in threshold-2 buckets
+	edges    = numpy.linspace(1, num_points - 1, threshold - 1).astype(int)
+	keep     = numpy.empty(threshold, dtype=int)
+	keep[ 0] = 0
+	keep[-1] = num_points - 1
+	prev     = 0
+
+	for bucket in range(threshold - 2):
+		start, end           = edges[bucket], edges[bucket + 1]
+		next_start, next_end = (edges[bucket + 1], edges[bucket + 2]) if bucket + 2 < len(edges) else (num_points - 1, num_points)
+
+		avg_x = xs[next_start:next_end].mean()
+		avg_y = ys[next_start:next_end].mean()
+
+		area  = numpy.abs( (xs[prev] - avg_x) * (ys[start:end] - ys[prev]) - (xs[prev] - xs[start:end]) * (avg_y - ys[prev]) )
+		prev  = start + int(area.argmax())
+
+		keep[bucket + 1] = prev
+
+	return keep
+
+
+def query_series(cls, session_manager, query_filter, x_name: str, y_names: list[str], label_name: str = "longName") -> list:
+	# tables with a __series__ hook (telemetry, read from its rollups) chart what they can from it
+	if hasattr(cls, "__series__"):
+		res = cls.__series__()(session_manager, query_filter, x_name, y_names, label_name)
+		if res is not None:
+			return res
+
+	# the filter without its paging, and only the columns charted
+	q_filter       = query_filter.__class__(**{k:v for k,v in query_filter.model_dump().items() if k not in ["offset","limit","cursor","order"]})
+	q_filter.limit = None
+	q_filter.order = None
+
+	def series():
+		with session_manager as session:
+			source = tier_source(cls)
+			where  = q_filter(session, source).whereclause
+			qry    = select( *(getattr(source, name) for name in [label_name, x_name, *y_names]) ).order_by( getattr(source, x_name) ).limit(SERIES_MAX_ROWS)
+
+			if where is not None:
+				qry = qry.where(where)
+
+			return session.execute(qry).all()
+
+	return query_cache.cached(cls.__tablename__, query_cache.key("series", q_filter, label_name, x_name, *y_names), series)
+
+
+def gen_image_data(resp, x_name, y_names, max_points: int|None = None, label_name: str = "longName"):
 	resp_dict = {}
 
 	for r in resp:
-		k = r.longName
+		k = getattr(r, label_name)
 		resp_dict[k] = resp_dict.get(k, [])
 
 		if len(resp_dict[k]) == 0:
 			for l in range(len(y_names)+1):
 				resp_dict[k].append([])
 
-		# Assumes X is always time
-		resp_dict[k][0].append( datetime.datetime.utcfromtimestamp( getattr(r, x_name) ) )
+		resp_dict[k][0].append( getattr(r, x_name) )
 		for y_pos, y_name in enumerate(y_names):
 			resp_dict[k][y_pos+1].append( getattr(r, y_name) )
 
+	if max_points is not None:
+		for k, series in resp_dict.items():
+			xs = numpy.array(series[0], dtype=float)
+			ys = numpy.array(series[1:], dtype=float).reshape(len(y_names), -1)
+
+			# drop missing values and sort by time before picking the points to keep
+			valid  = ~numpy.isnan(xs) & ~numpy.isnan(ys).any(axis=0)
+			order  = numpy.flatnonzero(valid)[numpy.argsort(xs[valid], kind="stable")]
+			xs, ys = xs[order], ys[:, order]
+
+			if len(xs) > max_points:
+				# every y series picks its own points. their union stays within max_points
+				keep = numpy.unique(numpy.concatenate([lttb(xs, y, max(3, max_points // len(ys))) for y in ys]))
+			else:
+				keep = numpy.arange(len(xs))
+
+			resp_dict[k] = [xs[keep].astype(int).tolist()] + [y[keep].tolist() for y in ys]
+
+	# Assumes X is always time
+	for series in resp_dict.values():
+		series[0] = [ datetime.datetime.utcfromtimestamp( x ) for x in series[0] ]
+
 	# assumes multiline
 	labels = sorted(resp_dict.keys())
 	values = tuple( tuple(resp_dict[k][i] for k in sorted(resp_dict.keys())) for i in range(len(y_names) + 1) )
 
 	return { "labels": labels, "values": values }
-
-
@@ -39,14 +39,16 @@ async def mx_messages_nodeinfo(request: Request, response: Response, session_man
 	cls                     = models.NodeInfo
 
 	url_self                = root
-	url_opts                = {k:v for k,v in query_filter.model_dump().items() if v is not None}
+	url_opts                = {k:v for k,v in query_filter.model_dump().items() if v is not None and k != "cursor"}
 
-	html_filters            = query_filter.gen_html_filters(url_self, lambda column: cls.Query(session_manager=session_manager, query_filter=query_filter, filter_is_unique=column))
+	html_filters            = await db.run_db(query_filter.gen_html_filters, url_self, lambda column: cls.Query(session_manager=session_manager, query_filter=query_filter, filter_is_unique=column))
 
-	resp                    = cls.Query(session_manager=session_manager, query_filter=query_filter)
-	count_all, count_filter = cls.Count(session_manager=session_manager, query_filter=query_filter)
+	resp, next_cursor       = await db.run_db(cls.QueryPage, session_manager=session_manager, query_filter=query_filter)
+	count_all, count_filter = await db.run_db(cls.Count, session_manager=session_manager, query_filter=query_filter)
 	count_res               = len(resp)
 
+	series                  = await db.run_db(query_series, cls, session_manager, query_filter, "rxTime", ["rxRssi", "rxSnr"])
+
 
 	"""
 	def calc_offset(url, url_for, offset):
@@ -57,7 +59,7 @@ async def mx_messages_nodeinfo(request: Request, response: Response, session_man
 
 	images                  = {
 		"Rx Rssi": gen_image(
-			**gen_image_data(resp, "rxTime", ["rxRssi"] ),
+			**gen_image_data(series, "rxTime", ["rxRssi"], max_points=image_width * POINTS_PER_PIXEL ),
 			image_height	= image_height,
 			image_width	= image_width,
 			bar_width	= bar_width,
@@ -67,7 +69,7 @@ async def mx_messages_nodeinfo(request: Request, response: Response, session_man
 			graph_type 	= "multiline"
 		),
 		"Rx Snr": gen_image(
-			**gen_image_data(resp, "rxTime", ["rxSnr"] ),
+			**gen_image_data(series, "rxTime", ["rxSnr"], max_points=image_width * POINTS_PER_PIXEL ),
 			image_height	= image_height,
 			image_width	= image_width,
 			bar_width	= bar_width,
@@ -91,6 +93,7 @@ async def mx_messages_nodeinfo(request: Request, response: Response, session_man
 			"count_all"    : count_all,
 			"count_filter" : count_filter,
 			"count_res"    : count_res,
+			"next_cursor"  : next_cursor,
 
 			"images"       : images,
 
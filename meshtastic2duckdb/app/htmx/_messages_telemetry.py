@@ -0,0 +1,77 @@
+from ._router   import *
+from ._messages import *
+
+
+# title, column charted, y label
+TELEMETRY_CHARTS = [
+	("Battery Level"      , "batteryLevel"      , "Battery Level (%)"      ),
+	("Voltage"            , "voltage"           , "Voltage (V)"            ),
+	("Channel Utilization", "channelUtilization", "Channel Utilization (%)"),
+	("Air Util Tx"        , "airUtilTx"         , "Air Util Tx (%)"        ),
+]
+
+
+@router.get("/messages/telemetry")
+async def mx_messages_telemetry(request: Request, response: Response, session_manager: db.SessionManagerDepRO, query_filter: models.Telemetry.__filter__(),
+	image_width: QueryImageDimension = 500, image_height: QueryImageDimension = 250, bar_width: QueryBarWidth=0.8):
+
+	title			= "Telemetry"
+	target                  = "container"
+
+	urls			= get_urls()
+	root			= urls[title]
+
+	cls                     = models.Telemetry
+
+	url_self                = root
+	url_opts                = {k:v for k,v in query_filter.model_dump().items() if v is not None and k != "cursor"}
+
+	html_filters            = await db.run_db(query_filter.gen_html_filters, url_self, lambda column: cls.Query(session_manager=session_manager, query_filter=query_filter, filter_is_unique=column))
+
+	resp, next_cursor       = await db.run_db(cls.QueryPage, session_manager=session_manager, query_filter=query_filter)
+	count_all, count_filter = await db.run_db(cls.Count, session_manager=session_manager, query_filter=query_filter)
+	count_res               = len(resp)
+
+	# read from the coarsest telemetry rollup which fits the time window, unless the filter needs the rows
+	series                  = await db.run_db(query_series, cls, session_manager, query_filter, "gateway_receive_time", [y_name for _, y_name, _ in TELEMETRY_CHARTS], "fromId")
+
+	images                  = {
+		chart_title: gen_image(
+			**gen_image_data(series, "gateway_receive_time", [y_name], max_points=image_width * POINTS_PER_PIXEL, label_name="fromId" ),
+			image_height	= image_height,
+			image_width	= image_width,
+			bar_width	= bar_width,
+			title		= f"{chart_title} through time ({count_res:,d}/{count_filter:,d}/{count_all:,d})",
+			x_label		= "Time",
+			y_label		= y_label,
+			graph_type 	= "multiline"
+		)
+		for chart_title, y_name, y_label in TELEMETRY_CHARTS
+	}
+
+	return templates.TemplateResponse(
+		request = request,
+		name    = "index_home.html",
+		context = {
+			"title"        : title,
+			"target"       : target,
+
+			"urls"         : urls,
+			"root"         : root,
+
+			"count_all"    : count_all,
+			"count_filter" : count_filter,
+			"count_res"    : count_res,
+			"next_cursor"  : next_cursor,
+
+			"images"       : images,
+
+			"data"         : tuple(r.model_pretty_dump() for r in resp),
+			"query_filter" : query_filter,
+			"html_filters" : html_filters,
+			"url_self"     : url_self,
+			"url_opts"     : url_opts,
+
+			"extend"       : "partials/messages_telemetry.html"
+		}
+	)
@@ -30,5 +30,6 @@ def get_urls():
         return {
                 "Home"     : "mx_home",
                 "Node Info": "mx_messages_nodeinfo",
-                "Position" : "mx_messages_position"
+                "Position" : "mx_messages_position",
+                "Telemetry": "mx_messages_telemetry"
         }
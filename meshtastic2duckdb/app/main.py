@@ -12,6 +12,7 @@ from fastapi.responses   import HTMLResponse, RedirectResponse, FileResponse
 from . import db
 from . import htmx
 from . import models
+from . import scheduler
 
 
 
@@ -26,10 +27,12 @@ async def lifespan(app: FastAPI):
 
 def on_startup(app):
 	#create_db_and_tables()
-	pass
+	db.dbExecFromEnv()
+	app.state.scheduler = scheduler.schedulerFromEngine(db_engine=db.get_engine())
+	app.state.scheduler.start()
 
 def on_cleanup(app):
-	pass
+	app.state.scheduler.close()
 
 
 
@@ -58,6 +61,7 @@ uvicorn_logger.addFilter(EndpointFilter(path="/favicon.ico"))
 
 
 app = FastAPI(
+	lifespan  = lifespan,
 	docs_url  = "/api/docs",
 	redoc_url = "/api/redoc",
 	version   = "0.1.0",
@@ -103,6 +107,11 @@ async def favicon() -> None:
 async def api_get() -> dict[str, list[str]]:
 	return { "endpoints": ["messages"] }
 
+@api_router.get("/stats",    tags=["/api"])
+async def api_stats_get(request: Request) -> dict[str, int]:
+	# database and cold tier sizes, and the maintenance jobs
+	return { **db.get_engine().stats, **request.app.state.scheduler.stats }
+
 @api_router.get("/messages", tags=["/api/messages"])
 async def api_models_get() -> dict[str, list[str]]:
 	# TODO: Get from database
@@ -1,53 +1,153 @@
 from ._message    import MessageClass
-from ._base       import SharedFilterQuery, TimedFilterQuery
+from ._base       import SharedFilterQuery, TimedFilterQuery, count_cache_clear
 from ._gen        import gen_endpoint
+from ._bulk       import bulk_insert
+from ._tier       import tier_source, tier_cutoff, tier_partition_start, tier_views_create, tier_move, tier_promote, tier_drop, tier_bytes
+from ._retention  import retention_delete
+from ._cache      import query_cache
 
 from .nodeinfo    import *
 from .nodes       import *
+from .packetarchive import *
 from .position    import *
 from .rangetest   import *
+from .rawpacket   import *
+from .reception   import *
 from .telemetry   import *
+from .telemetryrollup import *
 from .textmessage import *
 
 
-def decode_packet(packet) -> "TelemetryClass|NodeInfoClass|PositionClass|TextMessageClass|RangeTestClass":
-    message = MessageClass.from_packet(packet)
+# portnum -> model. anything else is stored as a RawPacket
+PORTNUMS = { cls.__portnum__: cls for cls in (TelemetryClass, NodeInfoClass, PositionClass, TextMessageClass, RangeTestClass) }
 
-    if   message.portnum == "TELEMETRY_APP":
-        return TelemetryClass.from_packet(packet)
+# append only tables whose old rows move to the parquet cold tier. the packet archive
+# stays in the database, as reprocess rewrites the hot rows from it
+TIERED   = (Telemetry, NodeInfo, Position, TextMessage, RangeTest, RawPacket, Reception, Nodes)
 
-    elif message.portnum == "NODEINFO_APP":
-        return NodeInfoClass.from_packet(packet)
+# tables which can be given a retention. the rollups and the node state are kept forever
+RETAINED = TIERED + (PacketArchive,)
 
-    elif message.portnum == "POSITION_APP":
-        return PositionClass.from_packet(packet)
 
-    elif message.portnum == "TEXT_MESSAGE_APP":
-        return TextMessageClass.from_packet(packet)
+def decode_packet(packet, trusted: bool = False, gateway_receive_time: int | None = None, gateway_id: str | None = None) -> "TelemetryClass|NodeInfoClass|PositionClass|TextMessageClass|RangeTestClass|RawPacketClass":
+    portnum = packet.get("decoded", {}).get("portnum")
+    cls     = PORTNUMS.get(portnum, RawPacketClass)
+    return cls.from_packet(packet, trusted=trusted, gateway_receive_time=gateway_receive_time, gateway_id=gateway_id)
 
-    elif message.portnum == "RANGE_TEST_APP":
-        return RangeTestClass.from_packet(packet)
 
-    else:
-        raise ValueError(f"Unknown portnum {message.portnum}. {packet}")
+def archive_packet(packet, gateway_receive_time: int | None = None, gateway_id: str | None = None) -> "PacketArchiveClass":
+    return PacketArchiveClass.from_packet(packet, trusted=True, gateway_receive_time=gateway_receive_time, gateway_id=gateway_id)
 
 
-def decode_node(node: dict[str, typing.Any]) -> "NodesClass":
-    inst = NodesClass.from_packet(node)
+def decode_node(node: dict[str, typing.Any], trusted: bool = False, gateway_id: str | None = None) -> "NodesClass":
+    inst = NodesClass.from_packet(node, trusted=trusted, gateway_id=gateway_id)
     return inst
 
 
-def decode_nodes(nodes: dict[str, dict]) -> "list[NodesClass]":
+def decode_nodes(nodes: dict[str, dict], trusted: bool = False, gateway_id: str | None = None) -> "list[NodesClass]":
     instances = [None] * len(nodes)
     for pos, (node_id, node) in enumerate(sorted(nodes.items())):
         #print("node_id", node_id)
         #print("data", data)
         #print(inst)
-        inst = decode_node(node)
+        inst = decode_node(node, trusted=trusted, gateway_id=gateway_id)
         instances[pos] = inst
     return instances
 
 
+def rebuild_rollups(session, since: int | None = None, until: int | None = None):
+    source = tier_source(Telemetry)
+
+    # the rollups outlive the telemetry they were built from. never rebuild before the oldest row left
+    if since is None:
+        since = session.execute( select( func.min(source.gateway_receive_time) ) ).scalar_one()
+        if since is None:
+            return
+
+    rollup_rebuild(session, source, since=since, until=until)
+
+
+def backfill_rollups(session) -> bool:
+    # telemetry stored before the rollup tables existed. rebuilt once, while they are still empty
+    if session.execute( select(Telemetry.id).limit(1) ).first() is None:
+        return False
+
+    if all(session.execute( select(rollup.id).limit(1) ).first() is not None for rollup in ROLLUPS.values()):
+        return False
+
+    rebuild_rollups(session)
+    return True
+
+
+def backfill_node_state(session) -> bool:
+    # node snapshots stored before node_state existed. rebuilt once, while it is still empty
+    if session.execute( select(Nodes.id).limit(1) ).first() is None:
+        return False
+
+    if session.execute( select(NodeState.id).limit(1) ).first() is not None:
+        return False
+
+    node_state_rebuild(session)
+    return True
+
+
+def tier_load(session, tier_dir: str, read_only: bool = False):
+    # finishes moves interrupted by a restart, then points the readers at the cold files
+    if not read_only:
+        for orm_class in TIERED:
+            if tier_promote(session, orm_class, tier_dir):
+                print(f"    promoted staged cold files of {orm_class.__tablename__}")
+
+    tier_views_create(session, TIERED, tier_dir, read_only=read_only)
+    count_cache_clear()
+
+
+def tier_run(session_manager, before: int, partition: str, tier_dir: str) -> dict[str, int]:
+    # moves the rows older than before out of every tiered table.
+    # one writer session per table, so inserts are not held up for the whole run
+    stats = {}
+    for orm_class in TIERED:
+        with session_manager as session:
+            num_rows = tier_move(session, orm_class, before=before, partition=partition, tier_dir=tier_dir)
+            if num_rows:
+                tier_views_create(session, [orm_class], tier_dir)
+                session.commit()
+
+        if num_rows:
+            count_cache_clear(orm_class.__tablename__)
+            stats[orm_class.__tablename__.upper()] = num_rows
+
+    return stats
+
+
+def retention_run(session_manager, policy: dict[str, int], now: int, batch_size: int, tier_dir: str) -> dict[str, int]:
+    # deletes the rows older than each table's retention in days, and its cold partitions which ended before it.
+    # the writer session is taken per batch, and per table for its view
+    stats = {}
+    for orm_class in RETAINED:
+        days = policy.get(orm_class.__tablename__)
+        if not days:
+            continue
+
+        before    = now - days * 86400
+        num_rows  = retention_delete(session_manager, orm_class, before=before, batch_size=batch_size)
+        num_files = tier_drop(tier_dir, orm_class.__tablename__, before=before)
+
+        if orm_class in TIERED:
+            with session_manager as session:
+                tier_views_create(session, [orm_class], tier_dir)
+                session.commit()
+
+        count_cache_clear(orm_class.__tablename__)
+
+        if num_rows:
+            stats[orm_class.__tablename__.upper()] = num_rows
+        if num_files:
+            stats[f"{orm_class.__tablename__.upper()}_FILES"] = num_files
+
+    return stats
+
+
 def class_to_ORM(cls):
     orm_class_name = cls.__ormclass__
     # print("orm_class_name", orm_class_name)
@@ -64,8 +164,13 @@ def class_to_ORM(cls):
 def register(app, prefix, status, db):
 	NodeInfo   .register(app=app, prefix=prefix, gen_endpoint=gen_endpoint, status=status, db_ro=db.SessionManagerDepRO, db_rw=db.SessionManagerDepRW)
 	Nodes      .register(app=app, prefix=prefix, gen_endpoint=gen_endpoint, status=status, db_ro=db.SessionManagerDepRO, db_rw=db.SessionManagerDepRW)
+	NodeState  .register(app=app, prefix=prefix, gen_endpoint=gen_endpoint, status=status, db_ro=db.SessionManagerDepRO, db_rw=db.SessionManagerDepRW)
+	PacketArchive.register(app=app, prefix=prefix, gen_endpoint=gen_endpoint, status=status, db_ro=db.SessionManagerDepRO, db_rw=db.SessionManagerDepRW)
 	Position   .register(app=app, prefix=prefix, gen_endpoint=gen_endpoint, status=status, db_ro=db.SessionManagerDepRO, db_rw=db.SessionManagerDepRW)
 	RangeTest  .register(app=app, prefix=prefix, gen_endpoint=gen_endpoint, status=status, db_ro=db.SessionManagerDepRO, db_rw=db.SessionManagerDepRW)
+	RawPacket  .register(app=app, prefix=prefix, gen_endpoint=gen_endpoint, status=status, db_ro=db.SessionManagerDepRO, db_rw=db.SessionManagerDepRW)
+	Reception  .register(app=app, prefix=prefix, gen_endpoint=gen_endpoint, status=status, db_ro=db.SessionManagerDepRO, db_rw=db.SessionManagerDepRW)
 	Telemetry  .register(app=app, prefix=prefix, gen_endpoint=gen_endpoint, status=status, db_ro=db.SessionManagerDepRO, db_rw=db.SessionManagerDepRW)
+	TelemetryRollup.register(app=app, prefix=prefix, gen_endpoint=gen_endpoint, status=status, db_ro=db.SessionManagerDepRO, db_rw=db.SessionManagerDepRW)
 	TextMessage.register(app=app, prefix=prefix, gen_endpoint=gen_endpoint, status=status, db_ro=db.SessionManagerDepRO, db_rw=db.SessionManagerDepRW)
 
@@ -1,13 +1,16 @@
 import sys
 import json
 import typing
+import threading
 import datetime
 import dataclasses
 
 from typing     import Annotated, Optional, Generator, Literal
 
 from sqlalchemy import BigInteger, SmallInteger, Integer, Text, Float, Boolean, LargeBinary
-from sqlalchemy import func, select
+from sqlalchemy import func, select, tablesample, literal_column, event
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm import Session as OrmSession
 
 from fastapi    import FastAPI, Depends, Query
 from fastapi    import HTTPException
@@ -17,7 +20,10 @@ from   pydantic import BaseModel
 
 from   sqlmodel import Field, Sequence, SQLModel, Column, Session, or_
 
-from ._query    import SharedFilterQuery, SharedFilterQueryParams, TimedFilterQuery, TimedFilterQueryParams, gen_html_filters
+from ._extract  import get_extractor
+from ._query    import SharedFilterQuery, SharedFilterQueryParams, TimedFilterQuery, TimedFilterQueryParams, gen_html_filters, encode_cursor
+from ._tier     import tier_source
+from ._cache    import query_cache
 from .          import _converters as converters
 from ..         import dbgenerics
 
@@ -40,29 +46,87 @@ int64 = Annotated[int, BigInteger  ] # https://docs.sqlalchemy.org/en/20/core/ty
 
 Sequences = []
 
+# unfiltered row count per table. filled on the first Count and kept
+# up to date by bulk_insert, so it never has to scan the table again.
+count_cache      = {}
+count_cache_lock = threading.Lock()
+
+# above this many rows the filtered count is estimated from a sample
+# unless the request asks for exact=true
+COUNT_APPROX_MIN_ROWS = 1_000_000
+COUNT_SAMPLE_ROWS     =   100_000
+
+
+# written to within a transaction (session given), the caches are only updated once it commits.
+# before, a reader could still cache the old rows under the new generation, for good
+COUNT_CACHE_PENDING = "count_cache_pending"
+
+
+def count_cache_add(table_name: str, num_rows: int, session: OrmSession | None = None):
+	if session is not None:
+		session.info.setdefault(COUNT_CACHE_PENDING, []).append((count_cache_add, (table_name, num_rows)))
+		return
+
+	with count_cache_lock:
+		if num_rows:
+			query_cache.bump(table_name)
+
+		if table_name in count_cache:
+			count_cache[table_name] += num_rows
+
+def count_cache_clear(table_name: str|None = None, session: OrmSession | None = None):
+	if session is not None:
+		session.info.setdefault(COUNT_CACHE_PENDING, []).append((count_cache_clear, (table_name,)))
+		return
+
+	with count_cache_lock:
+		query_cache.bump(table_name)
+
+		if table_name is None:
+			count_cache.clear()
+		else:
+			count_cache.pop(table_name, None)
+
+@event.listens_for(OrmSession, "after_commit")
+def count_cache_commit(session: OrmSession):
+	for update, args in session.info.pop(COUNT_CACHE_PENDING, []):
+		update(*args)
+
+@event.listens_for(OrmSession, "after_rollback")
+def count_cache_rollback(session: OrmSession):
+	session.info.pop(COUNT_CACHE_PENDING, None)
+
 
 class ModelBaseClass(pydantic.BaseModel):
 	gateway_receive_time : int64
+	gateway_id           : str | None = None # !8fffffff - the radio which received it
 
 	__pretty_names__ = {
-		"gateway_receive_time": (0,"Gateway Receive Time", converters.epoch_to_str)
+		"gateway_receive_time": (0,"Gateway Receive Time", converters.epoch_to_str),
+		"gateway_id"          : (0,"Gateway"             , converters.echo)
 	}
 
 	@classmethod
 	def _parse_fields(cls, packet) -> dict[str, typing.Any]:
 		try:
-			return { (0,k): v(packet) for k,v in cls._shared_fields + cls._fields }
+			return get_extractor(cls)(packet)
 		except KeyError as e:
 			print(packet)
 			raise e
 
 	@classmethod
-	def from_packet(cls, packet) -> "ModelBaseClass":
-		fields  = { k:v for (_,k),v in cls._parse_fields(packet).items() }
-		fields["gateway_receive_time"] = int(datetime.datetime.timestamp(datetime.datetime.now()))
+	def from_packet(cls, packet, trusted: bool = False, gateway_receive_time: int | None = None, gateway_id: str | None = None) -> "ModelBaseClass":
+		# trusted (opt in, MESH_LOGGER_TRUSTED_DECODE) skips pydantic validation and its coercion.
+		# only for packets known to match the model, straight from the radio
+		fields  = cls._parse_fields(packet)
+		fields["gateway_receive_time"] = int(datetime.datetime.timestamp(datetime.datetime.now())) if gateway_receive_time is None else gateway_receive_time
+		fields["gateway_id"          ] = gateway_id
+
+		if trusted:
+			return cls.model_construct(**fields)
 
 		try:
-			inst    = cls(**fields)
+			inst    = cls.model_validate(fields)
 		except Exception as e:
 			print("cls           ", cls               , file=sys.stderr)
 			print("fields        ", fields            , file=sys.stderr)
@@ -82,6 +146,10 @@ class ModelBaseClass(pydantic.BaseModel):
 		d = {k:v for k,v in self if k not in ["id", "metadata"]}
 		return d
 
+	def toJSONDICT(self) -> dict[str, typing.Any]:
+		d = self.model_dump(mode="json", exclude={"id", "metadata"})
+		return d
+
 	def model_pretty_dump(self):
 		#print("model_pretty_dump", self)
 		return { self.__pretty_names__.get(k, (99,k,converters.echo)): v for k,v in self.model_dump().items() }
@@ -99,46 +167,99 @@ class ModelBaseClass(pydantic.BaseModel):
 
 class ModelBase:
 	gateway_receive_time : int64 = Field(              sa_type=BigInteger()  , nullable=False, index=True )
+	gateway_id           : str | None = Field(default=None, sa_type=Text()   , nullable=True              )
 
 	@classmethod
 	def Query( cls, *, session_manager: dbgenerics.GenericSessionManager, query_filter: SharedFilterQuery, filter_is_unique: str|None = None ) -> "list[ModelBase]":
+		results, _ = cls.QueryPage(session_manager=session_manager, query_filter=query_filter, filter_is_unique=filter_is_unique)
+		return results
+
+	@classmethod
+	def QueryPage( cls, *, session_manager: dbgenerics.GenericSessionManager, query_filter: SharedFilterQuery, filter_is_unique: str|None = None ) -> "tuple[list[ModelBase], str|None]":
 		# https://fastapi.tiangolo.com/tutorial/sql-databases/#read-heroes
+		# returns the results and the cursor of the next page (None when this is the last page)
 
 		# print("ModelBase: class query", "model", cls, "session_manager", session_manager, "query_filter", query_filter, "filter_is_unique", filter_is_unique)
 
-		with session_manager as session:
-			qry     = query_filter(session, cls, filter_is_unique=filter_is_unique)
-			results = session.exec(qry)
-			results = [r.to_dataclass() if hasattr(r, "to_dataclass") else r for r in results]
+		def query_page():
+			next_cursor = None
 
-		return results
+			with session_manager as session:
+				qry     = query_filter(session, tier_source(cls), filter_is_unique=filter_is_unique)
+				results = session.exec(qry).all()
+
+				if not filter_is_unique and query_filter.limit is not None and len(results) == query_filter.limit:
+					next_cursor = encode_cursor(results[-1].gateway_receive_time, results[-1].id)
+
+				results = [r.to_dataclass() if hasattr(r, "to_dataclass") else r for r in results]
+
+			return results, next_cursor
+
+		return query_cache.cached(cls.__tablename__, query_cache.key("page", query_filter, filter_is_unique), query_page)
+
+	@classmethod
+	def CountAll( cls, *, session: dbgenerics.GenericSession ) -> int:
+		table_name = cls.__tablename__
+
+		with count_cache_lock:
+			if table_name in count_cache:
+				return count_cache[table_name]
+
+			generation = query_cache.generation(table_name)
+
+		count_all = session.execute( select( func.count() ).select_from(tier_source(cls)) ).scalar_one()
+
+		with count_cache_lock:
+			# written to while counting. the count may be from before the write
+			if query_cache.generation(table_name) == generation:
+				count_cache.setdefault(table_name, count_all)
+
+		return count_all
 
 	@classmethod
 	def Count( cls, *, session_manager: dbgenerics.GenericSessionManager, query_filter: SharedFilterQuery ) -> tuple[int, int]:
 		#print("ModelBase: class count")
 
-		count_all, count_filter = -1, -1
-
-		q_filter = query_filter.__class__(**{k:v for k,v in query_filter.model_dump().items() if k not in ["offset","limit"]})
+		q_filter = query_filter.__class__(**{k:v for k,v in query_filter.model_dump().items() if k not in ["offset","limit","cursor","order"]})
 		q_filter.limit = None
+		q_filter.order = None
 
 		#print(f"  q_filter {q_filter}")
 
-		with session_manager as session:
-			qry          = query_filter(session, cls)
-			count_all    = session.query(cls).count()
-			#count_filter = len(session.exec(q_filter(session, cls)).all())
-			count_filter = session\
-				.execute(
-					select( func.count() )\
-					.select_from(
-						q_filter(session, cls)\
-							.subquery()
-					)\
-				)\
-				.scalar_one()
-
-		return count_all, count_filter
+		# a table with a cold tier is counted exactly. its time window skips the partitions outside it
+		source = tier_source(cls)
+
+		def count():
+			count_all, count_filter = -1, -1
+
+			with session_manager as session:
+				count_all    = cls.CountAll(session=session)
+
+				if query_filter.exact or count_all <= COUNT_APPROX_MIN_ROWS or source is not cls:
+					count_filter = session.execute( select( func.count() ).select_from( q_filter(session, source).subquery() ) ).scalar_one()
+
+				else:
+					# run the filter over a block sample of the table and scale it back up.
+					# a system sample is only about sample_pct in size, so it is scaled by the
+					# share of the sampled rows which matched, counted in the same scan
+					sample_pct   = 100.0 * COUNT_SAMPLE_ROWS / count_all
+					sample       = aliased(cls, tablesample(cls.__table__, func.system(literal_column(f"{sample_pct:.6f}%")), name=f"{cls.__tablename__}_sample"))
+					where        = q_filter(session, sample).whereclause
+
+					if where is None:
+						count_filter = count_all
+					else:
+						count_sample_total, count_filter_sample = session.execute( select( func.count(), func.count().filter(where) ).select_from(sample) ).one()
+
+						if count_sample_total == 0:
+							count_filter = session.execute( select( func.count() ).select_from( q_filter(session, source).subquery() ) ).scalar_one()
+						else:
+							count_filter = round(count_filter_sample / count_sample_total * count_all)
+
+			return count_all, count_filter
+
+		# keyed without the paging parameters, so every page of the same filter shares one count
+		return query_cache.cached(cls.__tablename__, query_cache.key("count", q_filter), count)
 
 	@classmethod
 	def from_dataclass(cls, inst: ModelBaseClass) -> "Message":
@@ -161,7 +282,11 @@ class ModelBase:
 		fields    = cls.model_fields
 		tags      = [f"/api/messages/{name.lower()}"]
 
-		endpoints = { "endpoints": ["", "list"] + list(filter_by.keys()) }
+		# tables derived from another one on insert (__derived__) are read only. rows written to
+		# them directly would be overwritten, or double counted, by the next insert
+		derived   = getattr(cls, "__derived__", False)
+
+		endpoints = { "endpoints": ["", "list"] + ([] if derived else ["batch"]) + ["export/arrow", "export/parquet"] + list(filter_by.keys()) }
 
 		prefix_u  = f"{prefix}/{nick}"
 
@@ -181,6 +306,7 @@ class ModelBase:
 				model             = cls,
 				session_manager_t = db_ro
 			)
+		if not derived:
 			gen_endpoint(
 				app               = app,
 				verb              = "POST",
@@ -197,7 +323,25 @@ class ModelBase:
 				model             = cls,
 				session_manager_t = db_rw
 			)
+			gen_endpoint(
+				app               = app,
+				verb              = "POST",
+				endpoint          = f"{prefix_u}/batch",
+				response_model    = dict[str, int],
+				fixed_response    = None,
+				status_code       = status.HTTP_201_CREATED,
+				name              = f"api_{name}_add_batch".lower().replace(" ","_"),
+				summary           = f"Add {name} Batch",
+				description       =  "Add {name} Batch",
+				tags              = tags,
+				filter_key        = None,
+				filter_is_list    = False,
+				model             = cls,
+				session_manager_t = db_rw,
+				is_batch          = True
+			)
 
+		if True:
 			gen_endpoint(
 				app               = app,
 				verb              = "GET",
@@ -216,6 +360,26 @@ class ModelBase:
 			)
 
 
+			for export_format in ("arrow", "parquet"):
+				gen_endpoint(
+					app               = app,
+					verb              = "GET",
+					endpoint          = f"{prefix_u}/export/{export_format}",
+					response_model    = None,
+					fixed_response    = None,
+					status_code       = None,
+					name              = f"api_{name}_export_{export_format}".lower().replace(" ","_"),
+					summary           = f"Export {name} {export_format.title()}",
+					description       =  "Export {name} {export_format.title()}",
+					tags              = tags,
+					filter_key        = None,
+					filter_is_list    = False,
+					model             = cls,
+					session_manager_t = db_ro,
+					export_format     = export_format
+				)
+
+
 		filters = [ fe for fe in filter_by.keys() ]
 		gen_endpoint(
 				app               = app,
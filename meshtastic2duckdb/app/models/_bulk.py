@@ -0,0 +1,110 @@
+import typing
+import contextlib
+
+from sqlalchemy import insert, values, table as sql_table, column as sql_column
+
+try:
+	import pyarrow
+except ImportError:
+	pyarrow = None
+
+from .. import dbgenerics
+from ._base import count_cache_add
+
+# https://duckdb.org/docs/api/python/data_ingestion
+# https://duckdb.org/docs/guides/python/import_arrow
+
+
+def orm_class_of(instance) -> type:
+	cls = instance.__class__
+
+	if hasattr(cls, "__table__"):      # ORM instance
+		return cls
+
+	return cls.__ormclass__()          # dataclass instance
+
+
+def row_of(instance) -> dict[str, typing.Any]:
+	if hasattr(instance.__class__, "__table__"):
+		return {k:v for k,v in instance.model_dump().items() if k != "id"}
+
+	return instance.toDICT()
+
+
+def group_by_table(instances) -> dict[type, list[dict[str, typing.Any]]]:
+	tables = {}
+	for instance in instances:
+		tables.setdefault(orm_class_of(instance), []).append(row_of(instance))
+	return tables
+
+
+def insert_columnar(session: dbgenerics.GenericSession, orm_class, rows: list[dict[str, typing.Any]]) -> int:
+	table   = orm_class.__table__
+	columns = [c.name for c in table.columns if c.name != "id"]
+
+	if pyarrow is None:
+		# no arrow available. single executemany through sqlalchemy core
+		session.execute(insert(table), [{c: r.get(c) for c in columns} for r in rows])
+		return len(rows)
+
+	batch      = pyarrow.Table.from_pydict({c: [r.get(c) for r in rows] for c in columns})
+	names      = ", ".join(f'"{c}"' for c in columns)
+	con        = session.connection().connection.driver_connection
+	batch_name = f"_bulk_{table.name}"
+
+	con.register(batch_name, batch)
+	try:
+		con.execute(f'INSERT INTO "{table.name}" ({names}) SELECT {names} FROM "{batch_name}"')
+	finally:
+		con.unregister(batch_name)
+
+	return len(rows)
+
+
+def insert_orm(session: dbgenerics.GenericSession, orm_class, rows: list[dict[str, typing.Any]]) -> int:
+	# one orm instance per row. MESH_LOGGER_LOCAL_FAST_INSERT=false, e.g. to rule out the columnar path
+	session.add_all([orm_class(**row) for row in rows])
+	session.flush()
+	return len(rows)
+
+
+@contextlib.contextmanager
+def columnar_source(session: dbgenerics.GenericSession, name: str, rows: list[dict[str, typing.Any]]):
+	# rows as a selectable, to upsert or join them in a single statement.
+	# bound parameters cost milliseconds per row in duckdb. a registered arrow batch does not
+	columns = list(rows[0].keys())
+
+	if pyarrow is None:
+		yield values(*[sql_column(c) for c in columns], name=name).data([tuple(r[c] for c in columns) for r in rows])
+		return
+
+	batch = pyarrow.Table.from_pydict({c: [r[c] for r in rows] for c in columns})
+	con   = session.connection().connection.driver_connection
+
+	con.register(name, batch)
+	try:
+		yield sql_table(name, *[sql_column(c) for c in columns])
+	finally:
+		con.unregister(name)
+
+
+def bulk_insert(session: dbgenerics.GenericSession, instances) -> dict[str, int]:
+	# every insert goes through here, columnar or not, so the state and rollup tables are kept
+	# on both paths. sessions of DbEngineLocal carry its fast_insert setting
+	insert = insert_columnar if session.info.get("fast_insert", True) else insert_orm
+	stats  = {}
+
+	for orm_class, rows in group_by_table(instances).items():
+		# tables with a latest state table only store the rows which changed it
+		if hasattr(orm_class, "__state__"):
+			rows = orm_class.__state__()(session, rows)
+
+		count = insert(session, orm_class, rows) if rows else 0
+		count_cache_add(orm_class.__tablename__, count, session=session)
+		stats[orm_class.__tablename__.upper()] = stats.get(orm_class.__tablename__.upper(), 0) + count
+
+		# tables with aggregates fold the new rows into them in the same transaction
+		if hasattr(orm_class, "__rollup__"):
+			orm_class.__rollup__()(session, rows)
+
+	return stats
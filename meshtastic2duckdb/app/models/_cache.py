@@ -0,0 +1,97 @@
+import json
+import time
+import typing
+import threading
+import collections
+
+# results of Query/Count, so the same dashboard filters refreshed by every viewer are run once.
+# each table has a write generation, bumped once a write to the table commits (by the same calls
+# which keep count_cache up to date). an entry is only served while its table's generation is
+# the one it was read at. relative windows (time_from) move with the clock, so their key carries
+# the current time bucket: the same "last week" is served from the cache for up to bucket seconds.
+
+QUERY_CACHE_SIZE   = 256
+QUERY_CACHE_BUCKET = 5
+
+
+class QueryCache:
+	def __init__(self, size: int = QUERY_CACHE_SIZE, bucket: int = QUERY_CACHE_BUCKET):
+		self.size          = size
+		self.bucket        = bucket
+		self.entries       = collections.OrderedDict() # (table name, key) -> (generation, value)
+		self.generations   = {}
+		self.epoch         = 0 # bumped when every table is written to at once
+		self.lock          = threading.Lock()
+		self.num_hits      = 0
+		self.num_misses    = 0
+		self.num_evictions = 0
+
+	def configure(self, size: int, bucket: int):
+		with self.lock:
+			self.size   = size
+			self.bucket = bucket
+			self.entries.clear()
+
+	def key(self, kind: str, query_filter, *extra) -> tuple:
+		params = json.dumps(query_filter.model_dump(), sort_keys=True, default=str)
+		bucket = int(time.time()) // self.bucket if getattr(query_filter, "time_from", None) and self.bucket > 0 else None
+		return (kind, params, bucket, *extra)
+
+	def cached(self, table_name: str, key: tuple, func: typing.Callable[[], typing.Any]) -> typing.Any:
+		if self.size <= 0:
+			return func()
+
+		with self.lock:
+			generation = self.generation(table_name)
+			entry      = self.entries.get((table_name, key))
+
+			if entry is not None and entry[0] == generation:
+				self.entries.move_to_end((table_name, key))
+				self.num_hits += 1
+				return entry[1]
+
+			self.num_misses += 1
+
+		value = func()
+
+		with self.lock:
+			# written to while the query ran. its result may already be stale
+			if self.generation(table_name) != generation:
+				return value
+
+			self.entries[(table_name, key)] = (generation, value)
+			self.entries.move_to_end((table_name, key))
+
+			while len(self.entries) > self.size:
+				self.entries.popitem(last=False)
+				self.num_evictions += 1
+
+		return value
+
+	def generation(self, table_name: str) -> tuple[int, int]:
+		return (self.epoch, self.generations.get(table_name, 0))
+
+	def bump(self, table_name: str | None = None):
+		# None when every table was written to, e.g. by a move to the cold tier
+		with self.lock:
+			if table_name is None:
+				self.epoch += 1
+				self.entries.clear()
+				return
+
+			self.generations[table_name] = self.generations.get(table_name, 0) + 1
+
+			for k in [k for k in self.entries if k[0] == table_name]:
+				del self.entries[k]
+
+	@property
+	def stats(self) -> dict[str, int]:
+		return {
+			"query_cache_entries"  : len(self.entries),
+			"query_cache_hits"     : self.num_hits,
+			"query_cache_misses"   : self.num_misses,
+			"query_cache_evictions": self.num_evictions,
+		}
+
+
+query_cache = QueryCache()
@@ -1,6 +1,32 @@
 import math
+import json
+import base64
 import datetime
 
+def strip_keys(val, keys):
+	if isinstance(val, dict):
+		return { k: strip_keys(v, keys) for k,v in val.items() if k not in keys }
+	if isinstance(val, list):
+		return [ strip_keys(v, keys) for v in val ]
+	return val
+
+def json_default(val):
+	if isinstance(val, bytes):
+		return { "$b64": base64.b64encode(val).decode() }
+	return str(val)
+
+def json_object_hook(val):
+	if len(val) == 1 and "$b64" in val:
+		return base64.b64decode(val["$b64"])
+	return val
+
+def to_compact_json(val, drop=("raw",)):
+	# packets carry bytes and, under "raw", protobuf objects. bytes become {"$b64": ...}, raw is dropped
+	return json.dumps(strip_keys(val, drop), separators=(",", ":"), default=json_default)
+
+def from_compact_json(val):
+	return json.loads(val, object_hook=json_object_hook)
+
 def echo(val):
 	return val
 
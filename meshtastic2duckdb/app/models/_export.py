@@ -0,0 +1,88 @@
+import io
+import os
+import typing
+import tempfile
+
+from fastapi           import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlmodel          import Session
+
+try:
+	import pyarrow
+	import pyarrow.ipc
+except ImportError:
+	pyarrow = None
+
+from .. import dbgenerics
+
+# https://duckdb.org/docs/guides/python/export_arrow
+# https://duckdb.org/docs/guides/file_formats/parquet_export
+# https://arrow.apache.org/docs/python/ipc.html#using-streams
+
+EXPORT_BATCH_ROWS  = 65_536
+EXPORT_CHUNK_BYTES = 1_048_576
+
+EXPORT_MEDIA_TYPES = {
+	"arrow"  : "application/vnd.apache.arrow.stream",
+	"parquet": "application/vnd.apache.parquet",
+}
+
+
+def compile_query(session: dbgenerics.GenericSession, qry) -> str:
+	# the filters only produce numbers and strings, which sqlalchemy quotes itself
+	return str(qry.compile(dialect=session.bind.dialect, compile_kwargs={"literal_binds": True}))
+
+
+def iter_arrow(session_manager: dbgenerics.GenericSessionManager, qry) -> typing.Generator[bytes, None, None]:
+	# the export owns its session, on the request's reader engine: opened here, when the first batch
+	# is pulled, and closed when the generator ends or is closed. the request's own session has
+	# exited by the time the body is sent, and may be closed while this still reads
+	with Session(bind=session_manager.get_bind()) as session:
+		con    = session.connection().connection.driver_connection
+		reader = con.execute(compile_query(session, qry)).fetch_record_batch(EXPORT_BATCH_ROWS)
+		buff   = io.BytesIO()
+
+		with pyarrow.ipc.new_stream(buff, reader.schema) as writer:
+			for batch in reader:
+				writer.write_batch(batch)
+				yield buff.getvalue()
+				buff.seek(0)
+				buff.truncate(0)
+
+		yield buff.getvalue()
+
+
+def iter_parquet(session_manager: dbgenerics.GenericSessionManager, qry) -> typing.Generator[bytes, None, None]:
+	# duckdb writes the file itself. it is then sent in chunks and removed
+	fd, path = tempfile.mkstemp(suffix=".parquet")
+	os.close(fd)
+
+	try:
+		# a session of the export's own, as in iter_arrow. closed before the file is sent
+		with Session(bind=session_manager.get_bind()) as session:
+			con  = session.connection().connection.driver_connection
+			dest = path.replace("'", "''")
+			con.execute(f"COPY ({compile_query(session, qry)}) TO '{dest}' (FORMAT parquet, COMPRESSION zstd)")
+
+		with open(path, "rb") as fhd:
+			while chunk := fhd.read(EXPORT_CHUNK_BYTES):
+				yield chunk
+	finally:
+		os.remove(path)
+
+
+def export_response(session_manager: dbgenerics.GenericSessionManager, qry, fmt: str, filename: str) -> StreamingResponse:
+	if fmt == "arrow":
+		if pyarrow is None:
+			raise HTTPException(status_code=501, detail="ARROW EXPORT NEEDS PYARROW")
+		content = iter_arrow(session_manager, qry)
+	elif fmt == "parquet":
+		content = iter_parquet(session_manager, qry)
+	else:
+		raise ValueError(f"unknown export format: {fmt}")
+
+	return StreamingResponse(
+		content,
+		media_type = EXPORT_MEDIA_TYPES[fmt],
+		headers    = {"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+	)
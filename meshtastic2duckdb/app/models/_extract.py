@@ -0,0 +1,61 @@
+import typing
+
+# field specs are [name, path] pairs. a path is a tuple of keys walked from the packet root.
+# a key ending in "?" is optional: a missing intermediate key yields {} and a missing leaf yields None.
+# a plain callable taking the packet is still accepted for anything a path cannot express.
+#
+#   ["batteryLevel", ("decoded", "telemetry", "deviceMetrics?", "batteryLevel?")]
+#
+# all specs of a class are compiled into a single function which walks every
+# shared prefix once, instead of re-walking it for each field.
+
+EMPTY      = {}
+
+extractors = {}
+
+
+def _access(var: str, key: str, default: str) -> str:
+	if key.endswith("?"):
+		return f"{var}.get({key[:-1]!r}, {default})"
+	return f"{var}[{key!r}]"
+
+
+def compile_extractor(specs: list[tuple[str, tuple[str, ...]|typing.Callable]]) -> typing.Callable[[dict], dict[str, typing.Any]]:
+	env    = {"EMPTY": EMPTY}
+	nodes  = {(): "packet"}
+	lines  = []
+	values = []
+
+	for pos, (name, spec) in enumerate(specs):
+		if callable(spec):
+			env[f"func_{pos}"] = spec
+			values.append(f"{name!r}: func_{pos}(packet)")
+			continue
+
+		*parents, leaf = spec
+
+		for depth in range(1, len(parents) + 1):
+			path = tuple(parents[:depth])
+			if path not in nodes:
+				nodes[path] = f"node_{len(nodes)}"
+				lines.append(f"\t{nodes[path]} = {_access(nodes[path[:-1]], path[-1], 'EMPTY')}")
+
+		values.append(f"{name!r}: {_access(nodes[tuple(parents)], leaf, 'None')}")
+
+	source = "\n".join(["def extract(packet):"] + lines + ["\treturn {"] + [f"\t\t{v}," for v in values] + ["\t}"])
+
+	exec(source, env)
+
+	extract            = env["extract"]
+	extract.__source__ = source
+
+	return extract
+
+
+def get_extractor(cls) -> typing.Callable[[dict], dict[str, typing.Any]]:
+	extract = extractors.get(cls)
+
+	if extract is None:
+		extract = extractors[cls] = compile_extractor(cls._shared_fields + cls._fields)
+
+	return extract
@@ -1,8 +1,20 @@
-from fastapi import FastAPI, status, Request, Response, Path
+import json
+
+import pydantic
+
+from fastapi            import FastAPI, status, Request, Response, Path, HTTPException
+from fastapi.exceptions import RequestValidationError
 
 from ._message    import MessageClass, Message
 from ._base       import SharedFilterQuery, TimedFilterQuery
+from ._bulk       import bulk_insert
+from ._stream     import stream_format, stream_response
+from ._tier       import tier_source
+from ._export     import export_response
+from .reception   import ReceptionClass
+from ..dedup      import get_dedup_cache, get_batch_keys, fold_duplicates
 from ..dbgenerics import GenericSession, GenericSessionManager, DbEngine
+from ..dbexec     import run_db
 
 from fastapi.responses import HTMLResponse, JSONResponse
 
@@ -11,35 +23,110 @@ async def api_model_get( model: Message,      session_manager: GenericSessionMan
 	#print("api_model_get", "model", model, "session_manager", session_manager, "request", request, "response", response, "query_filter", query_filter)
 	#https://fastapi.tiangolo.com/tutorial/sql-databases/#read-heroes
 
-	resp = model.Query(session_manager=session_manager, query_filter=query_filter, filter_is_unique=filter_is_unique)
+	fmt = stream_format(query_filter.format, request.headers.get("accept"))
+
+	if fmt is not None:
+		# rows are serialized as they are fetched instead of building the whole list.
+		# only the query is built here. the rows are read on a session of the stream's own
+		with session_manager as session:
+			qry = query_filter(session, tier_source(model), filter_is_unique=filter_is_unique)
+
+		return stream_response(session_manager, qry, fmt, filename=model.__tablename__)
+
+	resp, next_cursor = await run_db(model.QueryPage, session_manager=session_manager, query_filter=query_filter, filter_is_unique=filter_is_unique)
+
+	if next_cursor is not None:
+		response.headers["X-Next-Cursor"] = next_cursor
 
 	return resp
 
 
-async def api_model_post( data: MessageClass, session_manager: GenericSessionManager, request: Request, response: Response ) -> None:
-	#print("api_model_post", "data", data, type(data), "session_manager", session_manager, "request", request, "response", response)
-	#print(dir(data))
+async def api_model_export( model: Message, session_manager: GenericSessionManager, request: Request, response: Response, query_filter: SharedFilterQuery, export_format: str ) -> Response:
+	# exports are meant for analytical pulls. without an explicit limit every matching row is returned
+	if "limit" not in request.query_params:
+		query_filter.limit = None
 
-	orm = data.toORM()
-	#orm = models.class_to_ORM(data)
-	# print("  orm", orm)
+	# only the query is built here. the rows are read on a session of the export's own
+	with session_manager as session:
+		qry = query_filter(session, tier_source(model))
+
+	return export_response(session_manager, qry, export_format, filename=model.__tablename__)
 
+
+def store( session_manager: GenericSessionManager, data: list[MessageClass], batch_key: tuple | None = None ) -> dict[str, int]:
+	# runs on the run_db pool. the write session is held from the checks to the marks, so two
+	# requests carrying the same message (or batch) never both see it as new.
+	# columnar or through the orm, as MESH_LOGGER_LOCAL_FAST_INSERT of the server's engine says
 	with session_manager as session:
-		session.add(orm)
+		# a batch sent again after it was stored, e.g. when its response was lost, is not stored twice
+		if batch_key is not None and get_batch_keys().seen(batch_key):
+			return {}
+
+		# the same message relayed by several gateways is stored once, plus one reception per copy
+		data, dedup_keys = fold_duplicates(get_dedup_cache(), data, ReceptionClass.from_message)
+
+		stats = bulk_insert(session, data)
 		session.commit()
+
+		# only stored messages (and batches) are seen. a failed store leaves the retry a full row
+		if dedup_keys:
+			get_dedup_cache().mark(dedup_keys)
+
+		if batch_key is not None:
+			get_batch_keys().mark([batch_key])
+
+	return stats
+
+
+async def api_model_post( data: MessageClass, session_manager: GenericSessionManager, request: Request, response: Response ) -> None:
+	#print("api_model_post", "data", data, type(data), "session_manager", session_manager, "request", request, "response", response)
+	#print(dir(data))
+
+	await run_db(store, session_manager, [data])
 	# print("  STORED")
 
 	return None
 
 
+async def api_model_post_batch( model: Message, data_adapter: pydantic.TypeAdapter, session_manager: GenericSessionManager, request: Request, response: Response ) -> dict[str, int]:
+	batch_key    = request.headers.get("idempotency-key")
+	batch_key    = None if batch_key is None else (model.__tablename__, batch_key)
+
+	# accepts either a json array or a ndjson body (one record per line)
+	body         = await request.body()
+	content_type = request.headers.get("content-type", "")
+
+	try:
+		if content_type.startswith("application/x-ndjson"):
+			records = [json.loads(line) for line in body.splitlines() if line.strip()]
+		else:
+			records = json.loads(body)
+	except ValueError as e:
+		raise HTTPException(status_code=400, detail=f"INVALID BODY: {e}")
+
+	if not isinstance(records, list):
+		raise HTTPException(status_code=400, detail="INVALID BODY: expected a list of records")
+
+	try:
+		data = data_adapter.validate_python(records)
+	except pydantic.ValidationError as e:
+		raise RequestValidationError(e.errors())
+
+	stats = await run_db(store, session_manager, data, batch_key)
+
+	return { model.__tablename__.upper(): 0, **stats }
+
+
 def init_model(*, model: Message, session_manager_t):
 	data_class   = model.__dataclass__()
 	query_filter = model.__filter__()
 	return data_class, query_filter
 
 
-def gen_endpoint(*, app: FastAPI, verb: str, endpoint: str, name: str, summary: str, description: str, model: Message, session_manager_t, tags: list[str], filter_key:str=None, filter_is_list: bool=False, response_model=None, fixed_response=None, status_code=None, filter_is_unique: str|None=None):
+def gen_endpoint(*, app: FastAPI, verb: str, endpoint: str, name: str, summary: str, description: str, model: Message, session_manager_t, tags: list[str], filter_key:str=None, filter_is_list: bool=False, response_model=None, fixed_response=None, status_code=None, filter_is_unique: str|None=None, is_batch: bool=False, export_format: str|None=None):
 	assert verb in ("GET","POST")
+	assert not is_batch or verb == "POST"
+	assert not export_format or verb == "GET"
 
 	alias        = None
 
@@ -72,6 +159,9 @@ def gen_endpoint(*, app: FastAPI, verb: str, endpoint: str, name: str, summary:
 
 			mod_filter_key(filter_query=query_filter, filter_key=filter_key, filter_is_list=filter_is_list, path_param=path_param)
 
+			if export_format:
+				return await api_model_export(model=model, session_manager=session_manager, request=request, response=response, query_filter=query_filter, export_format=export_format)
+
 			res = await api_model_get(model=model, session_manager=session_manager,    request=request,  response=response, query_filter=query_filter, filter_is_unique=filter_is_unique)
 
 			return res
@@ -105,6 +195,31 @@ def gen_endpoint(*, app: FastAPI, verb: str, endpoint: str, name: str, summary:
 			async def endpoint(                             session_manager: session_manager_t, request: Request, response: Response, query_filter: query_filter) -> response_model:
 				return await get_endpoint(session_manager=session_manager, request=request, response=response, query_filter=query_filter, path_param=None)
 
+	elif verb == "POST" and is_batch:
+		data_adapter = pydantic.TypeAdapter(list[data_class])
+
+		@app.post(
+			endpoint,
+			name           = name,
+			summary        = summary,
+			description    = description,
+			tags           = tags,
+			operation_id   = operation_id,
+			response_model = response_model,
+			status_code    = status_code,
+			openapi_extra  = {
+				"requestBody": {
+					"required": True,
+					"content" : {
+						"application/json"    : {"schema": {"type": "array", "items": {"$ref": f"#/components/schemas/{data_class.__name__}"}}},
+						"application/x-ndjson": {"schema": {"type": "string"}},
+					}
+				}
+			}
+		)
+		async def endpoint(                                   session_manager: session_manager_t, request: Request, response: Response) -> response_model:
+			return await api_model_post_batch(model=model, data_adapter=data_adapter, session_manager=session_manager, request=request, response=response)
+
 	elif verb == "POST":
 		if alias is not None:
 			@app.post(
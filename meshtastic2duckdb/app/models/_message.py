@@ -22,26 +22,26 @@ class MessageClass(ModelBaseClass):
 	portnum   : str
 	bitfield  : int8  | None
 
-	_fields       : typing.ClassVar[list[tuple[str, typing.Callable]]] = []
-	_shared_fields: typing.ClassVar[list[tuple[str, typing.Callable]]] = [
-		["from_node"  , lambda packet: packet["from"]                         ],
-		["to_node"    , lambda packet: packet["to"]                           ],
+	_fields       : typing.ClassVar[list[tuple[str, tuple[str, ...]|typing.Callable]]] = []
+	_shared_fields: typing.ClassVar[list[tuple[str, tuple[str, ...]|typing.Callable]]] = [
+		["from_node"  , ("from",)                ],
+		["to_node"    , ("to",)                  ],
 
-		["fromId"     , lambda packet: packet.get("fromId"  , None)           ],
-		["toId"       , lambda packet: packet.get("toId"    , None)           ],
+		["fromId"     , ("fromId?",)             ],
+		["toId"       , ("toId?",)               ],
 
-		["rxTime"     , lambda packet: packet.get("rxTime"  , None)           ],
-		["rxRssi"     , lambda packet: packet.get("rxRssi"  , None)           ],
-		["rxSnr"      , lambda packet: packet.get("rxSnr"   , None)           ],
+		["rxTime"     , ("rxTime?",)             ],
+		["rxRssi"     , ("rxRssi?",)             ],
+		["rxSnr"      , ("rxSnr?",)              ],
 
-		["hopStart"   , lambda packet: packet.get("hopStart", None)           ],
-		["hopLimit"   , lambda packet: packet.get("hopLimit", None)           ],
+		["hopStart"   , ("hopStart?",)           ],
+		["hopLimit"   , ("hopLimit?",)           ],
 
-		["message_id" , lambda packet: packet["id"]                           ],
-		["priority"   , lambda packet: packet.get("priority", None)           ],
+		["message_id" , ("id",)                  ],
+		["priority"   , ("priority?",)           ],
 
-		["portnum"    , lambda packet: packet["decoded"]["portnum"]           ],
-		["bitfield"   , lambda packet: packet["decoded"].get("bitfield", None)],
+		["portnum"    , ("decoded", "portnum")   ],
+		["bitfield"   , ("decoded", "bitfield?") ],
 	]
 
 	__pretty_names__ = {
@@ -1,14 +1,21 @@
+import base64
+import binascii
+
 from datetime import datetime, timedelta
 
 from typing import Annotated, Optional, Generator, Literal
 
-from fastapi  import Depends, Query, params as fastapi_params
+from fastapi  import Depends, Query, HTTPException, params as fastapi_params
 from pydantic import BaseModel
-from sqlmodel import select
+from sqlmodel import select, and_, or_
+from sqlalchemy import inspect
 from pydantic.functional_validators import AfterValidator
 
 from .. import dbgenerics
 
+# partition bounds of the rows of a tiered table, see _tier
+TIER_START = "tier_start"
+TIER_END   = "tier_end"
 
 
 
@@ -75,6 +82,20 @@ def validate_time(vals: str) -> str:
 
 
 
+def encode_cursor(gateway_receive_time: int, id: int) -> str:
+	return base64.urlsafe_b64encode(f"{gateway_receive_time}:{id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple[int, int]:
+	try:
+		gateway_receive_time, id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+		return int(gateway_receive_time), int(id)
+	except (ValueError, binascii.Error, UnicodeDecodeError):
+		raise HTTPException(status_code=400, detail=f"INVALID CURSOR: {cursor}")
+
+
+
+
+
 def gen_html_filters(inst, url: str, filter_opts: list[ tuple[str,str,str, list[tuple[str,str]]]] ) -> list[str]:
 	res = []
 
@@ -112,6 +133,12 @@ class SharedFilterQueryParams(BaseModel):
 	offset  : Annotated[ int                  |None, Query(default= 0 , ge=0)         ]
 	limit   : Annotated[ int                  |None, Query(default=10 , gt=0, le=100) ]
 	order   : Annotated[ Literal["asc", "dsc"]|None, Query(default="asc")             ]
+	# keyset pagination on (gateway_receive_time, id). has precedence over offset
+	cursor  : Annotated[ str                  |None, Query(default=None)              ]
+	# count the filtered rows exactly instead of estimating them on large tables
+	exact   : Annotated[ bool                 |None, Query(default=False)             ]
+	# json (default) or a streamed ndjson/csv response. also picked from the accept header
+	format  : Annotated[ Literal["json", "ndjson", "csv"]|None, Query(default=None) ]
 	# dryrun  : Annotated[ bool                 |None, Query(default=False)             ]
 	# q       : Annotated[ str                  |None              , Query(default=None)              ]
 	# reversed: Annotated[ bool                               , Query(default=False)             ]
@@ -126,7 +153,7 @@ class SharedFilterQueryParams(BaseModel):
 			if isinstance(v, fastapi_params.Depends):
 				setattr(self, k, v.dependency())
 
-		for a in ["offset", "limit", "order"]:
+		for a in ["offset", "limit", "order", "cursor"]:
 			setattr(self, a, None if getattr(self, a) in ("",None) else getattr(self, a))
 
 
@@ -143,10 +170,23 @@ class SharedFilterQueryParams(BaseModel):
 			#print(f" ORDER       '{self.order}'")
 			if self.order == "asc":
 				sel = sel.order_by( cls.gateway_receive_time.asc() )
+				if not filter_is_unique:
+					sel = sel.order_by( cls.id.asc() )
 			else:
 				sel = sel.order_by( cls.gateway_receive_time.desc() )
+				if not filter_is_unique:
+					sel = sel.order_by( cls.id.desc() )
+
+		if self.cursor is not None and not filter_is_unique:
+			#print(f" CURSOR      '{self.cursor}'")
+			cursor_time, cursor_id = decode_cursor(self.cursor)
+
+			if self.order == "dsc":
+				sel = sel.where( or_( cls.gateway_receive_time < cursor_time, and_( cls.gateway_receive_time == cursor_time, cls.id < cursor_id ) ) )
+			else:
+				sel = sel.where( or_( cls.gateway_receive_time > cursor_time, and_( cls.gateway_receive_time == cursor_time, cls.id > cursor_id ) ) )
 
-		if self.offset is not None:
+		elif self.offset is not None:
 			#print(f" OFFSET      '{self.offset}'")
 			sel = sel.offset(self.offset)
 
@@ -184,7 +224,8 @@ class SharedFilterQueryParams(BaseModel):
 				[ "50",  "50"],
 				["100", "100"],
 				["All", "1000000000"]
-			]]
+			]],
+			[self, "exact" , "Exact Count", "checkbox", None ]
 		]
 
 		filters = []
@@ -235,26 +276,19 @@ class TimedFilterQueryParams(SharedFilterQueryParams):
 	time_from  : Annotated[Optional[str]  , Query(default="1W"                    ), AfterValidator(validate_time) ]
 	time_length: Annotated[Optional[str]  , Query(default="30Y"                   ), AfterValidator(validate_time) ]
 
-	def __call__(self, session: dbgenerics.GenericSession, cls, filter_is_unique: str|None=None):
-		qry = SharedFilterQueryParams.__call__(self, session, cls, filter_is_unique=filter_is_unique)
-
-		for k in self.model_fields.keys():
-			v = getattr(self, k)
-			if isinstance(v, fastapi_params.Depends):
-				setattr(self, k, v.dependency())
-
-		for a in ["since", "until", "time_from", "time_length"]:
-			setattr(self, a, None if getattr(self, a) in ("",None) else getattr(self, a))
+	def time_window(self) -> tuple[int|None, int|None]:
+		# the gateway_receive_time range selected by the filter. None is unbounded
+		time_start, time_end = None, None
 
 		if self.since is not None:
 			if self.time_from is None:
 				#print(f" SINCE       '{self.since}' {type(self.since)}")
-				qry = qry.where(cls.gateway_receive_time >= self.since)
+				time_start = self.since
 
 		if self.until is not None:
 			if self.time_length is None:
 				#print(f" UNTIL       '{self.until}'")
-				qry = qry.where(cls.gateway_receive_time <= self.until)
+				time_end   = self.until
 
 		if self.time_from is not None:
 			#print(f" TIME_FROM   '{self.time_from}'")
@@ -267,9 +301,7 @@ class TimedFilterQueryParams(SharedFilterQueryParams):
 
 			assert time_from_unit in delta_short_to_long, f"invalide unit: {delta_short_to_long.keys()}"
 
-			time_from_ts   = get_timestamp(value=time_from_val, unit=time_from_unit, begin=None, after=False)
-
-			qry            = qry.where(cls.gateway_receive_time >= time_from_ts)
+			time_start     = get_timestamp(value=time_from_val, unit=time_from_unit, begin=None, after=False)
 
 			if self.time_length is not None:
 				#print(f" TIME_LENGTH '{self.time_length}'")
@@ -281,8 +313,38 @@ class TimedFilterQueryParams(SharedFilterQueryParams):
 				time_length_val  = int(time_length[:-1])
 				assert time_length_unit in delta_short_to_long, f"invalide unit: {delta_short_to_long.keys()}"
 
-				time_length_ts   = get_timestamp(value=time_length_val, unit=time_length_unit, begin=time_from_ts, after=True)
-				qry              = qry.where(cls.gateway_receive_time <= time_length_ts)
+				time_end         = get_timestamp(value=time_length_val, unit=time_length_unit, begin=time_start, after=True)
+
+		return time_start, time_end
+
+	def __call__(self, session: dbgenerics.GenericSession, cls, filter_is_unique: str|None=None):
+		qry = SharedFilterQueryParams.__call__(self, session, cls, filter_is_unique=filter_is_unique)
+
+		for k in self.model_fields.keys():
+			v = getattr(self, k)
+			if isinstance(v, fastapi_params.Depends):
+				setattr(self, k, v.dependency())
+
+		for a in ["since", "until", "time_from", "time_length"]:
+			setattr(self, a, None if getattr(self, a) in ("",None) else getattr(self, a))
+
+		time_start, time_end = self.time_window()
+
+		if time_start is not None:
+			qry = qry.where(cls.gateway_receive_time >= time_start)
+
+		if time_end is not None:
+			qry = qry.where(cls.gateway_receive_time <= time_end)
+
+		# tables with a cold tier are read through a view carrying each row's partition bounds.
+		# the same window on them lets duckdb skip the parquet files outside it
+		tier_columns = inspect(cls).selectable.c
+		if TIER_END in tier_columns:
+			if time_start is not None:
+				qry = qry.where(tier_columns[TIER_END  ] >  time_start)
+
+			if time_end is not None:
+				qry = qry.where(tier_columns[TIER_START] <= time_end)
 
 		return qry
 
@@ -0,0 +1,21 @@
+from sqlalchemy import delete, select
+
+from .. import dbgenerics
+
+# rows older than a table's retention are deleted in batches, each committed on its own,
+# so a large backlog never builds one transaction bigger than the memory limit.
+# each batch takes the writer session on its own, so inserts wait for one batch, not the whole run
+
+
+def retention_delete(session_manager: dbgenerics.GenericSessionManager, orm_class, before: int, batch_size: int) -> int:
+	deleted = 0
+
+	while True:
+		with session_manager as session:
+			ids      = select(orm_class.id).where(orm_class.gateway_receive_time < before).limit(batch_size)
+			num_rows = session.execute( delete(orm_class).where(orm_class.id.in_(ids.scalar_subquery())) ).rowcount
+			session.commit()
+
+		deleted += num_rows
+		if num_rows < batch_size:
+			return deleted
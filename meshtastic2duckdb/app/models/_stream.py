@@ -0,0 +1,91 @@
+import io
+import csv
+import json
+import typing
+
+from fastapi.responses import StreamingResponse
+from sqlmodel          import Session
+
+from .. import dbgenerics
+
+# https://fastapi.tiangolo.com/advanced/custom-response/#streamingresponse
+# https://docs.sqlalchemy.org/en/20/core/connections.html#sqlalchemy.engine.Result.partitions
+
+STREAM_CHUNK_ROWS = 10_000
+
+STREAM_MEDIA_TYPES = {
+	"ndjson": "application/x-ndjson",
+	"csv"   : "text/csv",
+}
+
+
+def stream_format(fmt: str|None, accept: str|None) -> str|None:
+	# explicit format parameter wins over the accept header
+	if fmt is not None:
+		return None if fmt == "json" else fmt
+
+	for name, media_type in STREAM_MEDIA_TYPES.items():
+		if media_type in (accept or ""):
+			return name
+
+	return None
+
+
+def json_value(value: typing.Any) -> typing.Any:
+	if isinstance(value, bytes):
+		return value.decode("utf-8", errors="backslashreplace")
+	return value
+
+
+def iter_chunks(session_manager: dbgenerics.GenericSessionManager, qry) -> typing.Generator[tuple[list[str], list[tuple]], None, None]:
+	# plain core rows, fetched STREAM_CHUNK_ROWS at a time. no orm or pydantic objects are built.
+	# the stream owns its session, on the request's reader engine: opened here, when the first chunk
+	# is pulled, and closed when the generator ends or is closed. the request's own session has
+	# exited by the time the body is sent, and may be closed while this still reads
+	with Session(bind=session_manager.get_bind()) as session:
+		result = session.connection().execute(qry)
+		keys   = list(result.keys())
+		empty  = True
+
+		for rows in result.partitions(STREAM_CHUNK_ROWS):
+			empty = False
+			yield keys, rows
+
+		if empty:
+			yield keys, []
+
+
+def iter_ndjson(session_manager: dbgenerics.GenericSessionManager, qry) -> typing.Generator[str, None, None]:
+	for keys, rows in iter_chunks(session_manager, qry):
+		yield "".join(json.dumps({k: json_value(v) for k,v in zip(keys, row)}) + "\n" for row in rows)
+
+
+def iter_csv(session_manager: dbgenerics.GenericSessionManager, qry) -> typing.Generator[str, None, None]:
+	header = True
+
+	for keys, rows in iter_chunks(session_manager, qry):
+		buff   = io.StringIO()
+		writer = csv.writer(buff)
+
+		if header:
+			writer.writerow(keys)
+			header = False
+
+		writer.writerows(rows)
+
+		yield buff.getvalue()
+
+
+def stream_response(session_manager: dbgenerics.GenericSessionManager, qry, fmt: str, filename: str) -> StreamingResponse:
+	if fmt == "ndjson":
+		content = iter_ndjson(session_manager, qry)
+	elif fmt == "csv":
+		content = iter_csv(session_manager, qry)
+	else:
+		raise ValueError(f"unknown stream format: {fmt}")
+
+	return StreamingResponse(
+		content,
+		media_type = STREAM_MEDIA_TYPES[fmt],
+		headers    = {"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'}
+	)
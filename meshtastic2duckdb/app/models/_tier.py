@@ -0,0 +1,158 @@
+import os
+import glob
+import uuid
+import datetime
+
+from sqlalchemy     import BigInteger, table as sql_table, column as sql_column
+from sqlalchemy.orm import aliased
+
+from ._query import TIER_START, TIER_END
+from ..      import dbgenerics
+
+# rows older than a cutoff are moved out of the duckdb file into hive partitioned parquet files,
+# one directory per day or month:
+#
+#   <tier_dir>/<table>/tier_start=<epoch>/tier_end=<epoch>/<run>_<n>.parquet
+#
+# readers go through the <table>_all view, the table plus the parquet files. the time filter
+# is repeated on tier_start/tier_end, which duckdb uses to skip whole partitions unopened.
+# https://duckdb.org/docs/data/partitioning/hive_partitioning
+
+TIER_PARTITIONS = ("day", "month")
+TIER_STAGING    = ".staging"
+
+# table name -> (tiered entity, latest tier_end). only tables which already have cold files
+tier_views = {}
+
+
+def tier_partition_start(timestamp: int, partition: str) -> int:
+	# start of the day or month (utc) the timestamp falls in
+	date = datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+	date = date.replace(hour=0, minute=0, second=0, microsecond=0)
+	if partition == "month":
+		date = date.replace(day=1)
+	return int(date.timestamp())
+
+
+def tier_glob(tier_dir: str, table_name: str) -> str:
+	return os.path.join(tier_dir, table_name, f"{TIER_START}=*", f"{TIER_END}=*", "*.parquet")
+
+
+def tier_read(tier_dir: str, table_name: str) -> str:
+	return f"read_parquet('{tier_glob(tier_dir, table_name)}', hive_partitioning = true, union_by_name = true, hive_types = {{'{TIER_START}': BIGINT, '{TIER_END}': BIGINT}})"
+
+
+def tier_source(orm_class):
+	# what a query on orm_class should read. the table itself until it has cold files
+	view = tier_views.get(orm_class.__tablename__)
+	return orm_class if view is None else view[0]
+
+
+def tier_cutoff(orm_class) -> int | None:
+	# rows before this are in the cold tier and can no longer be changed
+	view = tier_views.get(orm_class.__tablename__)
+	return None if view is None else view[1]
+
+
+def tier_views_create(session: dbgenerics.GenericSession, tiered: list[type], tier_dir: str, read_only: bool = False):
+	# (re)creates the views of the tiered tables which have cold files. after every move,
+	# and on startup, as columns added to a table have to be added to its view too
+	con = session.connection().connection.driver_connection
+
+	for orm_class in tiered:
+		table_name = orm_class.__tablename__
+		view_name  = f"{table_name}_all"
+
+		if not glob.glob(tier_glob(tier_dir, table_name)):
+			# never had cold files, or retention dropped the last of them
+			if not read_only:
+				con.execute(f'DROP VIEW IF EXISTS "{view_name}"')
+			tier_views.pop(table_name, None)
+			continue
+
+		if not read_only:
+			con.execute(f'''
+				CREATE OR REPLACE VIEW "{view_name}" AS
+					SELECT *, gateway_receive_time AS "{TIER_START}", gateway_receive_time + 1 AS "{TIER_END}" FROM "{table_name}"
+				UNION ALL BY NAME
+					SELECT * FROM {tier_read(tier_dir, table_name)}
+			''')
+
+		cutoff     = con.execute(f'SELECT max("{TIER_END}") FROM {tier_read(tier_dir, table_name)}').fetchone()[0]
+		view       = sql_table(view_name, *[sql_column(c.name, c.type) for c in orm_class.__table__.columns], sql_column(TIER_START, BigInteger()), sql_column(TIER_END, BigInteger()))
+
+		tier_views[table_name] = (aliased(orm_class, view, adapt_on_names=True), cutoff)
+
+
+def tier_move(session: dbgenerics.GenericSession, orm_class, before: int, partition: str, tier_dir: str) -> int:
+	# writes the rows older than before to the staging directory, then promotes them
+	assert partition in TIER_PARTITIONS, f"invalid partition: {partition} not in {', '.join(TIER_PARTITIONS)}"
+
+	table_name = orm_class.__tablename__
+	staging    = os.path.join(tier_dir, TIER_STAGING, table_name)
+	run        = uuid.uuid4().hex
+	start      = f"date_trunc('{partition}', make_timestamp(gateway_receive_time * 1000000))"
+	con        = session.connection().connection.driver_connection
+
+	num_rows   = con.execute(f'SELECT count(*) FROM "{table_name}" WHERE gateway_receive_time < {before}').fetchone()[0]
+	if num_rows == 0:
+		return 0
+
+	os.makedirs(os.path.dirname(staging), exist_ok=True)
+	con.execute(f'''
+		COPY (
+			SELECT *, epoch({start})::BIGINT AS "{TIER_START}", epoch({start} + INTERVAL 1 {partition})::BIGINT AS "{TIER_END}"
+			FROM "{table_name}" WHERE gateway_receive_time < {before}
+		) TO '{staging}' (FORMAT PARQUET, PARTITION_BY ("{TIER_START}", "{TIER_END}"), FILENAME_PATTERN '{run}_{{i}}')
+	''')
+
+	tier_promote(session, orm_class, tier_dir)
+	return num_rows
+
+
+def tier_promote(session: dbgenerics.GenericSession, orm_class, tier_dir: str) -> int:
+	# staged files hold rows which may or may not have been deleted from the table yet,
+	# if a move was interrupted. deleting them by id, then moving the files in place, is right either way
+	table_name = orm_class.__tablename__
+	staging    = os.path.join(tier_dir, TIER_STAGING, table_name)
+	files      = glob.glob(tier_glob(os.path.join(tier_dir, TIER_STAGING), table_name))
+
+	if not files:
+		return 0
+
+	con        = session.connection().connection.driver_connection
+	con.execute(f'''DELETE FROM "{table_name}" WHERE id IN (SELECT id FROM read_parquet('{tier_glob(os.path.join(tier_dir, TIER_STAGING), table_name)}'))''')
+
+	# committed before the files become visible to the view, so no row is ever read twice
+	session.commit()
+
+	for filename in files:
+		target = os.path.join(tier_dir, table_name, os.path.relpath(filename, staging))
+		os.makedirs(os.path.dirname(target), exist_ok=True)
+		os.replace(filename, target)
+
+	return len(files)
+
+
+def tier_drop(tier_dir: str, table_name: str, before: int) -> int:
+	# removes the partitions which end before the cutoff. a partition straddling it is kept whole
+	dropped = 0
+
+	for partition in glob.glob(os.path.join(tier_dir, table_name, f"{TIER_START}=*", f"{TIER_END}=*")):
+		tier_end = int(os.path.basename(partition).split("=", 1)[1])
+		if tier_end > before:
+			continue
+
+		for filename in glob.glob(os.path.join(partition, "*.parquet")):
+			os.remove(filename)
+			dropped += 1
+
+		os.rmdir(partition)
+		if not os.listdir(os.path.dirname(partition)):
+			os.rmdir(os.path.dirname(partition))
+
+	return dropped
+
+
+def tier_bytes(tier_dir: str) -> int:
+	return sum(os.path.getsize(filename) for filename in glob.glob(os.path.join(tier_dir, "**", "*.parquet"), recursive=True))
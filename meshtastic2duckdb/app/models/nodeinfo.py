@@ -5,6 +5,7 @@ from fastapi   import params as fastapi_params
 class NodeInfoClass(MessageClass):
 	__tablename__       = "nodeinfo"
 	__ormclass__        = lambda: NodeInfo
+	__portnum__         = "NODEINFO_APP"
 
 	user_id             : str # !a
 	longName            : str # M
@@ -14,14 +15,14 @@ class NodeInfoClass(MessageClass):
 	role                : str # TRACKER
 	publicKey           : str # S3
 
-	_fields: typing.ClassVar[list[tuple[str, typing.Callable]]] = [
-		["user_id"   , lambda packet: packet["decoded"]["user"]["id"]       ],
-		["longName"  , lambda packet: packet["decoded"]["user"]["longName"] ],
-		["shortName" , lambda packet: packet["decoded"]["user"]["shortName"]],
-		["macaddr"   , lambda packet: packet["decoded"]["user"]["macaddr"]  ],
-		["hwModel"   , lambda packet: packet["decoded"]["user"]["hwModel"]  ],
-		["role"      , lambda packet: packet["decoded"]["user"]["role"]     ],
-		["publicKey" , lambda packet: packet["decoded"]["user"]["publicKey"]],
+	_fields: typing.ClassVar[list[tuple[str, tuple[str, ...]|typing.Callable]]] = [
+		["user_id"   , ("decoded", "user", "id")        ],
+		["longName"  , ("decoded", "user", "longName")  ],
+		["shortName" , ("decoded", "user", "shortName") ],
+		["macaddr"   , ("decoded", "user", "macaddr")   ],
+		["hwModel"   , ("decoded", "user", "hwModel")   ],
+		["role"      , ("decoded", "user", "role")      ],
+		["publicKey" , ("decoded", "user", "publicKey") ],
 	]
 
 	__pretty_names__ = {
@@ -127,11 +128,11 @@ class NodeInfoFilterQueryParams(MessageFilterQueryParams):
 		if self.hwModels is not None:
 			#print(f" HW MODELS   '{self.hwModels}'")
 			hw_models = self.hwModels.split(',')
-			if long_names:
+			if hw_models:
 				qry = qry.where(cls.hwModel.in_( hw_models ))
 
 		if self.roles is not None:
-			#roles = self.roles.split(",")
+			roles = self.roles.split(",")
 			if roles:
 				#print(f" ROLES       '{self.roles}'")
 				roles     = self.roles.split(",")
@@ -1,7 +1,16 @@
+import warnings
+
 from ._base    import *
 from ._message import *
+from ._bulk    import columnar_source
+from ._tier    import tier_source
+from ._query   import validate_time
+from pydantic.functional_validators import AfterValidator
 from fastapi   import params as fastapi_params
 
+from sqlalchemy import UniqueConstraint, and_, cast, delete, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
 class NodesClass(ModelBaseClass):
 	__tablename__       = "nodes"
 	__ormclass__        = lambda: Nodes
@@ -33,34 +42,34 @@ class NodesClass(ModelBaseClass):
 	role                : str           # TRACKER
 	shortName           : str           # AAAA
 
-	_shared_fields: typing.ClassVar[list[tuple[str, typing.Callable]]] = []
-	_fields       : typing.ClassVar[list[tuple[str, typing.Callable]]] = [
-		["hopsAway"          , lambda data: data.get("hopsAway"  , None) ],
-		["lastHeard"         , lambda data: data.get("lastHeard" , None) ],
-		["num"               , lambda data: data["num"] ],
-		["snr"               , lambda data: data.get("snr"       , None) ],
-		["isFavorite"        , lambda data: data.get("isFavorite", None) ],
-
-		["airUtilTx"         , lambda data: data.get("deviceMetrics", {}).get("airUtilTx"         , None)],
-		["batteryLevel"      , lambda data: data.get("deviceMetrics", {}).get("batteryLevel"      , None)],
-		["channelUtilization", lambda data: data.get("deviceMetrics", {}).get("channelUtilization", None)],
-		["uptimeSeconds"     , lambda data: data.get("deviceMetrics", {}).get("uptimeSeconds"     , None)],
-		["voltage"           , lambda data: data.get("deviceMetrics", {}).get("voltage"           , None)],
-
-		["altitude"          , lambda data: data.get("position", {}).get("altitude"  , None)],
-		["latitude"          , lambda data: data.get("position", {}).get("latitude"  , None)],
-		["latitudeI"         , lambda data: data.get("position", {}).get("latitudeI" , None)],
-		["longitude"         , lambda data: data.get("position", {}).get("longitude" , None)],
-		["longitudeI"        , lambda data: data.get("position", {}).get("longitudeI", None)],
-		["time"              , lambda data: data.get("position", {}).get("time"      , None)],
-
-		["hwModel"           , lambda data: data["user"]["hwModel"]],
-		["user_id"           , lambda data: data["user"]["id"]],
-		["longName"          , lambda data: data["user"]["longName"]],
-		["macaddr"           , lambda data: data["user"]["macaddr"]],
-		["publicKey"         , lambda data: data["user"]["publicKey"]],
-		["role"              , lambda data: data["user"]["role"]],
-		["shortName"         , lambda data: data["user"]["shortName"]],
+	_shared_fields: typing.ClassVar[list[tuple[str, tuple[str, ...]|typing.Callable]]] = []
+	_fields       : typing.ClassVar[list[tuple[str, tuple[str, ...]|typing.Callable]]] = [
+		["hopsAway"          , ("hopsAway?",)                            ],
+		["lastHeard"         , ("lastHeard?",)                           ],
+		["num"               , ("num",)                                  ],
+		["snr"               , ("snr?",)                                 ],
+		["isFavorite"        , ("isFavorite?",)                          ],
+
+		["airUtilTx"         , ("deviceMetrics?", "airUtilTx?")          ],
+		["batteryLevel"      , ("deviceMetrics?", "batteryLevel?")       ],
+		["channelUtilization", ("deviceMetrics?", "channelUtilization?") ],
+		["uptimeSeconds"     , ("deviceMetrics?", "uptimeSeconds?")      ],
+		["voltage"           , ("deviceMetrics?", "voltage?")            ],
+
+		["altitude"          , ("position?", "altitude?")                ],
+		["latitude"          , ("position?", "latitude?")                ],
+		["latitudeI"         , ("position?", "latitudeI?")               ],
+		["longitude"         , ("position?", "longitude?")               ],
+		["longitudeI"        , ("position?", "longitudeI?")              ],
+		["time"              , ("position?", "time?")                    ],
+
+		["hwModel"           , ("user", "hwModel")                       ],
+		["user_id"           , ("user", "id")                            ],
+		["longName"          , ("user", "longName")                      ],
+		["macaddr"           , ("user", "macaddr")                       ],
+		["publicKey"         , ("user", "publicKey")                     ],
+		["role"              , ("user", "role")                          ],
+		["shortName"         , ("user", "shortName")                     ],
 	]
 
 
@@ -69,6 +78,7 @@ nodes_id_seq = gen_id_seq("nodes")
 class Nodes(ModelBase, SQLModel, table=True):
 	__dataclass__ = lambda: NodesClass
 	__filter__    = lambda: NodesFilterQuery
+	__state__     = lambda: node_state_update
 
 	hopsAway            : int8  | None  = Field( default=None, sa_type=SmallInteger(), nullable=True              ) # 0
 	lastHeard           : int64 | None  = Field( default=None, sa_type=BigInteger()  , nullable=True              ) # 1700000000
@@ -182,8 +192,8 @@ class NodesPositionFilterQueryParams(TimedFilterQueryParams):
 
 		return qry
 
-	def __call__(self, session: dbgenerics.GenericSession, cls):
-		qry = TimedFilterQueryParams.__call__(self, session, cls)
+	def __call__(self, session: dbgenerics.GenericSession, cls, filter_is_unique: str|None=None):
+		qry = TimedFilterQueryParams.__call__(self, session, cls, filter_is_unique=filter_is_unique)
 
 		for k in self.model_fields.keys():
 			v = getattr(self, k)
@@ -222,8 +232,8 @@ class NodesFilterQueryParams(NodesPositionFilterQueryParams):
 			**NodesPositionFilterQueryParams.endpoints()
 		}
 
-	def __call__(self, session: dbgenerics.GenericSession, cls):
-		qry = TimedFilterQueryParams.__call__(self, session, cls)
+	def __call__(self, session: dbgenerics.GenericSession, cls, filter_is_unique: str|None=None):
+		qry = TimedFilterQueryParams.__call__(self, session, cls, filter_is_unique=filter_is_unique)
 
 		for k in self.model_fields.keys():
 			v = getattr(self, k)
@@ -271,6 +281,124 @@ class NodesFilterQueryParams(NodesPositionFilterQueryParams):
 
 NodesFilterQuery = Annotated[NodesFilterQueryParams, Depends(NodesFilterQueryParams)]
 
+
+class NodeStateFilterQueryParams(NodesFilterQueryParams):
+	# node_state's gateway_receive_time is when the node last changed, not when it was last heard.
+	# a node unchanged for a week is still current, so every node is listed unless a window is asked for
+	time_from  : Annotated[Optional[str]  , Query(default=None                    ), AfterValidator(validate_time) ]
+
+NodeStateFilterQuery = Annotated[NodeStateFilterQueryParams, Depends(NodeStateFilterQueryParams)]
+
+
+
+
+# the latest snapshot per node. the nodes table above is its change log: a snapshot
+# is appended there only when it changed node_state, instead of once per node per tick.
+# no indexes besides num, as duckdb cannot update indexed columns. that includes
+# gateway_receive_time, which is redeclared without the index ModelBase gives it
+warnings.filterwarnings("ignore", message='Field name "gateway_receive_time" in "NodeState" shadows', category=UserWarning)
+
+node_state_id_seq = gen_id_seq("node_state")
+class NodeState(ModelBase, SQLModel, table=True):
+	__tablename__  = "node_state"
+	__table_args__ = (UniqueConstraint("num"),)
+	__dataclass__  = lambda: NodesClass
+	__filter__     = lambda: NodeStateFilterQuery
+	__derived__    = True # kept by node_state_update
+
+	gateway_receive_time : int64    = Field(               sa_type=BigInteger()  , nullable=False             ) # when it last changed
+
+	hopsAway            : int8  | None  = Field( default=None, sa_type=SmallInteger(), nullable=True              ) # 0
+	lastHeard           : int64 | None  = Field( default=None, sa_type=BigInteger()  , nullable=True              ) # 1700000000
+	num                 : int64         = Field(               sa_type=BigInteger()  , nullable=False             ) # 24
+	snr                 : float | None  = Field( default=None, sa_type=Float()       , nullable=True              ) # 16.0
+	isFavorite          : bool  | None  = Field( default=None, sa_type=Boolean()     , nullable=True              ) # True
+
+	airUtilTx           : float | None  = Field( default=None, sa_type=Float()       , nullable=True              ) # 3.1853054
+	batteryLevel        : int8  | None  = Field( default=None, sa_type=SmallInteger(), nullable=True              ) # 64
+	channelUtilization  : float | None  = Field( default=None, sa_type=Float()       , nullable=True              ) # 0.0
+	uptimeSeconds       : int64 | None  = Field( default=None, sa_type=BigInteger()  , nullable=True              ) # 16792
+	voltage             : float | None  = Field( default=None, sa_type=Float()       , nullable=True              ) # 3.836
+
+	altitude            : int16 | None  = Field( default=None, sa_type=SmallInteger(), nullable=True              ) # 18
+	latitude            : float | None  = Field( default=None, sa_type=Float()       , nullable=True              ) # 52.0000000
+	latitudeI           : int32 | None  = Field( default=None, sa_type=Integer()     , nullable=True              ) #  520000000
+	longitude           : float | None  = Field( default=None, sa_type=Float()       , nullable=True              ) #  4.0000000
+	longitudeI          : int32 | None  = Field( default=None, sa_type=Integer()     , nullable=True              ) #   48000000
+	time                : int64 | None  = Field( default=None, sa_type=BigInteger()  , nullable=True              ) #  170000000
+
+	hwModel             : str           = Field(               sa_type=Text()        , nullable=False             ) # TRACKER_T1000_E
+	user_id             : str           = Field(               sa_type=Text()        , nullable=False             ) # !8fffffff
+	longName            : str           = Field(               sa_type=Text()        , nullable=False             ) # Aaaaaaa
+	macaddr             : str           = Field(               sa_type=Text()        , nullable=False             ) # 3Fffffff
+	publicKey           : str           = Field(               sa_type=Text()        , nullable=False             ) # Ia
+	role                : str           = Field(               sa_type=Text()        , nullable=False             ) # TRACKER
+	shortName           : str           = Field(               sa_type=Text()        , nullable=False             ) # AAAA
+
+	id                  : int64 | None  = Field(primary_key=True, sa_column_kwargs={"server_default": node_state_id_seq.next_value()}, nullable=True)
+
+
+# compared to decide whether a snapshot changed the node. not when or by whom it was received
+NODE_STATE_FIELDS = [k for k in NodesClass.model_fields.keys() if k not in ModelBaseClass.model_fields]
+
+
+def node_state_update(session: dbgenerics.GenericSession, rows: list[dict[str, typing.Any]]) -> list[dict[str, typing.Any]]:
+	# upserts node_state and returns the rows which changed it. a snapshot older than the
+	# stored one is ignored, as is another gateway's copy of the same lastHeard
+	latest = {}
+	for row in rows:
+		prev = latest.get(row["num"])
+		if prev is None or (row["lastHeard"] or 0) >= (prev["lastHeard"] or 0):
+			latest[row["num"]] = row
+
+	if not latest:
+		return []
+
+	table = NodeState.__table__
+
+	with columnar_source(session, "_node_state", list(latest.values())) as source:
+		last_heard_new = func.coalesce(source.c.lastHeard, 0)
+		last_heard_old = func.coalesce(table.c.lastHeard , 0)
+
+		changed_qry = select(source.c.num).select_from(
+			source.outerjoin(table, table.c.num == source.c.num)
+		).where( or_(
+			table.c.num == None,
+			and_(
+				last_heard_new >= last_heard_old,
+				or_( last_heard_new > last_heard_old, source.c.gateway_id.is_not_distinct_from(table.c.gateway_id) ),
+				# compared in the stored types, or every float would look changed
+				or_( *[ cast(source.c[k], table.c[k].type).is_distinct_from(table.c[k]) for k in NODE_STATE_FIELDS ] )
+			)
+		) )
+
+		changed = set(session.execute(changed_qry).scalars())
+
+		if changed:
+			columns    = [c.name for c in source.c]
+			upsert_qry = pg_insert(table).from_select(columns, select(*source.c).where(source.c.num.in_(changed)))
+			upsert_qry = upsert_qry.on_conflict_do_update(
+				index_elements = ["num"],
+				set_           = { c: upsert_qry.excluded[c] for c in columns if c != "num" }
+			)
+			session.execute(upsert_qry)
+			count_cache_clear(NodeState.__tablename__, session=session)
+
+	return [row for row in latest.values() if row["num"] in changed]
+
+
+def node_state_rebuild(session: dbgenerics.GenericSession):
+	# the newest snapshot of every node in the change log, e.g. for a database older than node_state
+	columns = [c.name for c in NodeState.__table__.columns if c.name != "id"]
+	source  = tier_source(Nodes)
+	latest  = select(*[getattr(source, c) for c in columns]).order_by(source.num, source.gateway_receive_time.desc(), source.id.desc()).distinct(source.num)
+
+	# committed in between, as duckdb rejects re-inserting a num deleted in the same transaction
+	session.execute(delete(NodeState))
+	session.commit()
+	session.execute(insert(NodeState.__table__).from_select(columns, latest))
+	count_cache_clear(NodeState.__tablename__, session=session)
+
 """
 2406480062              : <class 'dict'>
   hopsAway              : <class 'int'> 0
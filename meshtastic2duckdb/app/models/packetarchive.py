@@ -0,0 +1,34 @@
+from ._base    import *
+from ._message import *
+from fastapi   import params as fastapi_params
+
+class PacketArchiveClass(ModelBaseClass):
+	# every received packet, as received. append only.
+	# lets new model columns be filled from history with logger.reprocess
+	__tablename__       = "packetarchive"
+	__ormclass__        = lambda: PacketArchive
+
+	portnum             : str | None # TELEMETRY_APP. None when the packet could not be decrypted
+	packet              : str        # '{"from":24,"to":42,"decoded":{"portnum":"TELEMETRY_APP","payload":{"$b64":"DQ=="},...},...}'
+
+	_shared_fields: typing.ClassVar[list[tuple[str, tuple[str, ...]|typing.Callable]]] = []
+	_fields       : typing.ClassVar[list[tuple[str, tuple[str, ...]|typing.Callable]]] = [
+		["portnum"     , ("decoded?", "portnum?")                          ],
+		["packet"      , lambda packet: converters.to_compact_json(packet) ],
+	]
+
+	def to_packet(self) -> dict[str, typing.Any]:
+		return converters.from_compact_json(self.packet)
+
+
+
+packetarchive_id_seq = gen_id_seq("packetarchive")
+
+class PacketArchive(ModelBase, SQLModel, table=True):
+	__dataclass__ = lambda: PacketArchiveClass
+	__filter__    = lambda: TimedFilterQuery
+
+	portnum             : str   | None = Field(nullable=True , sa_type=Text(), index=True ) # TELEMETRY_APP
+	packet              : str          = Field(nullable=False, sa_type=Text()             ) # '{"from":24,"to":42,...}'
+
+	id                  : int64 | None = Field(primary_key=True, sa_column_kwargs={"server_default": packetarchive_id_seq.next_value()}, nullable=True)
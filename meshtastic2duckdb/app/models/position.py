@@ -5,6 +5,7 @@ from fastapi   import params as fastapi_params
 class PositionClass(MessageClass):
 	__tablename__       = "position"
 	__ormclass__        = lambda: Position
+	__portnum__         = "POSITION_APP"
 
 	latitudeI           : int32
 	longitudeI          : int32
@@ -37,18 +38,18 @@ class PositionClass(MessageClass):
 		else:
 			return "Poor"
 
-	_fields: typing.ClassVar[list[tuple[str, typing.Callable]]] = [
-		["latitudeI"    , lambda packet: packet["decoded"]["position"]["latitudeI"]    ],
-		["longitudeI"   , lambda packet: packet["decoded"]["position"]["longitudeI"]   ],
-		["altitude"     , lambda packet: packet["decoded"]["position"]["altitude"]     ],
-		["time"         , lambda packet: packet["decoded"]["position"]["time"]         ],
-		["PDOP"         , lambda packet: packet["decoded"]["position"]["PDOP"]         ],
-		["groundSpeed"  , lambda packet: packet["decoded"]["position"]["groundSpeed"]  ],
-		["groundTrack"  , lambda packet: packet["decoded"]["position"]["groundTrack"]  ],
-		["satsInView"   , lambda packet: packet["decoded"]["position"]["satsInView"]   ],
-		["precisionBits", lambda packet: packet["decoded"]["position"]["precisionBits"]],
-		["latitude"     , lambda packet: packet["decoded"]["position"]["latitude"]     ],
-		["longitude"    , lambda packet: packet["decoded"]["position"]["longitude"]    ],
+	_fields: typing.ClassVar[list[tuple[str, tuple[str, ...]|typing.Callable]]] = [
+		["latitudeI"    , ("decoded", "position", "latitudeI")     ],
+		["longitudeI"   , ("decoded", "position", "longitudeI")    ],
+		["altitude"     , ("decoded", "position", "altitude")      ],
+		["time"         , ("decoded", "position", "time")          ],
+		["PDOP"         , ("decoded", "position", "PDOP")          ],
+		["groundSpeed"  , ("decoded", "position", "groundSpeed")   ],
+		["groundTrack"  , ("decoded", "position", "groundTrack")   ],
+		["satsInView"   , ("decoded", "position", "satsInView")    ],
+		["precisionBits", ("decoded", "position", "precisionBits") ],
+		["latitude"     , ("decoded", "position", "latitude")      ],
+		["longitude"    , ("decoded", "position", "longitude")     ],
 	]
 
 	__pretty_names__ = {
@@ -5,13 +5,14 @@ from fastapi   import params as fastapi_params
 class RangeTestClass(MessageClass):
 	__tablename__       = "rangetest"
 	__ormclass__        = lambda: RangeTest
+	__portnum__         = "RANGE_TEST_APP"
 
 	payload             : bytes # b'Hi'
 	text                : str   # 'Hi'
 
-	_fields: typing.ClassVar[list[tuple[str, typing.Callable]]] = [
-		["payload"     , lambda packet: packet["decoded"]["payload"]     ],
-		["text"        , lambda packet: packet["decoded"]["text"]        ],
+	_fields: typing.ClassVar[list[tuple[str, tuple[str, ...]|typing.Callable]]] = [
+		["payload"     , ("decoded", "payload") ],
+		["text"        , ("decoded", "text")    ],
 	]
 
 
@@ -0,0 +1,88 @@
+from ._base    import *
+from ._message import *
+from fastapi   import params as fastapi_params
+
+class RawPacketClass(MessageClass):
+	# any packet without a model of its own. TRACEROUTE_APP, ROUTING_APP, ADMIN_APP, ...
+	# packets that could not be decrypted have no decoded section at all
+	__tablename__       = "rawpacket"
+	__ormclass__        = lambda: RawPacket
+
+	decoded             : str | None # '{"portnum":"ROUTING_APP","bitfield":0,"routing":{"errorReason":"NONE"}}'
+
+	_shared_fields: typing.ClassVar[list[tuple[str, tuple[str, ...]|typing.Callable]]] = [
+		*[ field for field in MessageClass._shared_fields if field[0] not in ("portnum", "bitfield") ],
+		["portnum"     , lambda packet: packet.get("decoded", {}).get("portnum", "ENCRYPTED") ],
+		["bitfield"    , ("decoded?", "bitfield?")                                            ],
+	]
+
+	_fields: typing.ClassVar[list[tuple[str, tuple[str, ...]|typing.Callable]]] = [
+		["decoded"     , lambda packet: converters.to_compact_json(packet["decoded"]) if "decoded" in packet else None ],
+	]
+
+
+
+rawpacket_id_seq = gen_id_seq("rawpacket")
+
+class RawPacket(Message, SQLModel, table=True):
+	__dataclass__ = lambda: RawPacketClass
+	__filter__    = lambda: RawPacketFilterQuery
+
+	decoded             : str   | None = Field(nullable=True , sa_type=Text()) # '{"portnum":"ROUTING_APP", ...}'
+
+	id                  : int64 | None = Field(primary_key=True, sa_column_kwargs={"server_default": rawpacket_id_seq.next_value()}, nullable=True)
+
+class RawPacketFilterQueryParams(MessageFilterQueryParams):
+	portnums      : Annotated[Optional[str  ], Query(default=None ) ]
+
+	@classmethod
+	def endpoints(cls):
+		return {
+			**{
+				"by-portnum"     : ("portnums"      , str  , True  ),
+			},
+			**MessageFilterQueryParams.endpoints()
+		}
+
+	def __call__(self, session: dbgenerics.GenericSession, cls, filter_is_unique: str|None=None):
+		qry = MessageFilterQueryParams.__call__(self, session, cls, filter_is_unique=filter_is_unique)
+
+		for k in self.model_fields.keys():
+			v = getattr(self, k)
+			if isinstance(v, fastapi_params.Depends):
+				setattr(self, k, v.dependency())
+
+		if self.portnums is not None:
+			portnums = self.portnums
+			if isinstance(portnums, str):
+				portnums = portnums.split(',')
+
+			if portnums:
+				qry = qry.where(cls.portnum.in_( portnums ))
+
+		return qry
+
+RawPacketFilterQuery = Annotated[RawPacketFilterQueryParams, Depends(RawPacketFilterQueryParams)]
+
+"""
+Received
+========
+decoded                 : <class 'dict'>
+  bitfield              : <class 'int'> 0
+  payload               : <class 'bytes'> b'\x18\x00'
+  portnum               : <class 'str'> ROUTING_APP
+  requestId             : <class 'int'> 95
+  routing               : <class 'dict'>
+    errorReason         : <class 'str'> NONE
+from                    : <class 'int'> 41
+fromId                  : <class 'str'> !f8
+hopLimit                : <class 'int'> 3
+hopStart                : <class 'int'> 3
+id                      : <class 'int'> 98
+priority                : <class 'str'> ACK
+rxRssi                  : <class 'int'> -15
+rxSnr                   : <class 'float'> 16.5
+rxTime                  : <class 'int'> 48
+to                      : <class 'int'> 24
+toId                    : <class 'str'> !8f
+"""
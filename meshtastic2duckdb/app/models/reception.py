@@ -0,0 +1,63 @@
+from ._base    import *
+from ._message import *
+
+class ReceptionClass(ModelBaseClass):
+	# a repeated reception of a message already stored in its own table, e.g. heard
+	# again through another relay. only the radio side of the packet is kept
+	__tablename__       = "reception"
+	__ormclass__        = lambda: Reception
+
+	from_node           : int64
+	message_id          : int64
+	portnum             : str   | None
+
+	rxTime              : int64 | None
+	rxRssi              : int16 | None
+	rxSnr               : float | None
+
+	hopStart            : int8  | None
+	hopLimit            : int8  | None
+
+	_shared_fields: typing.ClassVar[list[tuple[str, tuple[str, ...]|typing.Callable]]] = []
+	_fields       : typing.ClassVar[list[tuple[str, tuple[str, ...]|typing.Callable]]] = [
+		["from_node"   , ("from",)                ],
+		["message_id"  , ("id",)                  ],
+		["portnum"     , ("decoded?", "portnum?") ],
+
+		["rxTime"      , ("rxTime?",)             ],
+		["rxRssi"      , ("rxRssi?",)             ],
+		["rxSnr"       , ("rxSnr?",)              ],
+
+		["hopStart"    , ("hopStart?",)           ],
+		["hopLimit"    , ("hopLimit?",)           ],
+	]
+
+	__pretty_names__ = {
+		**ModelBaseClass.__pretty_names__,
+		**{ k: v for k, v in MessageClass.__pretty_names__.items() if k in ("from_node", "message_id", "portnum", "rxTime", "rxRssi", "rxSnr", "hopStart", "hopLimit") }
+	}
+
+	@classmethod
+	def from_message(cls, message: MessageClass) -> "ReceptionClass":
+		return cls.model_validate({ k: getattr(message, k) for k in cls.model_fields.keys() })
+
+
+
+reception_id_seq = gen_id_seq("reception")
+
+class Reception(ModelBase, SQLModel, table=True):
+	__dataclass__ = lambda: ReceptionClass
+	__filter__    = lambda: TimedFilterQuery
+
+	from_node           : int64        = Field(nullable=False, sa_type=BigInteger()  , index=True ) # 24
+	message_id          : int64        = Field(nullable=False, sa_type=BigInteger()  , index=True ) # 95
+	portnum             : str   | None = Field(nullable=True , sa_type=Text()                     ) # TEXT_MESSAGE_APP
+
+	rxTime              : int64 | None = Field(nullable=True , sa_type=BigInteger()               ) # 47
+	rxRssi              : int16 | None = Field(nullable=True , sa_type=SmallInteger()             ) # -15
+	rxSnr               : float | None = Field(nullable=True , sa_type=Float()                    ) # 16.75
+
+	hopStart            : int8  | None = Field(nullable=True , sa_type=SmallInteger()             ) # 3
+	hopLimit            : int8  | None = Field(nullable=True , sa_type=SmallInteger()             ) # 2
+
+	id                  : int64 | None = Field(primary_key=True, sa_column_kwargs={"server_default": reception_id_seq.next_value()}, nullable=True)
@@ -1,11 +1,13 @@
 from ._base    import *
 from ._message import *
+from .telemetryrollup import rollup_insert, rollup_series
 from fastapi   import params as fastapi_params
 
 
 class TelemetryClass(MessageClass):
 	__tablename__       = "telemetry"
 	__ormclass__        = lambda: Telemetry
+	__portnum__         = "TELEMETRY_APP"
 
 	time                : int64        # 1700000000
 	batteryLevel        : int8  | None # 76
@@ -20,22 +22,22 @@ class TelemetryClass(MessageClass):
 	lux                 : float | None # 0.0
 	temperature         : float | None # 25.240046
 
-	_fields: typing.ClassVar[list[tuple[str, typing.Callable]]] = [
-		["time"               , lambda packet: packet["decoded"]["telemetry"]["time"]                                                ],
-		["batteryLevel"       , lambda packet: packet["decoded"]["telemetry"].get("deviceMetrics"     ,{}).get("batteryLevel"      , None)],
-		["voltage"            , lambda packet: packet["decoded"]["telemetry"].get("deviceMetrics"     ,{}).get("voltage"           , None)],
-		["channelUtilization" , lambda packet: packet["decoded"]["telemetry"].get("deviceMetrics"     ,{}).get("channelUtilization", None)],
-		["airUtilTx"          , lambda packet: packet["decoded"]["telemetry"].get("deviceMetrics"     ,{}).get("airUtilTx"         , None)],
+	_fields: typing.ClassVar[list[tuple[str, tuple[str, ...]|typing.Callable]]] = [
+		["time"               , ("decoded", "telemetry", "time")                                  ],
+		["batteryLevel"       , ("decoded", "telemetry", "deviceMetrics?", "batteryLevel?")       ],
+		["voltage"            , ("decoded", "telemetry", "deviceMetrics?", "voltage?")            ],
+		["channelUtilization" , ("decoded", "telemetry", "deviceMetrics?", "channelUtilization?") ],
+		["airUtilTx"          , ("decoded", "telemetry", "deviceMetrics?", "airUtilTx?")          ],
 
-		["uptimeSeconds"      , lambda packet: packet["decoded"]["telemetry"].get("deviceMetrics"     ,{}).get("uptimeSeconds"     , None)],
+		["uptimeSeconds"      , ("decoded", "telemetry", "deviceMetrics?", "uptimeSeconds?")      ],
 
-		["numPacketsTx"       , lambda packet: packet["decoded"]["telemetry"].get("deviceMetrics"     ,{}).get("numPacketsTx"      , None)],
-		["numPacketsRx"       , lambda packet: packet["decoded"]["telemetry"].get("deviceMetrics"     ,{}).get("numPacketsRx"      , None)],
-		["numOnlineNodes"     , lambda packet: packet["decoded"]["telemetry"].get("deviceMetrics"     ,{}).get("numOnlineNodes"    , None)],
-		["numTotalNodes"      , lambda packet: packet["decoded"]["telemetry"].get("deviceMetrics"     ,{}).get("numTotalNodes"     , None)],
+		["numPacketsTx"       , ("decoded", "telemetry", "deviceMetrics?", "numPacketsTx?")       ],
+		["numPacketsRx"       , ("decoded", "telemetry", "deviceMetrics?", "numPacketsRx?")       ],
+		["numOnlineNodes"     , ("decoded", "telemetry", "deviceMetrics?", "numOnlineNodes?")     ],
+		["numTotalNodes"      , ("decoded", "telemetry", "deviceMetrics?", "numTotalNodes?")      ],
 
-		["lux"                , lambda packet: packet["decoded"]["telemetry"].get("environmentMetrics",{}).get("lux"               , None)],
-		["temperature"        , lambda packet: packet["decoded"]["telemetry"].get("environmentMetrics",{}).get("temperature"       , None)],
+		["lux"                , ("decoded", "telemetry", "environmentMetrics?", "lux?")           ],
+		["temperature"        , ("decoded", "telemetry", "environmentMetrics?", "temperature?")   ],
 	]
 
 
@@ -44,6 +46,8 @@ telemetry_id_seq = gen_id_seq("telemetry")
 class Telemetry(Message, SQLModel, table=True):
 	__dataclass__ = lambda: TelemetryClass
 	__filter__    = lambda: TelemetryFilterQuery
+	__rollup__    = lambda: rollup_insert
+	__series__    = lambda: rollup_series # charts read the rollups
 
 	time                : int64        = Field(              sa_type=BigInteger()  , nullable=False             ) # 17000000000
 	batteryLevel        : int8  | None = Field(default=None, sa_type=SmallInteger(), nullable=True , index=True ) # 76
@@ -79,8 +83,8 @@ class TelemetryFilterQueryParams(TimedFilterQueryParams):
 			**TimedFilterQueryParams.endpoints()
 		}
 
-	def __call__(self, session: dbgenerics.GenericSession, cls):
-		qry = TimedFilterQueryParams.__call__(self, session, cls)
+	def __call__(self, session: dbgenerics.GenericSession, cls, filter_is_unique: str|None=None):
+		qry = TimedFilterQueryParams.__call__(self, session, cls, filter_is_unique=filter_is_unique)
 
 		for k in self.model_fields.keys():
 			v = getattr(self, k)
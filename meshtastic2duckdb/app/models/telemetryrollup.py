@@ -0,0 +1,382 @@
+from ._base    import *
+from ._cache   import query_cache
+from ._query   import get_now
+from ._bulk    import columnar_source
+from fastapi   import params as fastapi_params
+
+from sqlalchemy import UniqueConstraint, Double, delete, exists, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+# per node min/max/avg/count of the device metrics in 1 minute, 1 hour and 1 day buckets.
+# sums are doubles, so averages over a year of float telemetry do not drift.
+# kept up to date by bulk_insert, so long windows read a few hundred buckets per node
+# instead of every telemetry row. gateway_receive_time is the start of the bucket.
+
+ROLLUP_METRICS     = ("batteryLevel", "voltage", "channelUtilization", "airUtilTx")
+
+# a window is read from the coarsest rollup that still gives this many buckets
+ROLLUP_MIN_BUCKETS = 24
+
+
+class TelemetryRollupClass(ModelBaseClass):
+	__tablename__       = "telemetry_rollup_1m"
+	__ormclass__        = lambda: TelemetryRollup
+
+	from_node               : int64
+	resolution              : int32         # bucket length in seconds
+	count                   : int32         # telemetry rows in the bucket
+
+	batteryLevelMin         : float | None
+	batteryLevelMax         : float | None
+	batteryLevelSum         : float
+	batteryLevelCount       : int32
+
+	voltageMin              : float | None
+	voltageMax              : float | None
+	voltageSum              : float
+	voltageCount            : int32
+
+	channelUtilizationMin   : float | None
+	channelUtilizationMax   : float | None
+	channelUtilizationSum   : float
+	channelUtilizationCount : int32
+
+	airUtilTxMin            : float | None
+	airUtilTxMax            : float | None
+	airUtilTxSum            : float
+	airUtilTxCount          : int32
+
+	@pydantic.computed_field
+	@property
+	def batteryLevelAvg(self) -> float | None:
+		return self.batteryLevelSum / self.batteryLevelCount if self.batteryLevelCount else None
+
+	@pydantic.computed_field
+	@property
+	def voltageAvg(self) -> float | None:
+		return self.voltageSum / self.voltageCount if self.voltageCount else None
+
+	@pydantic.computed_field
+	@property
+	def channelUtilizationAvg(self) -> float | None:
+		return self.channelUtilizationSum / self.channelUtilizationCount if self.channelUtilizationCount else None
+
+	@pydantic.computed_field
+	@property
+	def airUtilTxAvg(self) -> float | None:
+		return self.airUtilTxSum / self.airUtilTxCount if self.airUtilTxCount else None
+
+	__pretty_names__ = {
+		**ModelBaseClass.__pretty_names__,
+		**{
+			"gateway_receive_time"  : (0 , "Bucket"             , converters.epoch_to_str),
+			"from_node"             : (50, "From Node"          , converters.echo),
+			"resolution"            : (50, "Resolution"         , converters.echo),
+			"count"                 : (50, "Count"              , converters.echo),
+			"batteryLevelAvg"       : (60, "Battery Level"      , converters.echo),
+			"voltageAvg"            : (60, "Voltage"            , converters.echo),
+			"channelUtilizationAvg" : (60, "Channel Utilization", converters.echo),
+			"airUtilTxAvg"          : (60, "Air Util Tx"        , converters.echo),
+		}
+	}
+
+
+
+class TelemetryRollupBase(ModelBase):
+	__dataclass__ = lambda: TelemetryRollupClass
+	__filter__    = lambda: TelemetryRollupFilterQuery
+	__derived__   = True # filled by rollup_insert
+
+	from_node               : int64        = Field(             sa_type=BigInteger()  , nullable=False) # 24
+	resolution              : int32        = Field(             sa_type=Integer()     , nullable=False) # 3600
+	count                   : int32        = Field(default=0  , sa_type=Integer()     , nullable=False) # 12
+
+	batteryLevelMin         : float | None = Field(default=None, sa_type=Float()      , nullable=True ) # 75
+	batteryLevelMax         : float | None = Field(default=None, sa_type=Float()      , nullable=True ) # 76
+	batteryLevelSum         : float        = Field(default=0.0 , sa_type=Double()     , nullable=False) # 906
+	batteryLevelCount       : int32        = Field(default=0   , sa_type=Integer()    , nullable=False) # 12
+
+	voltageMin              : float | None = Field(default=None, sa_type=Float()      , nullable=True ) # 3.948
+	voltageMax              : float | None = Field(default=None, sa_type=Float()      , nullable=True ) # 3.956
+	voltageSum              : float        = Field(default=0.0 , sa_type=Double()     , nullable=False) # 47.42
+	voltageCount            : int32        = Field(default=0   , sa_type=Integer()    , nullable=False) # 12
+
+	channelUtilizationMin   : float | None = Field(default=None, sa_type=Float()      , nullable=True ) # 5.8016667
+	channelUtilizationMax   : float | None = Field(default=None, sa_type=Float()      , nullable=True ) # 13.023334
+	channelUtilizationSum   : float        = Field(default=0.0 , sa_type=Double()     , nullable=False) # 112.5
+	channelUtilizationCount : int32        = Field(default=0   , sa_type=Integer()    , nullable=False) # 12
+
+	airUtilTxMin            : float | None = Field(default=None, sa_type=Float()      , nullable=True ) # 4.323389
+	airUtilTxMax            : float | None = Field(default=None, sa_type=Float()      , nullable=True ) # 4.877611
+	airUtilTxSum            : float        = Field(default=0.0 , sa_type=Double()     , nullable=False) # 55.2
+	airUtilTxCount          : int32        = Field(default=0   , sa_type=Integer()    , nullable=False) # 12
+
+	@classmethod
+	def QueryPage( cls, *, session_manager: dbgenerics.GenericSessionManager, query_filter: SharedFilterQuery, filter_is_unique: str|None = None ) -> "tuple[list[ModelBase], str|None]":
+		# reads, and caches under, the rollup the filter picks, not the one the endpoint is registered on
+		return ModelBase.QueryPage.__func__(query_filter.rollup_class(), session_manager=session_manager, query_filter=query_filter, filter_is_unique=filter_is_unique)
+
+	@classmethod
+	def Count( cls, *, session_manager: dbgenerics.GenericSessionManager, query_filter: SharedFilterQuery ) -> tuple[int, int]:
+		# counts the rollup the filter reads from, not the one the endpoint is registered on
+		return ModelBase.Count.__func__(query_filter.rollup_class(), session_manager=session_manager, query_filter=query_filter)
+
+
+telemetry_rollup_1m_id_seq = gen_id_seq("telemetry_rollup_1m")
+telemetry_rollup_1h_id_seq = gen_id_seq("telemetry_rollup_1h")
+telemetry_rollup_1d_id_seq = gen_id_seq("telemetry_rollup_1d")
+
+class TelemetryRollup(TelemetryRollupBase, SQLModel, table=True):
+	__tablename__  = "telemetry_rollup_1m"
+	__table_args__ = (UniqueConstraint("from_node", "gateway_receive_time"),)
+	__resolution__ = 60
+
+	id                      : int64 | None = Field(primary_key=True, sa_column_kwargs={"server_default": telemetry_rollup_1m_id_seq.next_value()}, nullable=True)
+
+class TelemetryRollupHour(TelemetryRollupBase, SQLModel, table=True):
+	__tablename__  = "telemetry_rollup_1h"
+	__table_args__ = (UniqueConstraint("from_node", "gateway_receive_time"),)
+	__resolution__ = 3600
+
+	id                      : int64 | None = Field(primary_key=True, sa_column_kwargs={"server_default": telemetry_rollup_1h_id_seq.next_value()}, nullable=True)
+
+class TelemetryRollupDay(TelemetryRollupBase, SQLModel, table=True):
+	__tablename__  = "telemetry_rollup_1d"
+	__table_args__ = (UniqueConstraint("from_node", "gateway_receive_time"),)
+	__resolution__ = 86400
+
+	id                      : int64 | None = Field(primary_key=True, sa_column_kwargs={"server_default": telemetry_rollup_1d_id_seq.next_value()}, nullable=True)
+
+# finest first
+ROLLUPS = {
+	"1m": TelemetryRollup,
+	"1h": TelemetryRollupHour,
+	"1d": TelemetryRollupDay,
+}
+
+
+def new_bucket(from_node: int, bucket: int, resolution: int) -> dict[str, typing.Any]:
+	res = { "from_node": from_node, "gateway_receive_time": bucket, "gateway_id": None, "resolution": resolution, "count": 0 }
+	for metric in ROLLUP_METRICS:
+		res.update({ f"{metric}Min": None, f"{metric}Max": None, f"{metric}Sum": 0.0, f"{metric}Count": 0 })
+	return res
+
+
+def merge_bucket(into: dict[str, typing.Any], other: dict[str, typing.Any]):
+	into["count"] += other["count"]
+	for metric in ROLLUP_METRICS:
+		if not other[f"{metric}Count"]:
+			continue
+		into[f"{metric}Min"  ]  = other[f"{metric}Min"] if into[f"{metric}Min"] is None else min(into[f"{metric}Min"], other[f"{metric}Min"])
+		into[f"{metric}Max"  ]  = other[f"{metric}Max"] if into[f"{metric}Max"] is None else max(into[f"{metric}Max"], other[f"{metric}Max"])
+		into[f"{metric}Sum"  ] += other[f"{metric}Sum"  ]
+		into[f"{metric}Count"] += other[f"{metric}Count"]
+
+
+def upsert(table, stmt):
+	# merges into the stored bucket of the same (from_node, bucket start)
+	return stmt.on_conflict_do_update(
+		index_elements = ["from_node", "gateway_receive_time"],
+		set_           = {
+			"count": table.c["count"] + stmt.excluded["count"],
+			**{ k: v for metric in ROLLUP_METRICS for k, v in {
+				f"{metric}Min"  : func.least   (table.c[f"{metric}Min"], stmt.excluded[f"{metric}Min"]),
+				f"{metric}Max"  : func.greatest(table.c[f"{metric}Max"], stmt.excluded[f"{metric}Max"]),
+				f"{metric}Sum"  : table.c[f"{metric}Sum"  ] + stmt.excluded[f"{metric}Sum"  ],
+				f"{metric}Count": table.c[f"{metric}Count"] + stmt.excluded[f"{metric}Count"],
+			}.items() }
+		}
+	)
+
+
+def rollup_insert(session: dbgenerics.GenericSession, rows: list[dict[str, typing.Any]]):
+	# folds a batch of telemetry rows into every rollup. the batch is aggregated per
+	# (from_node, bucket) first, then merged into the stored buckets with one upsert per table
+	minute  = ROLLUPS["1m"].__resolution__
+	buckets = {}
+	for row in rows:
+		key    = (row["from_node"], row["gateway_receive_time"] - row["gateway_receive_time"] % minute)
+		bucket = buckets.get(key)
+		if bucket is None:
+			bucket = buckets[key] = new_bucket(*key, minute)
+
+		bucket["count"] += 1
+		for metric in ROLLUP_METRICS:
+			value = row.get(metric)
+			if value is None:
+				continue
+			bucket[f"{metric}Min"  ]  = value if bucket[f"{metric}Min"] is None else min(bucket[f"{metric}Min"], value)
+			bucket[f"{metric}Max"  ]  = value if bucket[f"{metric}Max"] is None else max(bucket[f"{metric}Max"], value)
+			bucket[f"{metric}Sum"  ] += value
+			bucket[f"{metric}Count"] += 1
+
+	for orm_class in ROLLUPS.values():
+		resolution = orm_class.__resolution__
+
+		if resolution != minute:
+			coarse = {}
+			for (from_node, bucket_time), bucket in buckets.items():
+				key = (from_node, bucket_time - bucket_time % resolution)
+				if key not in coarse:
+					coarse[key] = new_bucket(*key, resolution)
+				merge_bucket(coarse[key], bucket)
+			buckets = coarse
+
+		if not buckets:
+			return
+
+		table   = orm_class.__table__
+		columns = list(next(iter(buckets.values())).keys())
+
+		with columnar_source(session, f"_rollup_{table.name}", list(buckets.values())) as source:
+			session.execute(upsert(table, pg_insert(table).from_select(columns, select(*source.c))))
+
+		# upserts change the row count by an unknown amount
+		count_cache_clear(orm_class.__tablename__, session=session)
+
+
+def rollup_rebuild(session: dbgenerics.GenericSession, source, since: int | None = None, until: int | None = None):
+	# recomputes every bucket overlapping [since, until] from the telemetry table itself,
+	# e.g. for telemetry stored before the rollups existed, or rewritten by reprocess
+	for orm_class in ROLLUPS.values():
+		resolution = orm_class.__resolution__
+		bucket     = source.gateway_receive_time - source.gateway_receive_time % resolution
+		table      = orm_class.__table__
+
+		delete_qry = delete(table)
+		select_qry = select(
+			source.from_node,
+			bucket.label("gateway_receive_time"),
+			literal(resolution).label("resolution"),
+			func.count().label("count"),
+			*[ col for metric in ROLLUP_METRICS for col in (
+				func.min(getattr(source, metric)).label(f"{metric}Min"),
+				func.max(getattr(source, metric)).label(f"{metric}Max"),
+				func.coalesce(func.sum(getattr(source, metric)), 0.0).label(f"{metric}Sum"),
+				func.count(getattr(source, metric)).label(f"{metric}Count"),
+			)]
+		).group_by(source.from_node, bucket)
+
+		if since is not None:
+			since_bucket = since - since % resolution
+			delete_qry   = delete_qry.where(table.c.gateway_receive_time >= since_bucket)
+			select_qry   = select_qry.where(source.gateway_receive_time >= since_bucket)
+
+		if until is not None:
+			until_bucket = until - until % resolution + resolution
+			delete_qry   = delete_qry.where(table.c.gateway_receive_time <  until_bucket)
+			select_qry   = select_qry.where(source.gateway_receive_time <  until_bucket)
+
+		# duckdb rejects re-inserting a key deleted in the same transaction. only buckets
+		# left without telemetry are deleted, the others are overwritten in place
+		columns    = [c.name for c in select_qry.selected_columns]
+		delete_qry = delete_qry.where( ~exists().where(
+			source.from_node            == table.c.from_node,
+			source.gateway_receive_time >= table.c.gateway_receive_time,
+			source.gateway_receive_time <  table.c.gateway_receive_time + resolution,
+		) )
+		insert_qry = pg_insert(table).from_select(columns, select_qry)
+		insert_qry = insert_qry.on_conflict_do_update(
+			index_elements = ["from_node", "gateway_receive_time"],
+			set_           = { c: insert_qry.excluded[c] for c in columns if c not in ("from_node", "gateway_receive_time") }
+		)
+
+		session.execute(delete_qry)
+		session.execute(insert_qry)
+		count_cache_clear(orm_class.__tablename__, session=session)
+
+
+
+class TelemetryRollupFilterQueryParams(TimedFilterQueryParams):
+	from_nodes : Annotated[Optional[str], Query(default=None ) ]
+	# auto reads the coarsest rollup which still splits the window in ROLLUP_MIN_BUCKETS buckets
+	resolution : Annotated[Optional[Literal["auto", "1m", "1h", "1d"]], Query(default="auto") ]
+
+	@classmethod
+	def endpoints(cls):
+		return {
+			**{
+				"from_nodes" : ("from_nodes" , int, True ),
+				"resolution" : ("resolution" , str, False),
+			},
+			**TimedFilterQueryParams.endpoints()
+		}
+
+	def rollup_class(self) -> type[TelemetryRollupBase]:
+		for k in self.model_fields.keys():
+			v = getattr(self, k)
+			if isinstance(v, fastapi_params.Depends):
+				setattr(self, k, v.dependency())
+
+		for a in ["since", "until", "time_from", "time_length", "resolution"]:
+			setattr(self, a, None if getattr(self, a) in ("",None) else getattr(self, a))
+
+		if self.resolution is not None and self.resolution != "auto":
+			return ROLLUPS[self.resolution]
+
+		time_start, time_end = self.time_window()
+		if time_start is None:
+			return ROLLUPS["1d"]
+
+		# the default time_length runs decades into the future
+		time_end = get_now() if time_end is None else min(time_end, get_now())
+
+		for orm_class in reversed(ROLLUPS.values()):
+			if (time_end - time_start) // orm_class.__resolution__ >= ROLLUP_MIN_BUCKETS:
+				return orm_class
+
+		return ROLLUPS["1m"]
+
+	def __call__(self, session: dbgenerics.GenericSession, cls, filter_is_unique: str|None=None):
+		# every rollup endpoint is registered on the 1 minute table. sampled counts pass an alias
+		if cls in ROLLUPS.values():
+			cls = self.rollup_class()
+
+		qry = TimedFilterQueryParams.__call__(self, session, cls, filter_is_unique=filter_is_unique)
+
+		for a in ["from_nodes"]:
+			setattr(self, a, None if getattr(self, a) in ("",None) else getattr(self, a))
+
+		if self.from_nodes is not None:
+			from_nodes = self.from_nodes.split(',')
+			if from_nodes:
+				qry = qry.where(cls.from_node.in_( from_nodes ))
+
+		return qry
+
+TelemetryRollupFilterQuery = Annotated[TelemetryRollupFilterQueryParams, Depends(TelemetryRollupFilterQueryParams)]
+
+
+
+def rollup_series(session_manager: dbgenerics.GenericSessionManager, query_filter: TimedFilterQueryParams, x_name: str, y_names: list[str], label_name: str) -> list | None:
+	# charts of the rolled up metrics over a telemetry filter's time window. read from the coarsest
+	# rollup which fits the window, its averages per node and bucket, labelled as the telemetry rows are.
+	# None when the chart, or the filter, needs the telemetry rows themselves
+	if not y_names or any(name not in ROLLUP_METRICS for name in y_names):
+		return None
+
+	for name in query_filter.model_fields.keys() - TimedFilterQueryParams.model_fields.keys():
+		if getattr(query_filter, name) not in ("", None):
+			return None
+
+	r_filter = TelemetryRollupFilterQueryParams(
+		**{ k: getattr(query_filter, k) for k in ["since", "until", "time_from", "time_length"] },
+		offset = 0, limit = None, order = None, cursor = None, exact = False, format = None, from_nodes = None, resolution = "auto"
+	)
+	orm_class = r_filter.rollup_class()
+
+	def series():
+		with session_manager as session:
+			where = r_filter(session, orm_class).whereclause
+			qry   = select(
+				func.printf("!%08x", orm_class.from_node).label(label_name),
+				orm_class.gateway_receive_time.label(x_name),
+				*[ (getattr(orm_class, f"{name}Sum") / func.nullif(getattr(orm_class, f"{name}Count"), 0)).label(name) for name in y_names ]
+			).order_by( orm_class.gateway_receive_time )
+
+			if where is not None:
+				qry = qry.where(where)
+
+			return session.execute(qry).all()
+
+	return query_cache.cached(orm_class.__tablename__, query_cache.key("series", r_filter, label_name, x_name, *y_names), series)
@@ -5,6 +5,7 @@ from fastapi   import params as fastapi_params
 class TextMessageClass(MessageClass):
 	__tablename__       = "textmessage"
 	__ormclass__        = lambda: TextMessage
+	__portnum__         = "TEXT_MESSAGE_APP"
 
 	payload             : bytes       # b'Hi'
 	text                : str         # 'Hi'
@@ -13,14 +14,14 @@ class TextMessageClass(MessageClass):
 	publicKey           : str  | None # 'zd9' - Direct Message
 	pkiEncrypted        : bool | None # True  - Direct Message
 
-	_fields: typing.ClassVar[list[tuple[str, typing.Callable]]] = [
-		["payload"     , lambda packet: packet["decoded"]["payload"]     ],
-		["text"        , lambda packet: packet["decoded"]["text"]        ],
+	_fields: typing.ClassVar[list[tuple[str, tuple[str, ...]|typing.Callable]]] = [
+		["payload"     , ("decoded", "payload") ],
+		["text"        , ("decoded", "text")    ],
 
-		["channel"     , lambda packet: packet.get("channel"     , None) ],
-		["pkiEncrypted", lambda packet: packet.get("pkiEncrypted", None) ],
-		["publicKey"   , lambda packet: packet.get("publicKey"   , None) ],
-		["wantAck"     , lambda packet: packet.get("wantAck"     , None) ],
+		["channel"     , ("channel?",)          ],
+		["pkiEncrypted", ("pkiEncrypted?",)     ],
+		["publicKey"   , ("publicKey?",)        ],
+		["wantAck"     , ("wantAck?",)          ],
 	]
 
 
@@ -54,8 +55,8 @@ class TextMessageFilterQueryParams(TimedFilterQueryParams):
 			**TimedFilterQueryParams.endpoints()
 		}
 
-	def __call__(self, session: dbgenerics.GenericSession, cls):
-		qry = TimedFilterQueryParams.__call__(self, session, cls)
+	def __call__(self, session: dbgenerics.GenericSession, cls, filter_is_unique: str|None=None):
+		qry = TimedFilterQueryParams.__call__(self, session, cls, filter_is_unique=filter_is_unique)
 
 		for k in self.model_fields.keys():
 			v = getattr(self, k)
@@ -0,0 +1,99 @@
+import sys
+import time
+import typing
+import threading
+
+from .dbgenerics import DbEngine
+
+# maintenance jobs of the server, e.g. moving old rows to the cold tier.
+# all of them run one after the other on a single background thread, so they never
+# compete with each other for the database, and never run on the event loop
+
+
+class Job:
+	def __init__(self, name: str, every: float, func: typing.Callable[[], typing.Any]):
+		self.name       = name
+		self.every      = every
+		self.func       = func
+		self.next_run   = time.monotonic() + every
+		self.num_runs   = 0
+		self.num_errors = 0
+		self.last_ms    = 0
+
+	def run(self):
+		start = time.monotonic()
+
+		try:
+			self.func()
+		except Exception as e:
+			self.num_errors += 1
+			print(f"error running job {self.name}: {e}", file=sys.stderr)
+
+		self.num_runs  += 1
+		self.last_ms    = int((time.monotonic() - start) * 1000)
+		self.next_run   = time.monotonic() + self.every
+
+
+class Scheduler:
+	def __init__(self):
+		self.jobs   = []
+		self.stop   = threading.Event()
+		self.thread = None
+
+	def add(self, name: str, every: float, func: typing.Callable[[], typing.Any], run_now: bool = False) -> Job:
+		job = Job(name, every, func)
+		if run_now:
+			job.next_run = time.monotonic()
+		self.jobs.append(job)
+		return job
+
+	def start(self):
+		if self.thread is not None or not self.jobs:
+			return
+
+		self.stop.clear()
+		self.thread = threading.Thread(target=self._loop, name="Scheduler", daemon=True)
+		self.thread.start()
+
+	def close(self):
+		if self.thread is None:
+			return
+
+		self.stop.set()
+		self.thread.join()
+		self.thread = None
+
+	def _loop(self):
+		while not self.stop.is_set():
+			job       = min(self.jobs, key=lambda job: job.next_run)
+			remaining = job.next_run - time.monotonic()
+
+			if remaining > 0:
+				self.stop.wait(remaining)
+				continue
+
+			job.run()
+
+	@property
+	def stats(self) -> dict[str, int]:
+		return {
+			f"{job.name}_{k}": v
+			for job in self.jobs
+			for k, v in (("runs", job.num_runs), ("errors", job.num_errors), ("last_ms", job.last_ms))
+		}
+
+
+def schedulerFromEngine(*, db_engine: DbEngine) -> Scheduler:
+	scheduler = Scheduler()
+
+	# only local, writable engines own their database files
+	if getattr(db_engine, "read_only", True):
+		return scheduler
+
+	if db_engine.tier_after_days > 0:
+		scheduler.add("tier", db_engine.tier_every, db_engine.tier, run_now=True)
+
+	if db_engine.retention:
+		scheduler.add("retention", db_engine.retention_every, db_engine.retain, run_now=True)
+
+	return scheduler
@@ -0,0 +1,55 @@
+import os
+import sys
+import json
+import time
+import typing
+import threading
+
+
+class Spool:
+	# on-disk queue of batches that could not be delivered.
+	# one file per batch, replayed oldest first.
+	def __init__(self, directory: str):
+		self.directory = directory
+		self.lock      = threading.Lock()
+
+		os.makedirs(self.directory, exist_ok=True)
+
+	def files(self) -> list[str]:
+		return sorted(f for f in os.listdir(self.directory) if f.endswith(".json"))
+
+	def __len__(self) -> int:
+		return len(self.files())
+
+	def append(self, table_name: str, records: list[dict[str, typing.Any]]):
+		with self.lock:
+			name     = f"{time.time_ns():020d}_{table_name}.json"
+			tmp_path = os.path.join(self.directory, f".{name}.tmp")
+
+			with open(tmp_path, "w") as fhd:
+				json.dump({"table": table_name, "records": records}, fhd)
+
+			os.replace(tmp_path, os.path.join(self.directory, name))
+
+	def replay(self, send: typing.Callable[[str, list[dict[str, typing.Any]]], bool]) -> int:
+		num_records = 0
+
+		with self.lock:
+			for name in self.files():
+				path = os.path.join(self.directory, name)
+
+				try:
+					with open(path, "r") as fhd:
+						batch = json.load(fhd)
+				except ValueError as e:
+					print(f"discarding corrupted spool file {path}: {e}", file=sys.stderr)
+					os.remove(path)
+					continue
+
+				if not send(batch["table"], batch["records"]):
+					break
+
+				os.remove(path)
+				num_records += len(batch["records"])
+
+		return num_records
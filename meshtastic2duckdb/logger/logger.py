@@ -1,5 +1,8 @@
 import os
+import sys
+import glob
 import time
+import signal
 import serial
 
 import meshtastic
@@ -8,6 +11,7 @@ import meshtastic.serial_interface
 from pubsub import pub
 
 from app import db
+from app import dedup
 from app.config import Config, ConfigLocal, ConfigRemoteHttp
 
 # https://python.meshtastic.org/#example-usage
@@ -78,6 +82,28 @@ def print_interface(interface):
 	print("=" * 50)
 	print("=" * 50)
 
+def resolve_devices(devices: list[str]) -> list[str | None]:
+	# device paths or globs, e.g. /dev/serial/by-id/usb-Seeed*,/dev/ttyACM0
+	# no devices at all lets meshtastic auto-detect a single radio
+	if not devices:
+		return [None]
+
+	paths = []
+	for device in devices:
+		matches = sorted(glob.glob(device)) if glob.has_magic(device) else [device]
+		if not matches:
+			print(f"no device matches {device}", file=sys.stderr)
+		paths.extend(path for path in matches if path not in paths)
+
+	return paths
+
+def get_gateway_id(interface) -> str | None:
+	# the node id of the radio itself, in the same format as fromId. !8fffffff
+	my_info = interface.myInfo
+	if my_info is None:
+		return None
+	return f"!{my_info.my_node_num:08x}"
+
 class Subscribers:
 	def __init__(
 			self,
@@ -102,12 +128,8 @@ class Subscribers:
 		if self.trace:
 			print_packet(packet)
 
-		message = self.db_manager.decode_packet(packet)
-
-		if message:
-			if self.debug:
-				print(message)
-			self.db_manager.add_instances([message])
+		# decoding and storage happen on the DbManager workers
+		self.db_manager.submit_packet(packet, gateway_id=get_gateway_id(interface))
 
 	def on_connection(self, interface, topic=pub.AUTO_TOPIC): # called when we (re)connect to the radio
 		# defaults to broadcast, specify a destination ID if you wish
@@ -115,7 +137,11 @@ class Subscribers:
 		pass
 
 	def on_nodes(self, nodes):
-		self.db_manager.add_instances(nodes)
+		self.db_manager.buffer_instances(nodes)
+
+def raise_keyboard_interrupt(signum, frame):
+	# docker stop sends SIGTERM. handled as ctrl+c, so the buffered rows are flushed before exiting
+	raise KeyboardInterrupt
 
 def run_local(*, config: Config, config_local: ConfigLocal):
 	db_engine   = db.dbEngineLocalFromConfig(config=config, config_local=config_local)
@@ -128,47 +154,66 @@ def run_remote_http(*, config: Config, config_remote_http: ConfigRemoteHttp):
 	run(config=config, db_engine=db_engine)
 
 def run(*, config: Config, db_engine: db.DbEngine):
-	db_manager  = db.DbManager(db_engine)
+	db_manager  = db.DbManager(db_engine, flush_rows=config.flush_rows, flush_ms=config.flush_ms, buffer_max=config.buffer_max, queue_size=config.queue_size, num_workers=config.num_workers, trusted=config.trusted, archive=config.archive, dedup=dedup.dedupCacheFromConfig(config=config), node_fingerprints=dedup.nodeFingerprintsFromConfig(config=config), debug=config.debug)
 
 	subscribers = Subscribers(db_manager, debug=config.debug, trace=config.trace)
 
 	# By default will try to find a meshtastic device, otherwise provide a device path like /dev/ttyUSB0
+	# every radio has its own reader thread. all of them feed the same DbManager
 
 	# https://python.meshtastic.org/serial_interface.html
-	interface   = meshtastic.serial_interface.SerialInterface()
-	#print_interface(interface)
+	interfaces  = []
+	for device in resolve_devices(config.devices):
+		try:
+			interface = meshtastic.serial_interface.SerialInterface(devPath=device)
+		except Exception as e:
+			print(f"error opening device {device}: {e}", file=sys.stderr)
+			continue
+
+		print(f"listening on {device or 'auto detected device'} as gateway {get_gateway_id(interface)}")
+		interfaces.append(interface)
+		#print_interface(interface)
+
+	if not interfaces:
+		db_manager.close()
+		raise RuntimeError(f"no meshtastic device could be opened: {config.devices}")
+
+	signal.signal(signal.SIGTERM, raise_keyboard_interrupt)
 
 	loop_num = 0
 	try:
 		while True:
 			if loop_num % config.print_stats_every == 0: # min 600 seconds = 10 minutes
-				nodes    = db_manager.decode_nodes( interface.nodesByNum )
-				if len(nodes) > 0:
-					if config.debug:
-						for node in nodes:
+				for interface in interfaces:
+					nodes    = db_manager.decode_nodes( interface.nodesByNum, gateway_id=get_gateway_id(interface) )
+					if len(nodes) > 0:
+						if config.debug:
+							for node in nodes:
+								print("+++++++++++")
+								print(node)
 							print("+++++++++++")
-							print(node)
-						print("+++++++++++")
 
-					subscribers.on_nodes(nodes)
+						subscribers.on_nodes(nodes)
 
-					#print(f"{'loops':15s}: {loop_num:12,d}")
-					#for k, v in db_manager.stats.items():
-					#	print(f"{k:15s}: {v:12,d}")
-					print( "".join(f"{k[1]}: {v:12,d} | " for k, v in sorted({**db_manager.stats, **{(0,'loops'):loop_num}}.items())) )
+				#print(f"{'loops':15s}: {loop_num:12,d}")
+				#for k, v in db_manager.stats.items():
+				#	print(f"{k:15s}: {v:12,d}")
+				print( "".join(f"{k[1]}: {v:12,d} | " for k, v in sorted({**db_manager.stats, **{(0,'loops'):loop_num, (0,'interfaces'):len(interfaces)}}.items())) )
 
 			loop_num += 1
 			time.sleep(1)
 	except KeyboardInterrupt:
-		interface.close()
-	except Exception as e:
-		raise e
+		pass
+	finally:
+		for interface in interfaces:
+			interface.close()
+		db_manager.close()
 
 def main():
 	config                     = Config.load_env()
 
 	if   config.mode == "local":
-		local_config       = ConfigLocal.load_env()
+		config_local       = ConfigLocal.load_env()
 		run_local(config=config, config_local=config_local)
 
 	elif config.mode == "http":
@@ -0,0 +1,244 @@
+import json
+import time
+import typing
+import random
+import argparse
+import threading
+import collections
+
+from app import db
+from app import dedup
+from app.config          import Config, ConfigLocal, ConfigRemoteHttp
+from app.dbgenerics      import DbEngine
+from app.models          import _converters as converters
+
+# feeds recorded or synthetic packets through the same DbManager the logger uses,
+# without a radio, and reports throughput and latency. mode, workers, flush and
+# dedup settings come from the usual MESH_LOGGER_* variables.
+#
+#   cd meshtastic2duckdb/app && MESH_LOGGER_DB_FILENAME=replay.duckdb PYTHONPATH=.. python3 -m logger.replay --mode local --synthetic 100000 --nodes 200
+#   cd meshtastic2duckdb/app && PYTHONPATH=.. python3 -m logger.replay --mode http --file capture.jsonl --rate 50
+#
+# a capture has one packet per line, as received (bytes as {"$b64": ...}).
+# packetarchive rows, e.g. /api/messages/packetarchive/list?format=ndjson, are accepted as well.
+
+SYNTHETIC_MIX = {
+	"TELEMETRY_APP"   : 4,
+	"POSITION_APP"    : 3,
+	"NODEINFO_APP"    : 2,
+	"TEXT_MESSAGE_APP": 1,
+}
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+	parser = argparse.ArgumentParser(prog="logger.replay", description="Replay or generate packets through the ingestion pipeline")
+	source = parser.add_mutually_exclusive_group(required=True)
+	source.add_argument("--file"     , type=str, default=None, help="jsonl capture to replay")
+	source.add_argument("--synthetic", type=int, default=None, help="number of synthetic packets to generate")
+	parser.add_argument("--nodes"    , type=int, default=100 , help="synthetic sender nodes")
+	parser.add_argument("--rate"     , type=float, default=0 , help="packets per second. 0 sends as fast as the pipeline takes them")
+	parser.add_argument("--mode"     , type=str, default=None, choices=("local", "http"), help="default MESH_LOGGER_MODE")
+	parser.add_argument("--seed"     , type=int, default=0   , help="synthetic packets random seed")
+
+	return parser.parse_args(argv)
+
+
+def read_capture(filename: str) -> typing.Generator[dict[str, typing.Any], None, None]:
+	with open(filename, "r") as fhd:
+		for line in fhd:
+			if not line.strip():
+				continue
+
+			packet = json.loads(line, object_hook=converters.json_object_hook)
+
+			if isinstance(packet.get("packet"), str):
+				packet = converters.from_compact_json(packet["packet"])
+
+			yield packet
+
+
+def synthetic_packets(count: int, nodes: int, seed: int = 0, mix: dict[str, int] | None = None) -> typing.Generator[dict[str, typing.Any], None, None]:
+	mix        = SYNTHETIC_MIX if mix is None else mix
+	rnd        = random.Random(seed)
+	portnums   = list(mix.keys())
+	weights    = list(mix.values())
+	first_id   = rnd.randrange(1 << 30)
+
+	for num in range(count):
+		node      = 0x10000000 + rnd.randrange(nodes)
+		portnum   = rnd.choices(portnums, weights)[0]
+		now       = int(time.time())
+		packet    = {
+			"from"    : node,
+			"to"      : 0xffffffff,
+			"fromId"  : f"!{node:08x}",
+			"toId"    : "^all",
+			"id"      : first_id + num,
+			"rxTime"  : now,
+			"rxRssi"  : rnd.randint(-120, -10),
+			"rxSnr"   : round(rnd.uniform(-20.0, 15.0), 2),
+			"hopStart": 3,
+			"hopLimit": rnd.randint(0, 3),
+			"priority": "BACKGROUND",
+			"decoded" : { "portnum": portnum, "bitfield": 0 },
+		}
+
+		if portnum == "TELEMETRY_APP":
+			packet["decoded"]["telemetry"] = { "time": now, "deviceMetrics": {
+				"batteryLevel"      : rnd.randint(0, 101),
+				"voltage"           : round(rnd.uniform(3.3, 4.2), 3),
+				"channelUtilization": round(rnd.uniform(0, 30), 2),
+				"airUtilTx"         : round(rnd.uniform(0, 10), 2),
+				"uptimeSeconds"     : rnd.randrange(1_000_000),
+			}}
+
+		elif portnum == "POSITION_APP":
+			latitude  = rnd.uniform(51.0, 53.0)
+			longitude = rnd.uniform(3.5, 6.5)
+			packet["decoded"]["position"] = {
+				"latitudeI"    : int(latitude  * 1e7),
+				"longitudeI"   : int(longitude * 1e7),
+				"latitude"     : latitude,
+				"longitude"    : longitude,
+				"altitude"     : rnd.randint(-10, 300),
+				"time"         : now,
+				"PDOP"         : rnd.randint(100, 1000),
+				"groundSpeed"  : rnd.randint(0, 30),
+				"groundTrack"  : rnd.randrange(360_00000),
+				"satsInView"   : rnd.randint(3, 14),
+				"precisionBits": 32,
+			}
+
+		elif portnum == "NODEINFO_APP":
+			packet["decoded"]["user"] = {
+				"id"        : f"!{node:08x}",
+				"longName"  : f"Node {node:08x}",
+				"shortName" : f"{node & 0xffff:04x}",
+				"macaddr"   : f"{node:012x}",
+				"hwModel"   : "TRACKER_T1000_E",
+				"role"      : "CLIENT",
+				"publicKey" : f"{node:032x}",
+			}
+
+		else:
+			text = f"message {num}"
+			packet["decoded"]["payload"] = text.encode()
+			packet["decoded"]["text"   ] = text
+
+		yield packet
+
+
+def percentile(values: list[float], pct: float) -> float:
+	# nearest rank on an already sorted list
+	if not values:
+		return 0.0
+	return values[min(len(values) - 1, int(len(values) * pct / 100.0))]
+
+
+class TimedEngine(DbEngine):
+	# wraps the real engine. times every flush, and every message from
+	# the moment it was submitted until the flush that stored it returned
+	def __init__(self, db_engine: DbEngine):
+		self.db_engine   = db_engine
+		self.lock        = threading.Lock()
+		self.submitted   = {}
+		self.latencies   = []
+		self.flush_times = []
+		self.num_rows    = 0
+
+	def submit(self, packet):
+		with self.lock:
+			self.submitted.setdefault((packet.get("from"), packet.get("id")), collections.deque()).append(time.perf_counter())
+
+	def get_session_manager(self, read_only: bool = False):
+		return self.db_engine.get_session_manager(read_only=read_only)
+
+	@property
+	def stats(self) -> dict[str, int]:
+		return self.db_engine.stats
+
+	def add_instances(self, instances) -> dict[str, int]:
+		start = time.perf_counter()
+		res   = self.db_engine.add_instances(instances)
+		end   = time.perf_counter()
+
+		with self.lock:
+			self.flush_times.append(end - start)
+			self.num_rows += len(instances)
+
+			for instance in instances:
+				times = self.submitted.get((getattr(instance, "from_node", None), getattr(instance, "message_id", None)))
+				if times:
+					self.latencies.append(end - times.popleft())
+
+		return res
+
+
+def replay(*, db_engine: DbEngine, config: Config, packets, rate: float = 0) -> dict[str, typing.Any]:
+	timed      = TimedEngine(db_engine)
+	db_manager = db.DbManager(timed, flush_rows=config.flush_rows, flush_ms=config.flush_ms, buffer_max=config.buffer_max, queue_size=config.queue_size, num_workers=config.num_workers, trusted=config.trusted, archive=config.archive, dedup=dedup.dedupCacheFromConfig(config=config), debug=config.debug)
+	num        = 0
+	start      = time.perf_counter()
+
+	try:
+		for packet in packets:
+			if rate > 0:
+				ahead = start + num / rate - time.perf_counter()
+				if ahead > 0:
+					time.sleep(ahead)
+
+			# unpaced replays wait for the workers instead of dropping packets
+			timed.submit(packet)
+			db_manager.submit_packet(packet, block=rate <= 0)
+			num += 1
+
+			if num % 10_000 == 0:
+				print(f"{num:12,d} packets | {num / (time.perf_counter() - start):10,.0f} packets/s")
+	finally:
+		db_manager.close()
+
+	elapsed     = time.perf_counter() - start
+	latencies   = sorted(timed.latencies)
+	flush_times = sorted(timed.flush_times)
+
+	return {
+		"packets"       : num,
+		"rows"          : timed.num_rows,
+		"elapsed_s"     : elapsed,
+		"packets_s"     : num / elapsed if elapsed else 0.0,
+		"rows_s"        : timed.num_rows / elapsed if elapsed else 0.0,
+		"latency_p50_ms": percentile(latencies, 50) * 1000,
+		"latency_p90_ms": percentile(latencies, 90) * 1000,
+		"latency_p99_ms": percentile(latencies, 99) * 1000,
+		"latency_max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+		"flushes"       : len(flush_times),
+		"flush_p50_ms"  : percentile(flush_times, 50) * 1000,
+		"flush_p99_ms"  : percentile(flush_times, 99) * 1000,
+		"manager"       : { k[1]: v for k, v in sorted(db_manager.stats.items()) },
+	}
+
+
+def main(argv: list[str] | None = None):
+	args   = parse_args(argv)
+	config = Config.load_env()
+	mode   = args.mode or config.mode
+
+	if mode == "local":
+		db_engine = db.dbEngineLocalFromConfig(config=config, config_local=ConfigLocal.load_env())
+	else:
+		db_engine = db.dbEngineRemoteHttpFromConfig(config=config, config_remote_http=ConfigRemoteHttp.load_env())
+
+	if args.file is not None:
+		packets = read_capture(args.file)
+	else:
+		packets = synthetic_packets(args.synthetic, args.nodes, seed=args.seed)
+
+	stats  = replay(db_engine=db_engine, config=config, packets=packets, rate=args.rate)
+
+	print( "".join(f"{k}: {v:12,d} | " for k, v in stats.pop("manager").items()) )
+	for k, v in stats.items():
+		print(f"{k:15s}: {v:12,.2f}" if isinstance(v, float) else f"{k:15s}: {v:12,d}")
+
+
+if __name__ == "__main__":
+	main()
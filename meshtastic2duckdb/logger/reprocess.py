@@ -0,0 +1,187 @@
+import sys
+import math
+import time
+import argparse
+
+from sqlalchemy import delete, func, or_
+from sqlmodel   import select
+
+from app import db
+from app import dedup
+from app import models
+from app.config import Config, ConfigLocal
+
+# re-runs decode_packet over the packet archive, e.g. after a model gained a column.
+# works on the local database only. stop the server (or the local logger) first.
+# every gateway's copy of a packet is archived. as when logging, only the first copy of a message
+# is stored whole and the others become receptions, which are rebuilt along with their tables.
+# either way it is safe to run twice: by default the window is deleted and rebuilt, with --no-replace
+# only the messages not stored yet are added.
+#
+#   cd meshtastic2duckdb/app && PYTHONPATH=.. python3 -m logger.reprocess --tables telemetry
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+	tables = sorted(cls.__tablename__ for cls in list(models.PORTNUMS.values()) + [models.RawPacketClass])
+
+	parser = argparse.ArgumentParser(prog="logger.reprocess", description="Re-decode the packet archive into the model tables")
+	parser.add_argument("--since"     , type=int, default=None  , help="first gateway_receive_time (epoch) to reprocess")
+	parser.add_argument("--until"     , type=int, default=None  , help="last gateway_receive_time (epoch) to reprocess")
+	parser.add_argument("--tables"    , type=str, default=None  , help=f"comma separated tables to rebuild. default all: {','.join(tables)}")
+	parser.add_argument("--replace"   , action=argparse.BooleanOptionalAction, default=True, help="delete the rebuilt tables' rows in the time window before inserting. with --no-replace, only add the messages not stored yet")
+	parser.add_argument("--batch-size", type=int, default=10_000, help="archived packets per batch")
+	parser.add_argument("--dry-run"   , action="store_true"     , help="decode and count, but do not write")
+	parser.add_argument("--dedup-size", type=int, default=100_000, help="messages remembered to fold later copies into receptions")
+
+	args        = parser.parse_args(argv)
+	args.tables = tables if args.tables is None else args.tables.split(",")
+
+	for table in args.tables:
+		if table not in tables:
+			parser.error(f"unknown table {table}. valid: {','.join(tables)}")
+
+	return args
+
+
+def in_window(sel, cls, since: int | None, until: int | None):
+	if since is not None:
+		sel = sel.where(cls.gateway_receive_time >= since)
+	if until is not None:
+		sel = sel.where(cls.gateway_receive_time <= until)
+	return sel
+
+
+def receptions_of(tables: list[str]):
+	# the receptions of the messages of the rebuilt tables. raw packets are every other portnum
+	clauses = [ models.Reception.portnum.in_([portnum for portnum, cls in models.PORTNUMS.items() if cls.__tablename__ in tables]) ]
+
+	if models.RawPacketClass.__tablename__ in tables:
+		clauses += [ models.Reception.portnum.is_(None), models.Reception.portnum.not_in(list(models.PORTNUMS)) ]
+
+	return or_(*clauses)
+
+
+def stored_keys(session, orm_classes: dict, instances: list) -> set:
+	# (from_node, message_id) of the instances already stored in their tables
+	message_ids = {}
+	for instance in instances:
+		key = dedup.message_key(instance)
+		if key is not None:
+			message_ids.setdefault(instance.__tablename__, set()).add(key[1])
+
+	res = set()
+	for table, ids in message_ids.items():
+		cls  = orm_classes[table]
+		res |= { tuple(row) for row in session.execute( select(cls.from_node, cls.message_id).where(cls.message_id.in_(list(ids))) ) }
+
+	return res
+
+
+def reprocess(*, db_engine: db.DbEngineLocal, tables: list[str], since: int | None = None, until: int | None = None, replace: bool = True, batch_size: int = 10_000, dry_run: bool = False, dedup_size: int = 100_000) -> dict[str, int]:
+	orm_classes = { cls.__tablename__: cls.__ormclass__() for cls in list(models.PORTNUMS.values()) + [models.RawPacketClass] }
+	stats       = { "archived": 0, "errors": 0, "skipped": 0 }
+	last_id     = -1
+	start       = time.time()
+	# the archive is read in order. a copy comes shortly after the first one, not ttl seconds of this run
+	seen        = dedup.DedupCache(size=dedup_size, ttl=math.inf)
+
+	with db_engine.get_session_manager() as session:
+		if since is None:
+			# rows older than the archive cannot be rebuilt, so they are never deleted
+			since = session.execute( select( func.min(models.PacketArchive.gateway_receive_time) ) ).scalar_one()
+
+		if since is None:
+			print("the packet archive is empty")
+			return stats
+
+		# rows already moved to the cold tier are read only. reprocessing them would only add copies
+		cutoff = max((models.tier_cutoff(orm_class) or 0) for orm_class in [orm_classes[table] for table in tables] + [models.Reception])
+		if since < cutoff:
+			print(f"rows before {cutoff} are in the cold tier and are not reprocessed")
+			since = cutoff
+
+		if replace and not dry_run:
+			for table in tables:
+				session.execute( in_window(delete(orm_classes[table]), orm_classes[table], since, until) )
+				print(f"deleted rows of {table} since {since}" + ("" if until is None else f" until {until}"))
+
+			session.execute( in_window(delete(models.Reception).where(receptions_of(tables)), models.Reception, since, until) )
+			print(f"deleted their receptions since {since}" + ("" if until is None else f" until {until}"))
+			session.commit()
+			models.count_cache_clear()
+
+		while True:
+			# keyset over the archive id. each batch is fully read before writing to the same connection
+			sel   = select(models.PacketArchive).where(models.PacketArchive.id > last_id).order_by(models.PacketArchive.id).limit(batch_size)
+			batch = session.exec( in_window(sel, models.PacketArchive, since, until) ).all()
+
+			if not batch:
+				break
+
+			last_id    = batch[-1].id
+			instances  = []
+
+			for archived in batch:
+				try:
+					packet  = archived.to_dataclass().to_packet()
+					message = models.decode_packet(packet, gateway_receive_time=archived.gateway_receive_time, gateway_id=archived.gateway_id)
+				except Exception as e:
+					stats["errors"] += 1
+					print(f"error decoding archived packet {archived.id}: {e}", file=sys.stderr)
+					continue
+
+				if message.__tablename__ in tables:
+					instances.append(message)
+
+			if not replace:
+				# stored by the logger or an earlier run, along with the receptions of its copies
+				stored             = stored_keys(session, orm_classes, instances)
+				num_instances      = len(instances)
+				instances          = [instance for instance in instances if dedup.message_key(instance) not in stored]
+				stats["skipped"]  += num_instances - len(instances)
+
+			# a message already seen, in this batch or an earlier one, only adds a reception
+			instances, _       = dedup.fold_duplicates(seen, instances, models.ReceptionClass.from_message, mark=True)
+			stats["archived"] += len(batch)
+
+			if dry_run:
+				for instance in instances:
+					stats[instance.__tablename__.upper()] = stats.get(instance.__tablename__.upper(), 0) + 1
+			else:
+				for k,v in models.bulk_insert(session, instances).items():
+					stats[k] = stats.get(k, 0) + v
+				session.commit()
+
+			print(f"{stats['archived']:12,d} archived packets | {stats['archived'] / (time.time() - start):10,.0f} packets/s")
+
+		if replace and not dry_run and models.Telemetry.__tablename__ in tables:
+			# the replaced rows were added to the rollups a second time while reinserting
+			models.rebuild_rollups(session, since=since, until=until)
+			session.commit()
+			print(f"rebuilt telemetry rollups since {since}" + ("" if until is None else f" until {until}"))
+
+	return stats
+
+
+def main(argv: list[str] | None = None):
+	args         = parse_args(argv)
+	config       = Config.load_env()
+	config_local = ConfigLocal.load_env()
+	db_engine    = db.dbEngineLocalFromConfig(config=config, config_local=config_local)
+
+	stats        = reprocess(
+		db_engine  = db_engine,
+		tables     = args.tables,
+		since      = args.since,
+		until      = args.until,
+		replace    = args.replace,
+		batch_size = args.batch_size,
+		dry_run    = args.dry_run,
+		dedup_size = args.dedup_size
+	)
+
+	print( "".join(f"{k}: {v:12,d} | " for k, v in sorted(stats.items())) )
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,92 @@
+import gc
+import os
+import sys
+import uuid
+import shutil
+
+import pytest
+
+# behaviour tests. they run from meshtastic2duckdb/app, as the server does, so dbs/ resolves,
+# each on a database of its own which is removed afterwards.
+#
+#   make test
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "meshtastic2duckdb", "app")
+
+os.chdir(APP_DIR)
+os.makedirs("dbs", exist_ok=True)
+sys.path.insert(0, os.path.join(APP_DIR, ".."))
+
+from fastapi.testclient import TestClient
+
+from app           import db
+from app           import dedup
+from app           import main
+from app           import models
+from app.dbgenerics import DbEngine, DeliveryError
+from logger.replay import synthetic_packets
+
+
+class FailingEngine(DbEngine):
+	# a database which is down. counts the deliveries tried
+	def __init__(self):
+		self.num_calls = 0
+		self.fail      = True
+		self.stored    = []
+
+	@property
+	def stats(self) -> dict[str, int]:
+		return {}
+
+	def add_instances(self, instances) -> dict[str, int]:
+		self.num_calls += 1
+		if self.fail:
+			raise DeliveryError(f"could not deliver {len(instances)} rows", instances)
+
+		self.stored.extend(instances)
+		return { "ROWS": len(instances) }
+
+
+@pytest.fixture
+def failing_engine() -> FailingEngine:
+	return FailingEngine()
+
+
+@pytest.fixture
+def messages() -> list:
+	packets = synthetic_packets(200, 10, seed=1)
+	return [models.decode_packet(packet, gateway_id="!gateway1") for packet in packets]
+
+
+@pytest.fixture
+def local_engine():
+	db_filename = f"test_{uuid.uuid4().hex}.duckdb"
+	tier_dir    = f"dbs/test_{uuid.uuid4().hex}_cold"
+
+	db_engine   = db.DbEngineLocal(db_filename, memory_limit_mb=256, tier_dir=tier_dir)
+
+	# the caches are process wide. a new database is never served an earlier test's results or keys
+	models.count_cache_clear()
+	models.query_cache.bump()
+	dedup.batch_keys  = None
+	dedup.dedup_cache = None
+	dedup.dedup_init  = False
+
+	yield db_engine
+
+	del db_engine
+	gc.collect()
+
+	for suffix in ("", ".wal"):
+		if os.path.exists(f"dbs/{db_filename}{suffix}"):
+			os.remove(f"dbs/{db_filename}{suffix}")
+	shutil.rmtree(tier_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def client(local_engine, monkeypatch):
+	# the api, on the test's database
+	monkeypatch.setattr(db, "get_engine", lambda: local_engine)
+
+	with TestClient(main.app) as client:
+		yield client
@@ -0,0 +1,64 @@
+import json
+import hashlib
+
+import pytest
+
+from sqlalchemy import func, select
+
+from app import models
+
+
+def post_batch(client, table_name: str, instances: list):
+	# as DbEngineHTTP.send posts them
+	body    = json.dumps([instance.toJSONDICT() for instance in instances], sort_keys=True, default=str)
+	headers = {
+		"Content-Type"   : "application/json",
+		"Idempotency-Key": hashlib.sha1(body.encode()).hexdigest()
+	}
+	return client.post(f"/api/messages/{table_name}/batch", content=body, headers=headers)
+
+
+def count(db_engine, orm_class) -> int:
+	with db_engine.get_session_manager(read_only=True) as session:
+		return session.execute( select( func.count() ).select_from(orm_class) ).scalar_one()
+
+
+def test_batch_replay_is_stored_once(client, local_engine, messages):
+	# the response of the first post was lost. the logger sends the same batch again
+	telemetry = [message for message in messages if message.__tablename__ == "telemetry"]
+
+	first     = post_batch(client, "telemetry", telemetry)
+	stored    = count(local_engine, models.Telemetry), count(local_engine, models.Reception)
+	second    = post_batch(client, "telemetry", telemetry)
+
+	assert first.status_code == second.status_code == 201
+	assert second.json() == { "TELEMETRY": 0 }
+	assert sum(stored) == len(telemetry)
+	assert (count(local_engine, models.Telemetry), count(local_engine, models.Reception)) == stored
+
+	with local_engine.get_session_manager(read_only=True) as session:
+		assert session.execute( select( func.sum(models.TelemetryRollupHour.count) ) ).scalar_one() == stored[0]
+
+
+@pytest.mark.parametrize("order", ["asc", "dsc"])
+def test_cursor_pages_do_not_overlap(client, local_engine, messages, order):
+	# rows sharing a gateway_receive_time straddle the page boundaries. the cursor breaks the tie on id
+	positions = [message for message in messages if message.__tablename__ == "position"]
+	for pos, message in enumerate(positions):
+		message.gateway_receive_time -= pos // 7
+
+	local_engine.add_instances(positions)
+
+	keys   = []
+	cursor = None
+	while True:
+		params = { "limit": 10, "order": order, **({} if cursor is None else { "cursor": cursor }) }
+		resp   = client.get("/api/messages/position/list", params=params)
+		assert resp.status_code == 200
+
+		keys  += [(row["from_node"], row["message_id"]) for row in resp.json()]
+		cursor = resp.headers.get("X-Next-Cursor")
+		if cursor is None:
+			break
+
+	assert len(keys) == len(set(keys)) == len(positions)
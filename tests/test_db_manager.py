@@ -0,0 +1,48 @@
+import time
+
+from app import db
+
+
+def burst(db_manager: db.DbManager, messages: list):
+	# one message at a time, as the decode workers buffer them
+	for message in messages:
+		try:
+			db_manager.buffer_instances([message])
+		except Exception:
+			pass
+
+
+def test_failed_flush_is_not_retried_per_packet(failing_engine, messages):
+	# the flusher retries the buffer flush_ms after a failure. new packets do not
+	db_manager = db.DbManager(failing_engine, flush_rows=10, flush_ms=60_000)
+
+	burst(db_manager, messages)
+
+	assert failing_engine.num_calls == 1
+	assert len(db_manager.buffer) == len(messages)
+
+
+def test_failed_flush_without_flusher_waits_for_retry(failing_engine, messages):
+	# without a flusher every packet flushes inline, but not before the retry deadline
+	db_manager = db.DbManager(failing_engine, flush_rows=1, flush_ms=0)
+
+	burst(db_manager, messages[:100])
+	assert failing_engine.num_calls == 1
+
+	db_manager.retry_at = time.monotonic()
+	failing_engine.fail = False
+
+	burst(db_manager, messages[100:])
+
+	assert failing_engine.num_calls == 1 + len(messages[100:])
+	assert failing_engine.stored[:100] == messages[:100]
+	assert len(db_manager.buffer) == 0
+
+
+def test_failed_flush_keeps_rows_up_to_buffer_max(failing_engine, messages):
+	db_manager = db.DbManager(failing_engine, flush_rows=10, flush_ms=60_000, buffer_max=50)
+
+	burst(db_manager, messages)
+
+	assert db_manager.buffer == messages[-50:]
+	assert db_manager.num_dropped == len(messages) - 50
@@ -0,0 +1,42 @@
+import pytest
+
+from sqlalchemy import func, select
+
+from app           import dedup
+from app           import models
+from logger        import reprocess
+from logger.replay import synthetic_packets
+
+
+COUNTED = [models.Telemetry, models.Position, models.TextMessage, models.NodeInfo, models.Reception, models.TelemetryRollupHour]
+
+
+def counts(db_engine) -> dict[str, int]:
+	with db_engine.get_session_manager(read_only=True) as session:
+		res = { cls.__tablename__: session.execute( select( func.count() ).select_from(cls) ).scalar_one() for cls in COUNTED }
+		res["rolled_up"] = session.execute( select( func.sum(models.TelemetryRollupHour.count) ) ).scalar_one()
+	return res
+
+
+@pytest.mark.parametrize("replace", [True, False])
+def test_reprocess_twice_adds_nothing(local_engine, replace):
+	# as logged: every copy archived, the first stored whole, the second gateway's copies as receptions
+	packets   = list(synthetic_packets(300, 10, seed=2))
+	seen      = dedup.DedupCache(size=10_000, ttl=3600)
+	instances = []
+
+	for pos, (packet, gateway_id) in enumerate([(packet, "!gateway1") for packet in packets] + [(packet, "!gateway2") for packet in packets[:100]]):
+		gateway_receive_time = 1_700_000_000 + pos
+		message              = models.decode_packet(packet, gateway_receive_time=gateway_receive_time, gateway_id=gateway_id)
+		instances.append(models.archive_packet(packet, gateway_receive_time=gateway_receive_time, gateway_id=gateway_id))
+		instances.extend(dedup.fold_duplicates(seen, [message], models.ReceptionClass.from_message, mark=True)[0])
+
+	local_engine.add_instances(instances)
+	logged = counts(local_engine)
+	tables = reprocess.parse_args([]).tables
+
+	for _ in range(2):
+		reprocess.reprocess(db_engine=local_engine, tables=tables, replace=replace)
+		assert counts(local_engine) == logged
+
+	assert logged["reception"] > 0
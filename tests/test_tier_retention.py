@@ -0,0 +1,40 @@
+import time
+
+from sqlalchemy import func, select, text
+
+from app import models
+
+
+def count(db_engine, orm_class, source=None) -> int:
+	with db_engine.get_session_manager(read_only=True) as session:
+		return session.execute( select( func.count() ).select_from(orm_class if source is None else source(orm_class)) ).scalar_one()
+
+
+def test_tier_and_retention_counts(local_engine):
+	# a reception an hour, for 100 days up to today's midnight. the half hour keeps them off the partition edges
+	today = models.tier_partition_start(int(time.time()), "day")
+	hours = 100 * 24
+
+	with local_engine.get_session_manager() as session:
+		session.execute( text(f"INSERT INTO reception (gateway_receive_time, from_node, message_id) SELECT {today} - i * 3600 - 1800, i % 10, i + 1 FROM range({hours}) t(i)") )
+
+	# days 30 to 100 are moved to the cold tier. queries still see every row
+	stats = models.tier_run(local_engine.get_session_manager(), before=today - 30 * 86400, partition="day", tier_dir=local_engine.tier_dir)
+
+	assert stats == { "RECEPTION": hours - 30 * 24 }
+	assert count(local_engine, models.Reception) == 30 * 24
+	assert count(local_engine, models.Reception, models.tier_source) == hours
+
+	# a 60 day retention drops the cold days past it, whole
+	stats = models.retention_run(local_engine.get_session_manager(), { "reception": 60 }, now=today, batch_size=100, tier_dir=local_engine.tier_dir)
+
+	assert "RECEPTION" not in stats
+	assert stats["RECEPTION_FILES"] >= 40
+	assert count(local_engine, models.Reception) == 30 * 24
+	assert count(local_engine, models.Reception, models.tier_source) == 60 * 24
+
+	# and the rows past it which were still in the table
+	stats = models.retention_run(local_engine.get_session_manager(), { "reception": 10 }, now=today, batch_size=100, tier_dir=local_engine.tier_dir)
+
+	assert stats["RECEPTION"] == 20 * 24
+	assert count(local_engine, models.Reception, models.tier_source) == 10 * 24